@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Command Batching
+Helpers that turn many small LISP commands into a single clipboard paste.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from lisp_serializer import lisp_number, lisp_points, lisp_string
+
+logger = logging.getLogger("autocad-lisp-mcp.batching")
+
+CommandResult = Tuple[bool, str]
+
+
+def join_forms(forms: List[str]) -> str:
+    """Combine LISP forms into one (progn ...) program."""
+    return "(progn " + " ".join(forms) + ")"
+
+
+REQUIRED = object()
+
+# batch_draw operation type -> (c:batch-draw operation name, fields).
+# Fields are (key, kind, default) in the argument order of the LISP function
+# the operation dispatches to (see *mcp-batch-draw-ops* in batch_operations.lsp).
+BATCH_DRAW_OPS: Dict[str, Tuple[str, List[Tuple[str, str, Any]]]] = {
+    "line": ("line", [("x1", "num", REQUIRED), ("y1", "num", REQUIRED),
+                      ("x2", "num", REQUIRED), ("y2", "num", REQUIRED)]),
+    "circle": ("circle", [("center_x", "num", REQUIRED), ("center_y", "num", REQUIRED),
+                          ("radius", "num", REQUIRED)]),
+    "text": ("text", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                      ("text_string", "str", REQUIRED), ("height", "num", 2.5),
+                      ("rotation", "num", 0.0)]),
+    "polyline": ("polyline", [("points", "points", REQUIRED), ("closed", "bool", False)]),
+    "rectangle": ("rectangle", [("x1", "num", REQUIRED), ("y1", "num", REQUIRED),
+                                ("x2", "num", REQUIRED), ("y2", "num", REQUIRED),
+                                ("layer", "optstr", None)]),
+    "arc": ("arc", [("center_x", "num", REQUIRED), ("center_y", "num", REQUIRED),
+                    ("radius", "num", REQUIRED), ("start_angle", "num", REQUIRED),
+                    ("end_angle", "num", REQUIRED), ("layer", "optstr", None)]),
+    "ellipse": ("ellipse", [("center_x", "num", REQUIRED), ("center_y", "num", REQUIRED),
+                            ("major_axis_end_x", "num", REQUIRED),
+                            ("major_axis_end_y", "num", REQUIRED),
+                            ("minor_axis_ratio", "num", REQUIRED), ("layer", "optstr", None)]),
+    "mtext": ("mtext", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                        ("width", "num", REQUIRED), ("text_string", "str", REQUIRED),
+                        ("height", "num", 2.5), ("layer", "optstr", None),
+                        ("style", "optstr", None), ("rotation", "num", 0.0)]),
+    "block": ("block", [("block_name", "str", REQUIRED), ("x", "num", REQUIRED),
+                        ("y", "num", REQUIRED), ("block_id", "str", ""),
+                        ("scale", "num", 1.0), ("rotation", "num", 0.0)]),
+    "layer": ("layer", [("layer_name", "str", REQUIRED), ("color", "str", "white"),
+                        ("linetype", "str", "CONTINUOUS")]),
+    "pid_layers": ("pid-layers", []),
+    "pid_symbol": ("pid-symbol", [("category", "str", REQUIRED), ("symbol_name", "str", REQUIRED),
+                                  ("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                                  ("scale", "num", 1.0), ("rotation", "num", 0.0)]),
+    "process_line": ("process-line", [("x1", "num", REQUIRED), ("y1", "num", REQUIRED),
+                                      ("x2", "num", REQUIRED), ("y2", "num", REQUIRED)]),
+    "connect_equipment": ("connect-equipment", [("x1", "num", REQUIRED), ("y1", "num", REQUIRED),
+                                                ("x2", "num", REQUIRED), ("y2", "num", REQUIRED)]),
+    "flow_arrow": ("flow-arrow", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                                  ("rotation", "num", 0.0)]),
+    "equipment_tag": ("equipment-tag", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                                        ("tag", "str", REQUIRED), ("description", "str", "")]),
+    "line_number": ("line-number", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                                    ("line_num", "str", REQUIRED), ("spec", "str", REQUIRED)]),
+    "valve": ("valve", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                        ("valve_type", "str", "GATE"), ("rotation", "num", 0.0)]),
+    "instrument": ("instrument", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                                  ("instrument_type", "str", REQUIRED), ("rotation", "num", 0.0)]),
+    "pump": ("pump", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                      ("pump_type", "str", "CENTRIFUGAL"), ("rotation", "num", 0.0)]),
+    "tank": ("tank", [("x", "num", REQUIRED), ("y", "num", REQUIRED),
+                      ("tank_type", "str", "VERTICAL"), ("scale", "num", 1.0)]),
+}
+
+
+def _quoted_value(value: Any, kind: str) -> str:
+    """Format a value for use inside a quoted LISP list."""
+    if kind == "num":
+        return lisp_number(value)
+    if kind == "bool":
+        return "T" if value else "nil"
+    if kind == "optstr" and value is None:
+        return "nil"
+    if kind in ("str", "optstr"):
+        return lisp_string(value)
+    if kind == "points":
+        if not isinstance(value, (list, tuple)) or len(value) < 2:
+            raise ValueError("expected at least two [x, y] points")
+        return lisp_points(value)
+    raise ValueError(f"unknown field kind {kind}")
+
+
+def build_batch_draw_op(op: Dict[str, Any]) -> str:
+    """Translate one batch_draw operation dict into a c:batch-draw list entry.
+    Raises ValueError describing the first problem found."""
+    op_type = op.get("type")
+    if op_type not in BATCH_DRAW_OPS:
+        raise ValueError(f"unknown type {op_type!r}")
+    lisp_name, fields = BATCH_DRAW_OPS[op_type]
+    parts = [f'"{lisp_name}"']
+    for key, kind, default in fields:
+        value = op.get(key, default)
+        if value is REQUIRED:
+            raise ValueError(f"missing '{key}'")
+        try:
+            parts.append(_quoted_value(value, kind))
+        except (ValueError, TypeError, IndexError) as e:
+            raise ValueError(f"'{key}': {e}")
+    return "(" + " ".join(parts) + ")"
+
+
+def batch_draw_fields(op: Dict[str, Any]) -> Dict[str, Any]:
+    """A valid operation's fields, with defaults filled in for the missing ones."""
+    return {key: op.get(key, default) for key, _, default in BATCH_DRAW_OPS[op["type"]][1]}
+
+
+# What the P&ID operations draw, as pid_tools.lsp does it.
+# Layers c:setup-pid-layers creates, with their ACI colors
+PID_LAYERS = {
+    "PID-EQUIPMENT": "6",
+    "PID-PROCESS-PIPING": "4",
+    "PID-UTILITY-PIPING": "5",
+    "PID-INSTRUMENTS": "1",
+    "PID-ELECTRICAL": "7",
+    "PID-ANNOTATION": "7",
+    "PID-VALVES": "3",
+}
+PROCESS_LAYER = "PID-PROCESS-PIPING"
+# Layers the operations' LISP commands make current before drawing
+PID_TOOL_LAYERS = {
+    "valve": "PID-VALVES",
+    "instrument": "PID-INSTRUMENTS",
+    "process_line": PROCESS_LAYER,
+    "connect_equipment": PROCESS_LAYER,
+    "equipment_tag": "PID-ANNOTATION",
+    "line_number": "PID-ANNOTATION",
+}
+# Library symbol (category, name, scale) each equipment type is drawn with;
+# the "" entry is the fallback for unknown types
+PID_TYPE_SYMBOLS = {
+    "valve": {
+        "GATE": ("VALVES", "VA-GATE", 1.0),
+        "GLOBE": ("VALVES", "VA-GLOBE", 1.0),
+        "CHECK": ("VALVES", "VA-CHECK", 1.0),
+        "BALL": ("VALVES", "VA-BALL", 1.0),
+        "BUTTERFLY": ("VALVES", "VA-BUTTERFLY", 1.0),
+        "": ("VALVES", "VA-GATE", 1.0),
+    },
+    "instrument": {
+        "FLOW": ("PRIMARY_ELEMENTS", "PRIMELEM-ORIFICE_PLATE", 0.75),
+        "PRESSURE": ("ELECTRICAL", "ELEC-PRESS_SW_ACT", 0.75),
+        "TEMPERATURE": ("ELECTRICAL", "ELEC-TEMP_SW_ACT", 0.75),
+        "LEVEL": ("ELECTRICAL", "ELEC-LIQ_LEV_SW_ACT", 0.75),
+        "": ("INSTRUMENTS", "INST-DISC-FLDACCESS", 0.75),
+    },
+    "pump": {
+        "CENTRIFUGAL": ("PUMPS-BLOWERS", "PUMP-CENTRIF1", 1.0),
+        "DIAPHRAGM": ("PUMPS-BLOWERS", "PUMP-DIAPHRAGM", 1.0),
+        "GEAR": ("PUMPS-BLOWERS", "PUMP-GEAR", 1.0),
+        "": ("PUMPS-BLOWERS", "PUMP-CENTRIF1", 1.0),
+    },
+    "tank": {
+        "VERTICAL": ("TANKS", "TANK-VERTICAL_OPEN", 1.0),
+        "HORIZONTAL": ("TANKS", "TANK-HORIZONTAL", 1.0),
+        "CONE": ("TANKS", "TANK-CONE_BOTTOM_OPEN", 1.0),
+        "": ("TANKS", "TANK-VERTICAL_OPEN", 1.0),
+    },
+}
+
+
+def pid_type_symbol(op_type: str, type_name: str) -> Tuple[str, str, float]:
+    """(category, symbol name, scale) a valve, instrument, pump or tank type is drawn with."""
+    symbols = PID_TYPE_SYMBOLS[op_type]
+    return symbols.get(type_name.upper(), symbols[""])
+
+
+class BatchTransaction:
+    """LISP forms recorded between begin_batch and commit_batch.
+
+    The committed program remembers the last entity before it runs and, once
+    every form has executed, reports how many entities were added using
+    mcp-count-entities-after from batch_operations.lsp.
+    """
+
+    def __init__(self):
+        self.forms: List[str] = []
+        self.started = time.perf_counter()
+
+    def __len__(self) -> int:
+        return len(self.forms)
+
+    def record(self, command: str) -> int:
+        """Add a form to the transaction. Returns its 1-based position."""
+        self.forms.append(command)
+        return len(self.forms)
+
+    def program(self) -> str:
+        return join_forms(
+            ["(setq mcp-batch-mark (entlast))"]
+            + self.forms
+            + ['(princ (strcat "\\nMCP batch: " '
+               '(itoa (mcp-count-entities-after mcp-batch-mark)) " entities created"))',
+               "(princ)"]
+        )
+
+
+class CommandCoalescer:
+    """Queue LISP forms for a short window and send them as one program.
+
+    Callers await `submit()` and each receives the result of its own form.
+    A batch is flushed when the window elapses after the first queued form,
+    or as soon as `max_commands` forms are waiting.
+
+    `execute_batch` receives the batch's forms and must queue them before it
+    returns (as Dispatcher.submit does), so batches reach AutoCAD in the order
+    they were flushed. It returns an awaitable list with one result per form;
+    a form that fails must not stop the forms after it.
+    """
+
+    def __init__(self, execute_batch: Callable[[List[str]], Awaitable[List[CommandResult]]],
+                 window: float = 0.05, max_commands: int = 50):
+        self.execute_batch = execute_batch
+        self.window = window
+        self.max_commands = max_commands
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def submit(self, command: str) -> CommandResult:
+        """Queue a LISP form and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((command, future))
+        if len(self._pending) >= self.max_commands:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> int:
+        """Queue everything waiting so far for sending. Returns the number of forms."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        asyncio.ensure_future(self._send(batch, self.execute_batch([cmd for cmd, _ in batch])))
+        logger.info(f"Flushed {len(batch)} coalesced commands")
+        return len(batch)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]],
+                    sending: Awaitable[List[CommandResult]]) -> None:
+        try:
+            results = await sending
+        except Exception as e:
+            logger.error(f"Error flushing coalesced commands: {str(e)}")
+            results = [(False, f"Error flushing coalesced commands: {str(e)}")] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class AdaptiveChunker:
+    """Split large batches into chunks sized from measured completion times.
+
+    After every chunk the observed time per item is folded into a moving
+    average and the next chunk is sized so it should take about
+    `target_seconds`, clamped to [min_size, max_size].
+    """
+
+    def __init__(self, initial_size: int = 500, min_size: int = 50,
+                 max_size: int = 5000, target_seconds: float = 1.0,
+                 smoothing: float = 0.5):
+        self.size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.seconds_per_item: Optional[float] = None
+
+    def chunks(self, items: Sequence[Any], start: int = 0) -> Iterator[Tuple[int, Sequence[Any]]]:
+        """Yield (offset, chunk) pairs, re-reading the chunk size before each one."""
+        offset = start
+        while offset < len(items):
+            chunk = items[offset:offset + self.size]
+            yield offset, chunk
+            offset += len(chunk)
+
+    def record(self, count: int, elapsed: float) -> None:
+        """Feed back how long a chunk of `count` items took to complete."""
+        if count <= 0:
+            return
+        observed = max(elapsed, 1e-6) / count
+        if self.seconds_per_item is None:
+            self.seconds_per_item = observed
+        else:
+            self.seconds_per_item += self.smoothing * (observed - self.seconds_per_item)
+        ideal = int(self.target_seconds / self.seconds_per_item)
+        self.size = max(self.min_size, min(self.max_size, ideal))
+
+    def failed(self) -> None:
+        """Halve the chunk size after a failed chunk."""
+        self.size = max(self.min_size, self.size // 2)
+
+
+async def stream_batch(items: Sequence[Any],
+                       build_command: Callable[[Sequence[Any]], str],
+                       execute: Callable[[str], Awaitable[CommandResult]],
+                       chunker: AdaptiveChunker,
+                       progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+                       max_retries: int = 2) -> Tuple[bool, int, str]:
+    """Send `items` to AutoCAD in adaptively sized chunks.
+
+    A failed chunk is retried up to `max_retries` times and shrinks the chunks
+    that follow it; chunks that already succeeded are never resent. Returns
+    (success, items_sent, message); on failure items_sent is the index to
+    resume from.
+    """
+    total = len(items)
+    sent = 0
+    chunk_count = 0
+    for offset, chunk in chunker.chunks(items):
+        command = build_command(chunk)
+        for attempt in range(max_retries + 1):
+            start = time.perf_counter()
+            try:
+                success, message = await execute(command)
+            except Exception as e:
+                success, message = False, str(e)
+            if success:
+                break
+            logger.warning(f"Chunk at item {offset} ({len(chunk)} items) failed "
+                           f"(attempt {attempt + 1}): {message}")
+            chunker.failed()
+        else:
+            return False, sent, (f"Stopped after {sent} of {total} items: chunk at item "
+                                 f"{offset} failed {max_retries + 1} times ({message})")
+
+        chunker.record(len(chunk), time.perf_counter() - start)
+        sent += len(chunk)
+        chunk_count += 1
+        logger.info(f"Sent {sent}/{total} items (chunk size now {chunker.size})")
+        if progress is not None:
+            await progress(sent, total)
+    return True, sent, f"Sent {total} items in {chunk_count} chunks"
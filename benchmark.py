@@ -0,0 +1,724 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Benchmarks
+Drives the MCP tools against the in-process fake transport so throughput can be
+measured (and regressions caught) on machines without AutoCAD.
+
+Usage:
+    python benchmark.py tools [--server server_lisp_fast] [--iterations 5]
+    python benchmark.py serializer [--points 100000] [--repeat 5] [--precision 6]
+    python benchmark.py pacing [--commands 200] [--response-ms 30]
+    python benchmark.py startup [--repeat 3] [--transport fake-realtime]
+    python benchmark.py routing [--routes 200] [--equipment 70]
+    python benchmark.py scene [--entities 10000] [--queries 10000]
+    python benchmark.py dxf [--entities 10000]
+    python benchmark.py script [--commands 500]
+    python benchmark.py dispatch [--commands 10]
+    python benchmark.py stress [--calls 400] [--threads 4]
+    python benchmark.py pool [--sheets 8] [--instances 1,2,4] [--sheet-seconds 1.0]
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+os.environ.setdefault("AUTOCAD_MCP_TRANSPORT", "fake")
+
+import script_compiler
+import transport as transport_module
+from transport import FakeTransport
+from lisp_serializer import T, lisp_call, precision, quoted_points
+from batching import build_batch_draw_op
+from dxf_writer import DxfWriter
+from routing import Router
+from scene import Scene
+
+SERVERS = ["server_lisp_fast", "server_lisp"]
+
+# Arguments for tools whose parameters can't be derived from their JSON schema
+SAMPLE_ARGS: Dict[str, Dict[str, Any]] = {
+    "batch_create_lines": {"lines": [[0, 0, 10, 0], [10, 0, 10, 10], [10, 10, 0, 10]]},
+    "batch_create_circles": {"circles": [[0, 0, 5], [20, 0, 5]]},
+    "batch_create_texts": {"texts": [{"x": 0, "y": 0, "height": 2.5, "string": "A \"quoted\" label"}]},
+    "batch_draw": {"operations": [
+        {"type": "layer", "layer_name": "PID-PROCESS-PIPING"},
+        {"type": "process_line", "x1": 0, "y1": 0, "x2": 50, "y2": 0},
+        {"type": "valve", "x": 25, "y": 0},
+        {"type": "polyline", "points": [[0, 0], [10, 0], [10, 10]], "closed": True},
+    ]},
+    "create_polyline": {"points": [[0, 0], [10, 0], [10, 10]], "closed": True},
+    "create_wipeout_from_points": {"points": [[0, 0], [10, 0], [10, 10]]},
+    "arrange_blocks": {"blocks_and_ids": [["PUMP", "P-101"], ["TANK", "TK-101"]],
+                       "start_x": 0, "start_y": 0},
+    "generate_sheets": {"sheets": [
+        {"name": "PID-001", "operations": [{"type": "line", "x1": 0, "y1": 0, "x2": 50, "y2": 0},
+                                           {"type": "valve", "x": 25, "y": 0}]},
+        {"name": "PID-002", "operations": [{"type": "circle", "center_x": 0, "center_y": 0, "radius": 5}]},
+    ]},
+    "preload_blocks": {"symbols": ["VALVES/VA-GATE", "VALVES/VA-GLOBE", "TANKS/TANK-VERTICAL_OPEN"]},
+    "connect_blocks_bulk": {"connections": [{"start_id": "P-101", "end_id": "TK-101"},
+                                            {"start_id": "TK-101", "end_id": "V-101", "layer": "PID"}]},
+    "connect_equipment": {"x1": 0, "y1": 0, "x2": 50, "y2": 20},
+    "route_connections": {"connections": [[0, 0, 50, 20], [0, 10, 50, 30]]},
+    "set_performance_mode": {"fast_mode": True},
+    "set_completion_signals": {"enabled": True},
+    "insert_block_with_attributes": {"block_path": "C:/PIDv4-CTO/VALVES/VA-GATE.dwg",
+                                     "x": 0, "y": 0, "attributes": ["V-101", "6\""]},
+}
+
+
+# Symbol library the fake runs use, so insert_pid_symbol passes catalog validation
+SAMPLE_SYMBOLS = {"TEST": ["TEST"], "VALVES": ["VA-GATE", "VA-GLOBE"], "TANKS": ["TANK-VERTICAL_OPEN"]}
+
+
+def sample_symbol_library() -> str:
+    """Create a throwaway symbol library of empty .dwg files and return its root."""
+    root = os.path.join(tempfile.gettempdir(), "autocad-mcp-benchmark-symbols")
+    for category, names in SAMPLE_SYMBOLS.items():
+        os.makedirs(os.path.join(root, category), exist_ok=True)
+        for name in names:
+            open(os.path.join(root, category, f"{name}.dwg"), "a").close()
+    return root
+
+
+def sample_value(name: str, schema: Dict[str, Any]) -> Any:
+    """Produce a plausible argument value from a JSON schema fragment."""
+    if "default" in schema:
+        return schema["default"]
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return sample_value(name, options[0]) if options else None
+    kind = schema.get("type")
+    if kind == "number":
+        return 12.5
+    if kind == "integer":
+        return 1
+    if kind == "boolean":
+        return False
+    if kind == "string":
+        return "TEST"
+    if kind == "array":
+        if "prefixItems" in schema:
+            return [[sample_value(name, s) for s in schema["prefixItems"]]]
+        return [sample_value(name, schema.get("items", {"type": "string"}))]
+    return "TEST"
+
+
+def sample_arguments(tool) -> Dict[str, Any]:
+    if tool.name in SAMPLE_ARGS:
+        return dict(SAMPLE_ARGS[tool.name])
+    schema = tool.inputSchema
+    required = set(schema.get("required", []))
+    return {name: sample_value(name, prop)
+            for name, prop in schema.get("properties", {}).items()
+            if name in required}
+
+
+def load_server(name: str, fake: FakeTransport):
+    """Import a server module with the fake transport installed and run its
+    startup initialization (LISP loading) the way __main__ would."""
+    transport_module.set_transport(fake)
+    server = importlib.import_module(name)
+    if hasattr(server, "LAZY_LOADING"):
+        # Load everything up front so first-use loads don't skew per-tool numbers
+        server.LAZY_LOADING = False
+    for init in ("initialize_autocad_lisp_fast", "initialize_autocad_lisp"):
+        if hasattr(server, init):
+            getattr(server, init)()
+            break
+    if hasattr(server, "session"):
+        server.session.window = fake.find_window()
+    else:
+        server.acad_window = fake.find_window()
+    fake.reset()
+    return server
+
+
+async def run_tools(server, fake: FakeTransport, iterations: int) -> List[Dict[str, Any]]:
+    rows = []
+    for tool in await server.autocad_mcp.list_tools():
+        args = sample_arguments(tool)
+        fake.reset()
+        wall_start = time.perf_counter()
+        error = None
+        for _ in range(iterations):
+            try:
+                content, _ = await server.autocad_mcp.call_tool(tool.name, args)
+                text = content[0].text if content else ""
+                if text.startswith("Error") or "window not found" in text.lower():
+                    error = text
+            except Exception as e:
+                error = str(e)
+        wall = time.perf_counter() - wall_start
+        stats = fake.stats()
+        rows.append({
+            "tool": tool.name,
+            "round_trips": stats["round_trips"] / iterations,
+            "commands": stats["commands"] / iterations,
+            "simulated": stats["elapsed"] / iterations,
+            "payload": stats["payload_chars"] / iterations,
+            "overhead_us": wall / iterations * 1e6,
+            "error": error,
+        })
+    return rows
+
+
+def bench_tools(args) -> int:
+    failures = 0
+    for name in args.server or SERVERS:
+        fake = FakeTransport()
+        server = load_server(name, fake)
+        rows = asyncio.run(run_tools(server, fake, args.iterations))
+        print(f"\n{name}: {len(rows)} tools, {args.iterations} iteration(s) each")
+        print(f"{'tool':40} {'trips':>6} {'cmds':>6} {'sim s':>8} {'chars':>8} {'py us':>9}")
+        for row in rows:
+            print(f"{row['tool']:40} {row['round_trips']:6.1f} {row['commands']:6.1f} "
+                  f"{row['simulated']:8.3f} {row['payload']:8.0f} {row['overhead_us']:9.1f}"
+                  + (f"  ERROR: {row['error']}" if row["error"] else ""))
+            failures += bool(row["error"])
+        total = sum(row["simulated"] for row in rows)
+        print(f"{'total simulated time per pass':40} {total:.3f}s")
+    return 1 if failures else 0
+
+
+def legacy_polyline_command(points, closed: bool) -> str:
+    """The f-string building create_polyline used before lisp_serializer."""
+    pts_str = ""
+    for (x, y) in points:
+        pts_str += f" (list {x} {y} 0.0)"
+    return f"(c:create-polyline (list {pts_str}) {'T' if closed else 'nil'})"
+
+
+def best_of(repeat: int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_serializer(args) -> int:
+    inputs = (("short decimals", [(i * 0.25, (i % 97) * 1.5) for i in range(args.points)]),
+              ("computed", [(i * 0.1, i / 3) for i in range(args.points)]))
+    print(f"create_polyline with {args.points} points, rounded to {args.precision} decimals "
+          f"(best of {args.repeat})")
+    print(f"{'coordinates':16} {'builder':16} {'ms':>8} {'chars':>10}")
+    for name, points in inputs:
+        legacy = best_of(args.repeat, legacy_polyline_command, points, True)
+        legacy_chars = len(legacy_polyline_command(points, True))
+        with precision(args.precision):
+            current = best_of(args.repeat, lambda: lisp_call("c:create-polyline", quoted_points(points), T))
+            current_chars = len(lisp_call("c:create-polyline", quoted_points(points), T))
+        print(f"{name:16} {'f-string +=':16} {legacy * 1000:8.1f} {legacy_chars:10}")
+        print(f"{name:16} {'lisp_serializer':16} {current * 1000:8.1f} {current_chars:10}")
+        print(f"{name:16} speedup: {legacy / current:.2f}x, payload: {current_chars / legacy_chars:.0%} of legacy")
+    return 0
+
+
+async def run_pacing(server, fake: FakeTransport, commands: int, adaptive: bool) -> Dict[str, Any]:
+    fake.reset()
+    server.session.pacer.reset()
+    await server.set_performance_mode(True, adaptive=adaptive)
+    dropped_reports = 0
+    for i in range(commands):
+        text = await server.create_line(0, i, 10, i)
+        dropped_reports += "dropped" in text
+    await server.set_performance_mode(True)
+    stats = fake.stats()
+    return {"elapsed": stats["elapsed"], "lost": stats["dropped_inputs"],
+            "reported": dropped_reports, "pacer": server.session.pacer.stats()}
+
+
+def bench_pacing(args) -> int:
+    fake = FakeTransport(response_time=args.response_ms / 1000.0)
+    server = load_server("server_lisp_fast", fake)
+    print(f"{args.commands} create_line calls, AutoCAD busy {args.response_ms}ms after each command")
+    print(f"{'pacing':10} {'sim s':>8} {'per cmd ms':>11} {'lost inputs':>12} {'reported':>9}")
+    for adaptive in (False, True):
+        result = asyncio.run(run_pacing(server, fake, args.commands, adaptive))
+        print(f"{'adaptive' if adaptive else 'fixed':10} {result['elapsed']:8.2f} "
+              f"{result['elapsed'] / args.commands * 1000:11.1f} {result['lost']:12} "
+              f"{result['reported']:9}")
+    for name, state in result["pacer"].items():
+        latency = f"{state['latency'] * 1000:.1f}ms" if state["latency"] is not None else "-"
+        print(f"  {name}: final scale {state['scale']:.2f}, latency estimate {latency}, "
+              f"{state['failures']} backoffs")
+    return 0
+
+
+async def run_script_mode(server, mode: str, commands: int) -> str:
+    """Draw commands lines typed one by one, or recorded and committed in one go."""
+    if mode == "typed":
+        for i in range(commands):
+            await server.create_line(0, i, 10, i)
+        return ""
+    await server.begin_batch()
+    for i in range(commands):
+        await server.create_line(0, i, 10, i)
+    return await server.commit_batch(as_script=mode != "paste")
+
+
+def bench_script(args) -> int:
+    fake = FakeTransport()
+    server = load_server("server_lisp_fast", fake)
+    print(f"{args.commands} create_line calls")
+    print(f"{'mode':16} {'sim s':>8} {'trips':>6} {'chars':>8} {'py ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        script_compiler.SCRIPT_DIR = tmp  # Start from an empty script cache
+        for mode in ("typed", "paste", "script", "script (cached)"):
+            fake.reset()
+            start = time.perf_counter()
+            message = asyncio.run(run_script_mode(server, mode.split()[0], args.commands))
+            wall = time.perf_counter() - start
+            if message.startswith(("Error", "Script")):
+                print(f"{mode}: {message}")
+                return 1
+            stats = fake.stats()
+            print(f"{mode:16} {stats['elapsed']:8.3f} {stats['round_trips']:6} "
+                  f"{stats['payload_chars']:8} {wall * 1000:8.1f}")
+    return 0
+
+
+async def run_dispatch(server, commands: int) -> Dict[str, Any]:
+    """Fire drawing calls all at once and keep querying the server meanwhile."""
+    latencies = []
+    drawing = asyncio.gather(*(server.create_line(0, i, 10, i) for i in range(commands)))
+    start = time.perf_counter()
+    while not drawing.done():
+        began = time.perf_counter()
+        await server.list_pid_symbols()
+        latencies.append(time.perf_counter() - began)
+        await asyncio.sleep(0.02)
+    await drawing
+    return {"drawing": time.perf_counter() - start, "latencies": sorted(latencies)}
+
+
+def bench_dispatch(args) -> int:
+    """Non-drawing tool latency while drawing commands are being sent (real delays)."""
+    fake = FakeTransport(realtime=True)
+    server = load_server("server_lisp_fast", fake)
+    result = asyncio.run(run_dispatch(server, args.commands))
+    latencies = result["latencies"]
+    sent = [int(y) for command in fake.commands
+            for y in re.findall(r"\(c:create-line 0 (\d+) ", command.text)]
+    print(f"{args.commands} concurrent create_line calls took {result['drawing']:.2f}s")
+    print(f"{len(latencies)} list_pid_symbols calls meanwhile: median "
+          f"{latencies[len(latencies) // 2] * 1000:.1f}ms, max {latencies[-1] * 1000:.1f}ms")
+    in_order = sent == list(range(args.commands))
+    print(f"commands reached AutoCAD in submission order: {'yes' if in_order else 'NO'}")
+    return 0 if in_order else 1
+
+
+# What each stress call sends, as (pattern for the form inside mcp-run, kind);
+# group 1 of the pattern is the call's index
+STRESS_FORMS = [
+    (r"\(c:create-line 0\.0 (\d+)\.0 10\.0 \1\.0\)", "line"),
+    (r"\(c:create-circle (\d+)\.0 0\.0 1\.0\)", "circle"),
+    (r"\(progn \(c:batch-create-lines '\(\(100\.0 (\d+)\.0 105\.0 \1\.0\)\)\)\)", "batch"),
+    (r"\(c:create-line (\d+) 1000 \1 1010\)", "thread"),
+]
+
+
+def stress_call(server, i: int):
+    """The i-th concurrent tool call: three that draw, one that only reads or
+    changes settings while the others are being sent."""
+    kind = i % 4
+    if kind == 0:
+        return server.autocad_mcp.call_tool("create_line", {"x1": 0, "y1": i, "x2": 10, "y2": i})
+    if kind == 1:
+        return server.autocad_mcp.call_tool("create_circle",
+                                            {"center_x": i, "center_y": 0, "radius": 1})
+    if kind == 2:
+        return server.autocad_mcp.call_tool("batch_create_lines",
+                                            {"lines": [[100, i, 105, i]]})
+    if i % 8 == 3:
+        return server.autocad_mcp.call_tool("set_performance_mode",
+                                            {"fast_mode": True, "minimal_delay": 0.001 * (i % 3),
+                                             "normal_delay": 0.001})
+    return server.autocad_mcp.call_tool("list_pid_symbols", {})
+
+
+def parse_stress_command(text: str) -> Optional[Tuple[int, str, int]]:
+    """(seq, kind, index) of one recorded command line, or None if it isn't
+    exactly one whole command the stress run sent."""
+    wrapped = re.fullmatch(r"\(mcp-run (\d+) '(.*)\)", text)
+    if wrapped is None:
+        return None
+    for pattern, kind in STRESS_FORMS:
+        form = re.fullmatch(pattern, wrapped.group(2))
+        if form:
+            return int(wrapped.group(1)), kind, int(form.group(1))
+    return None
+
+
+async def run_stress(server, calls: int, threads: int, per_thread: int) -> List[Any]:
+    """Fire calls tool calls at once on the event loop while threads other
+    threads send commands directly, bypassing the job queue."""
+    loop = asyncio.get_running_loop()
+
+    def direct(thread: int) -> None:
+        for j in range(per_thread):
+            server.execute_lisp_command_fast(
+                lisp_call("c:create-line", thread * per_thread + j, 1000,
+                          thread * per_thread + j, 1010))
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outside = [loop.run_in_executor(pool, direct, t) for t in range(threads)]
+        return await asyncio.gather(*(stress_call(server, i) for i in range(calls)), *outside,
+                                    return_exceptions=True)
+
+
+def bench_stress(args) -> int:
+    """Hundreds of overlapping tool calls against the fake; every command line
+    AutoCAD receives must be exactly one whole command."""
+    fake = FakeTransport(keystroke_time=0.0, paste_time=0.0005, command_time=0.0005)
+    server = load_server("server_lisp_fast", fake)
+    # Really sleep, briefly, between keystrokes, so that without the session
+    # lock other threads get to type in the middle of a command
+    fake.realtime = True
+    server.session.configure(focus_delay=0.001, minimal_delay=0.001, normal_delay=0.001)
+    start = time.perf_counter()
+    results = asyncio.run(run_stress(server, args.calls, args.threads, args.per_thread))
+    wall = time.perf_counter() - start
+    errors = [r for r in results if isinstance(r, BaseException)]
+    parsed = []
+    malformed = []
+    for command in fake.commands:
+        if command.text == "(vl-load-com)":
+            continue
+        entry = parse_stress_command(command.text)
+        if entry is None:
+            malformed.append(command.text)
+        else:
+            parsed.append(entry)
+    sent = sorted((kind, index) for _, kind, index in parsed)
+    expected = sorted([(("line", "circle", "batch")[i % 4], i) for i in range(args.calls) if i % 4 < 3]
+                      + [("thread", i) for i in range(args.threads * args.per_thread)])
+    seqs = [seq for seq, _, _ in parsed]
+    queued = [index for _, kind, index in parsed if kind != "thread"]
+    checks = {
+        "no tool call raised": not errors,
+        "every command line is one whole command": not malformed,
+        "every command sent exactly once": sent == expected,
+        "result sequence numbers in send order": seqs == sorted(set(seqs)),
+        "queued commands in submission order": queued == sorted(queued),
+    }
+    print(f"{args.calls} concurrent tool calls + {args.threads} threads x {args.per_thread} "
+          f"direct commands: {len(fake.commands)} command lines in {wall:.2f}s")
+    for name, ok in checks.items():
+        print(f"  {name}: {'yes' if ok else 'NO'}")
+    for problem in (errors + malformed)[:5]:
+        print(f"    {problem!r}"[:200])
+    return 0 if all(checks.values()) else 1
+
+
+def sample_sheets(count: int, operations: int) -> List[Dict[str, Any]]:
+    rng = random.Random(count)
+    return [{"name": f"PID-{n + 1:03}", "operations": sample_drawing_ops(operations, rng)}
+            for n in range(count)]
+
+
+def pool_run(server, windows: int, sheets: List[Dict[str, Any]], sheet_seconds: float,
+             hung: int = 0) -> Dict[str, Any]:
+    """Draw sheets on a fake desktop with this many AutoCAD windows, the last
+    hung of them accepting input but never finishing anything."""
+    # The fake runs (vl-load-com) and the pasted c:batch-draw as one command each
+    fake = FakeTransport(windows=windows, command_time=sheet_seconds / 2)
+    transport_module.set_transport(fake)
+    server.instance_pool.instances.clear()
+    server.instance_pool.refresh(fake)
+    for instance in server.instance_pool.instances.values():
+        server.initialize_session(instance.session)  # LISP loading is not what's measured
+    fake.hung.update(fake.find_windows()[windows - hung:])
+    fake.reset()
+    fake.realtime = True
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        message = asyncio.run(server.generate_sheets(sheets, output_dir=output_dir))
+        seconds = time.perf_counter() - start
+        cancelled = sorted(name for name in os.listdir(output_dir) if name.endswith(".cancel"))
+    return {"seconds": seconds, "message": message, "cancelled": cancelled,
+            "instances": server.instance_pool.stats()}
+
+
+def bench_pool(args) -> int:
+    """Sheets per hour against the number of AutoCAD instances (real delays)."""
+    server = load_server("server_lisp_fast", FakeTransport())
+    sheets = sample_sheets(args.sheets, args.operations)
+    print(f"{args.sheets} sheets of {args.operations} operations, each taking AutoCAD "
+          f"{args.sheet_seconds:.1f}s to draw")
+    print(f"{'instances':>9} {'drawn':>6} {'wall s':>8} {'sheets/h':>9} {'speedup':>8}")
+    ok = True
+    baseline = None
+    for windows in [int(n) for n in args.instances.split(",")]:
+        result = pool_run(server, windows, sheets, args.sheet_seconds)
+        drawn = int(re.match(r"Drew (\d+)", result["message"]).group(1)) if result["message"].startswith("Drew") else 0
+        baseline = baseline or result["seconds"]
+        ok &= drawn == args.sheets
+        print(f"{windows:9} {drawn:6} {result['seconds']:8.2f} "
+              f"{drawn / result['seconds'] * 3600:9.0f} {baseline / result['seconds']:7.2f}x")
+    # One instance stops responding: its sheets time out and are redrawn elsewhere
+    saved_timeout = server.BATCH_COMPLETION_TIMEOUT
+    server.BATCH_COMPLETION_TIMEOUT = 2 * args.sheet_seconds
+    try:
+        result = pool_run(server, windows, sheets, args.sheet_seconds, hung=1)
+    finally:
+        server.BATCH_COMPLETION_TIMEOUT = saved_timeout
+    summary = result["message"].splitlines()[0].split(", saved to")[0]
+    states = ", ".join(f"{i['name']} {i['status']} ({i['completed']} drawn)" for i in result["instances"])
+    print(f"with one of {windows} instances hung: {summary}")
+    print(f"  {states}")
+    isolated = summary.startswith(f"Drew {args.sheets} of")
+    isolated &= [i["status"] for i in result["instances"]].count("failed") == 1
+    hung_name = result["instances"][-1]["name"]
+    timed_out = result["instances"][-1]["failed"]
+    cancelled = timed_out > 0 and len(result["cancelled"]) == timed_out
+    cancelled &= all(name.endswith(f".{hung_name}.cancel") for name in result["cancelled"])
+    print(f"failed instance isolated and its sheets redrawn elsewhere: {'yes' if isolated else 'NO'}")
+    print(f"each timed-out sheet cancelled before its retry ({timed_out}): "
+          f"{'yes' if cancelled else 'NO'}")
+    return 0 if ok and isolated and cancelled else 1
+
+
+def import_time(module: str) -> float:
+    """Seconds a fresh interpreter spends importing a server module."""
+    code = (f"import time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(result.stdout.split()[-1])
+
+
+async def time_to_ready(module: str, transport_name: str) -> Dict[str, float]:
+    """Spawn a server over stdio the way an MCP host does and time each step
+    from the spawn: handshake, tool listing, a lookup tool, the first drawing."""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    params = StdioServerParameters(command=sys.executable, args=[os.path.join(here, f"{module}.py")],
+                                   env={**os.environ, "AUTOCAD_MCP_TRANSPORT": transport_name},
+                                   cwd=here)
+    timings = {}
+    start = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                timings["ready"] = time.perf_counter() - start
+                tools = {tool.name: tool for tool in (await session.list_tools()).tools}
+                timings["tools"] = time.perf_counter() - start
+                if "list_pid_symbols" in tools:
+                    await session.call_tool("list_pid_symbols", {"category": "VALVES"})
+                    timings["lookup"] = time.perf_counter() - start
+                await session.call_tool("create_line", sample_arguments(tools["create_line"]))
+                timings["first_draw"] = time.perf_counter() - start
+    return timings
+
+
+def bench_startup(args) -> int:
+    print(f"Cold start per entry point (best of {args.repeat}, '{args.transport}' transport), "
+          f"ms from spawn")
+    print(f"{'server':20} {'import':>8} {'ready':>8} {'tools':>8} {'lookup':>8} {'1st draw':>9}")
+    for name in args.server or SERVERS:
+        imported = min(import_time(name) for _ in range(args.repeat))
+        runs = [asyncio.run(time_to_ready(name, args.transport)) for _ in range(args.repeat)]
+        best = {key: min(run[key] for run in runs) for key in runs[0]}
+        lookup = f"{best['lookup'] * 1000:8.0f}" if "lookup" in best else f"{'-':>8}"
+        print(f"{name:20} {imported * 1000:8.0f} {best['ready'] * 1000:8.0f} "
+              f"{best['tools'] * 1000:8.0f} {lookup} {best['first_draw'] * 1000:9.0f}")
+    return 0
+
+
+def bench_routing(args) -> int:
+    """Route random connections across a plant-like grid of equipment footprints."""
+    rng = random.Random(args.seed)
+    router = Router()
+    slots = [(i * 60, j * 60) for i in range(10) for j in range(10)]
+    for x, y in rng.sample(slots, min(args.equipment, len(slots))):
+        router.add_obstacle(x, y, x + 20, y + 15)
+    timings = []
+    unrouted = bends = 0
+    for _ in range(args.routes):
+        start = (rng.randrange(600), rng.randrange(600))
+        end = (rng.randrange(600), rng.randrange(600))
+        began = time.perf_counter()
+        points = router.route_and_add(start, end)
+        timings.append(time.perf_counter() - began)
+        if points is None:
+            unrouted += 1
+        else:
+            bends += max(0, len(points) - 2)
+    timings.sort()
+    total = sum(timings)
+    print(f"{args.routes} routes among {args.equipment} equipment footprints (600 x 600 units)")
+    print(f"routes/s {args.routes / total:.0f}, mean {total / args.routes * 1000:.1f}ms, "
+          f"p95 {timings[int(0.95 * (len(timings) - 1))] * 1000:.1f}ms, "
+          f"max {timings[-1] * 1000:.1f}ms")
+    print(f"unrouted {unrouted}, mean bends {bends / max(1, args.routes - unrouted):.2f}")
+    return 0
+
+
+def bench_scene(args) -> int:
+    """Fill a scene with a mix of entities and time point, area and overlap queries."""
+    rng = random.Random(args.seed)
+    size = 10 * args.entities ** 0.5  # Keeps the density the same for any count
+    scene = Scene()
+    start = time.perf_counter()
+    for i in range(args.entities):
+        x, y = rng.uniform(0, size), rng.uniform(0, size)
+        kind = i % 4
+        if kind == 0:
+            scene.add_block("PUMP", x, y, 10, 10, tag=f"P-{i}")
+        elif kind == 1:
+            scene.add_line(x, y, x + rng.uniform(-50, 50), y)
+        elif kind == 2:
+            scene.add_polyline([(x, y), (x + 20, y), (x + 20, y + 20)])
+        else:
+            scene.add_text(x, y, f"LINE-{i}", 2.5)
+    added = time.perf_counter() - start
+    points = [(rng.uniform(0, size), rng.uniform(0, size)) for _ in range(args.queries)]
+    start = time.perf_counter()
+    hits = sum(len(scene.at(x, y)) for x, y in points)
+    at = time.perf_counter() - start
+    start = time.perf_counter()
+    overlaps = sum(bool(scene.overlaps(x - 5, y - 5, x + 5, y + 5)) for x, y in points)
+    overlap = time.perf_counter() - start
+    start = time.perf_counter()
+    found = sum(scene.find_tag(f"P-{i}") is not None for i in range(0, args.entities, 4))
+    tags = time.perf_counter() - start
+    print(f"{args.entities} entities over {size:.0f} x {size:.0f} units, {args.queries} queries")
+    print(f"{'operation':22} {'total ms':>10} {'per op us':>10}")
+    for name, elapsed, count in (("add", added, args.entities), ("at(x, y)", at, args.queries),
+                                 ("overlaps(10 x 10)", overlap, args.queries),
+                                 ("find_tag", tags, found)):
+        print(f"{name:22} {elapsed * 1000:10.1f} {elapsed / max(1, count) * 1e6:10.1f}")
+    print(f"{hits} point hits, {overlaps} placements blocked, {found} tags found")
+    return 0
+
+
+def sample_drawing_ops(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """A plant-like mix of batch_draw operations: piping, equipment, tags and text."""
+    ops: List[Dict[str, Any]] = [{"type": "pid_layers"}]
+    size = 10 * count ** 0.5
+    for i in range(count):
+        x, y = round(rng.uniform(0, size), 2), round(rng.uniform(0, size), 2)
+        kind = i % 5
+        if kind == 0:
+            ops.append({"type": "process_line", "x1": x, "y1": y, "x2": x + 40, "y2": y})
+        elif kind == 1:
+            ops.append({"type": "valve", "x": x, "y": y, "valve_type": "GLOBE"})
+        elif kind == 2:
+            ops.append({"type": "polyline", "points": [[x, y], [x + 20, y], [x + 20, y + 15]]})
+        elif kind == 3:
+            ops.append({"type": "circle", "center_x": x, "center_y": y, "radius": 2.5})
+        else:
+            ops.append({"type": "text", "x": x, "y": y, "text_string": f"L-{i}"})
+    return ops
+
+
+def bench_dxf(args) -> int:
+    """Time writing a large drawing to DXF against building the same batch_draw payload."""
+    ops = sample_drawing_ops(args.entities, random.Random(args.seed))
+    start = time.perf_counter()
+    payload = "(c:batch-draw '(" + " ".join(map(build_batch_draw_op, ops)) + "))"
+    built = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        with DxfWriter(os.path.join(tmp, "bench.dxf")) as dxf:
+            for op in ops:
+                dxf.write_op(op)
+        written = time.perf_counter() - start
+        size = os.path.getsize(dxf.path)
+    print(f"{len(ops)} batch_draw operations, {dxf.count} DXF entities")
+    print(f"{'output':22} {'total ms':>10} {'per op us':>10} {'KB':>8}")
+    for name, elapsed, chars in (("batch_draw payload", built, len(payload)),
+                                 ("DXF file", written, size)):
+        print(f"{name:22} {elapsed * 1000:10.1f} {elapsed / len(ops) * 1e6:10.1f} {chars / 1024:8.0f}")
+    print(f"The DXF reaches AutoCAD with one import command; the payload is pasted as "
+          f"{len(payload) / 1024:.0f} KB of LISP")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    tools = sub.add_parser("tools", help="call every MCP tool against the fake transport")
+    tools.add_argument("--server", action="append", choices=SERVERS)
+    tools.add_argument("--iterations", type=int, default=5)
+    tools.set_defaults(func=bench_tools)
+
+    serializer = sub.add_parser("serializer", help="time LISP command building for large polylines")
+    serializer.add_argument("--points", type=int, default=100000)
+    serializer.add_argument("--repeat", type=int, default=5)
+    serializer.add_argument("--precision", type=int, default=6,
+                            help="decimal places to round to, as the fast server does by default")
+    serializer.set_defaults(func=bench_serializer)
+
+    pacing = sub.add_parser("pacing", help="compare fixed and adaptive delays on a slow fake AutoCAD")
+    pacing.add_argument("--commands", type=int, default=200)
+    pacing.add_argument("--response-ms", type=float, default=30.0)
+    pacing.set_defaults(func=bench_pacing)
+
+    startup = sub.add_parser("startup", help="time imports and time-to-ready of each server process")
+    startup.add_argument("--server", action="append", choices=SERVERS)
+    startup.add_argument("--repeat", type=int, default=3)
+    startup.add_argument("--transport", default="fake-realtime", choices=sorted(transport_module.TRANSPORTS))
+    startup.set_defaults(func=bench_startup)
+
+    routing = sub.add_parser("routing", help="time the orthogonal pipe router on a dense random layout")
+    routing.add_argument("--routes", type=int, default=200)
+    routing.add_argument("--equipment", type=int, default=70)
+    routing.add_argument("--seed", type=int, default=1)
+    routing.set_defaults(func=bench_routing)
+
+    scene = sub.add_parser("scene", help="time the scene model's inserts and spatial queries")
+    scene.add_argument("--entities", type=int, default=10000)
+    scene.add_argument("--queries", type=int, default=10000)
+    scene.add_argument("--seed", type=int, default=1)
+    scene.set_defaults(func=bench_scene)
+
+    dxf = sub.add_parser("dxf", help="time writing a large drawing as a DXF file")
+    dxf.add_argument("--entities", type=int, default=10000)
+    dxf.add_argument("--seed", type=int, default=1)
+    dxf.set_defaults(func=bench_dxf)
+
+    script = sub.add_parser("script", help="compare typed, pasted and script-file command runs")
+    script.add_argument("--commands", type=int, default=500)
+    script.set_defaults(func=bench_script)
+
+    dispatch = sub.add_parser("dispatch", help="time other tools while drawing commands are sent")
+    dispatch.add_argument("--commands", type=int, default=10)
+    dispatch.set_defaults(func=bench_dispatch)
+
+    stress = sub.add_parser("stress", help="check overlapping tool calls never interleave their commands")
+    stress.add_argument("--calls", type=int, default=400)
+    stress.add_argument("--threads", type=int, default=4)
+    stress.add_argument("--per-thread", type=int, default=25)
+    stress.set_defaults(func=bench_stress)
+
+    pool = sub.add_parser("pool", help="sheets per hour with one to several AutoCAD instances")
+    pool.add_argument("--sheets", type=int, default=8)
+    pool.add_argument("--operations", type=int, default=200)
+    pool.add_argument("--instances", default="1,2,4")
+    pool.add_argument("--sheet-seconds", type=float, default=1.0)
+    pool.set_defaults(func=bench_pool)
+
+    args = parser.parse_args()
+    os.environ.setdefault("AUTOCAD_MCP_SYMBOL_LIBRARY", sample_symbol_library())
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Payload Compaction
+Drops geometry that would draw nothing or draw the same thing twice before it
+is serialized, so fewer characters have to be typed or pasted into AutoCAD.
+
+Coordinates are compared after rounding to the serializer's drawing precision,
+so two points that would be sent as the same text count as the same point.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from lisp_serializer import get_precision
+
+
+def _rounder(decimals: Optional[int]):
+    if decimals is None:
+        return lambda value: value
+    return lambda value: round(value, decimals) + 0
+
+
+def compact_lines(lines: Sequence[Sequence[float]],
+                  decimals: Optional[int] = None) -> Tuple[List[List[float]], int]:
+    """Remove zero-length and duplicate [x1, y1, x2, y2] lines.
+
+    A line and its reverse count as duplicates. Returns (kept lines, number dropped).
+    """
+    rnd = _rounder(get_precision() if decimals is None else decimals)
+    seen = set()
+    kept = []
+    for line in lines:
+        x1, y1, x2, y2 = (rnd(v) for v in line)
+        start, end = (x1, y1), (x2, y2)
+        if start == end:
+            continue
+        key = (start, end) if start <= end else (end, start)
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append([x1, y1, x2, y2])
+    return kept, len(lines) - len(kept)
+
+
+def compact_circles(circles: Sequence[Sequence[float]],
+                    decimals: Optional[int] = None) -> Tuple[List[List[float]], int]:
+    """Remove circles with a non-positive radius and exact duplicates.
+
+    Returns (kept circles, number dropped).
+    """
+    rnd = _rounder(get_precision() if decimals is None else decimals)
+    seen = set()
+    kept = []
+    for circle in circles:
+        cx, cy, radius = (rnd(v) for v in circle)
+        if radius <= 0 or (cx, cy, radius) in seen:
+            continue
+        seen.add((cx, cy, radius))
+        kept.append([cx, cy, radius])
+    return kept, len(circles) - len(kept)
+
+
+def compact_points(points: Sequence[Sequence[float]], closed: bool = False,
+                   decimals: Optional[int] = None) -> Tuple[List[Tuple[float, float]], int]:
+    """Remove repeated consecutive polyline vertices.
+
+    For a closed polyline a final vertex equal to the first is dropped too,
+    since closing the polyline already draws that segment.
+    Returns (kept points, number dropped).
+    """
+    rnd = _rounder(get_precision() if decimals is None else decimals)
+    kept: List[Tuple[float, float]] = []
+    for point in points:
+        x, y = (rnd(v) for v in point)
+        if kept and kept[-1] == (x, y):
+            continue
+        kept.append((x, y))
+    if closed and len(kept) > 2 and kept[-1] == kept[0]:
+        kept.pop()
+    return kept, len(points) - len(kept)
+
+
+def payload_summary(chars: int, dropped: int = 0, what: str = "items") -> str:
+    """One-line report of the payload sent and what compaction dropped from it."""
+    parts = []
+    if chars:
+        parts.append(f"Payload {chars} chars")
+    if dropped:
+        parts.append(f"{dropped} degenerate or duplicate {what} dropped")
+    return ", ".join(parts)
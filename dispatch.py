@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Command Dispatcher
+Keeps the UI automation that talks to AutoCAD off the MCP event loop.
+
+Sending a command types, pastes and sleeps for a second or more, and a large
+batch much longer. Done inline in an async tool, that blocks the event loop,
+so even tools that never touch AutoCAD (symbol search, settings, scene
+queries) wait until the batch is finished. The dispatcher instead queues each
+send as a job. One worker task takes jobs off the queue in order and runs
+each on a single dedicated thread, the only thread that uses the transport.
+Tools await the job's future and the event loop stays free in the meantime.
+
+Jobs run strictly in submission order, one at a time, so AutoCAD sees
+commands in exactly the order the tools submitted them:
+
+    dispatcher = Dispatcher()
+    success, message = await dispatcher.run(execute_lisp_command_fast, command)
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("autocad-lisp-mcp.dispatch")
+
+Job = Tuple[asyncio.Future, Callable[..., Any], Tuple[Any, ...], float]
+
+
+class Dispatcher:
+    """FIFO job queue whose jobs run one at a time on a single worker thread."""
+
+    def __init__(self, name: str = "autocad"):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.current: Optional[str] = None  # Name of the job running now
+        self.completed = 0
+        self.busy_seconds = 0.0
+        self.max_wait = 0.0  # Longest a job waited in the queue, in seconds
+
+    @property
+    def pending(self) -> int:
+        """Jobs queued and not yet started."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_worker(self) -> "asyncio.Queue[Job]":
+        """The queue for the running event loop, starting its worker if needed.
+        A new loop (each asyncio.run in the benchmarks) gets a new queue."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            if self._queue is not None and self._loop is loop:
+                queue = self._queue  # Worker died; keep the jobs it had not started
+            else:
+                queue = asyncio.Queue()
+            self._loop, self._queue = loop, queue
+            self._worker = loop.create_task(self._work())
+        return self._queue
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Queue func(*args) and return a future for its result. The job is
+        queued before this returns, so submission order is execution order."""
+        queue = self._ensure_worker()
+        future = self._loop.create_future()
+        queue.put_nowait((future, func, args, time.perf_counter()))
+        return future
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Queue func(*args), wait for it to run and return its result."""
+        return await self.submit(func, *args)
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            future, func, args, queued = await self._queue.get()
+            if future.cancelled():
+                continue  # The caller gave up before the job started
+            started = time.perf_counter()
+            self.max_wait = max(self.max_wait, started - queued)
+            self.current = getattr(func, "__name__", repr(func))
+            try:
+                result = await loop.run_in_executor(self._executor, func, *args)
+            except Exception as e:
+                logger.error(f"{self.current} failed on the {self.name} worker: {e}")
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.current = None
+                self.completed += 1
+                self.busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self.pending, "current": self.current, "completed": self.completed,
+                "busy_seconds": self.busy_seconds, "max_wait": self.max_wait}
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - DXF Writer
+Writes batch_draw operations straight to an AutoCAD R12 DXF file, so a large
+drawing is generated in Python in well under a second and brought into
+AutoCAD with one INSERT instead of being typed or pasted entity by entity.
+
+Entities are streamed to a side file as they are written, so memory stays flat
+however many there are. close() writes the header, layer table and blocks
+(which DXF wants before the entities) and appends the entities to them.
+
+Library symbols and other blocks are written as INSERTs of empty placeholder
+definitions. c:import-dxf (batch_operations.lsp) loads the real definitions
+into the drawing first, and AutoCAD keeps a drawing's own definition over the
+one in an inserted file, so the placeholders never show. Operations a DXF
+can't carry (blocks with an ID attribute, which must be indexed) are kept in
+`deferred` and sent as LISP after the import.
+
+R12 has no ellipse or MTEXT: ellipses are written as closed polylines and
+MTEXT as single-line TEXT. The output has no handles or timestamps, so the
+same operations always give the same file:
+
+    with DxfWriter("plant.dxf") as dxf:
+        dxf.write_op({"type": "pid_layers"})
+        dxf.write_op({"type": "process_line", "x1": 0, "y1": 0, "x2": 50, "y2": 0})
+        dxf.write_op({"type": "valve", "x": 25, "y": 0})
+"""
+import math
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from batching import (PID_LAYERS, PID_TOOL_LAYERS, PROCESS_LAYER, batch_draw_fields,
+                      pid_type_symbol)
+from lisp_serializer import lisp_number
+from routing import elbow_route
+
+# Layer color names c:create_or_set_layer accepts, as AutoCAD Color Index numbers
+ACI_COLORS = {"red": 1, "yellow": 2, "green": 3, "cyan": 4, "blue": 5, "magenta": 6,
+              "white": 7, "black": 7}
+ELLIPSE_SEGMENTS = 72
+# TEXT justification -> (group 72 horizontal, group 73 vertical)
+_JUSTIFY = {"left": (0, 0), "middle": (4, 0), "top_center": (1, 3)}
+
+
+def aci_color(color: Any) -> int:
+    text = str(color).strip().lower()
+    if text.isdigit() and 1 <= int(text) <= 255:
+        return int(text)
+    return ACI_COLORS.get(text, 7)
+
+
+def dxf_text(value: str) -> str:
+    """A string as R12 TEXT content: one line, non-ASCII as \\U+XXXX escapes."""
+    value = value.replace("\r", " ").replace("\n", " ")
+    if value.isascii():
+        return value
+    return "".join(c if c.isascii() else f"\\U+{ord(c):04X}" for c in value)
+
+
+class DxfWriter:
+    """Streams batch_draw operations into an R12 DXF file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.layers: Dict[str, int] = {"0": 7}  # Layer name -> ACI color
+        self.current_layer = "0"
+        self.blocks: Dict[str, None] = {}  # Block names INSERTed, in first-use order
+        self.symbols: List[Tuple[str, str]] = []  # Library (category, name) to load before import
+        self.deferred: List[Dict[str, Any]] = []  # Operations to send as LISP after the import
+        self.count = 0  # Entities written
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._entities_path = path + ".entities"
+        self._out = open(self._entities_path, "w", encoding="ascii")
+
+    def __enter__(self) -> "DxfWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def closed(self) -> bool:
+        return self._out.closed
+
+    # ---- layers -----------------------------------------------------------------
+
+    def set_layer(self, name: str, color: Any = None, current: bool = True) -> None:
+        """Only CONTINUOUS is defined in the file, so layers are written with it;
+        a layer the drawing already has keeps its own settings on import anyway."""
+        if color is not None or name not in self.layers:
+            self.layers[name] = aci_color(color if color is not None else "white")
+        if current:
+            self.current_layer = name
+
+    def _layer(self, name: Optional[str], current: bool = True) -> str:
+        """Layer for an entity: name (made current unless told otherwise, as
+        the LISP commands do) or the current one."""
+        if name:
+            if name not in self.layers:
+                self.set_layer(name, current=False)
+            if current:
+                self.current_layer = name
+            return name
+        return self.current_layer
+
+    # ---- entities ---------------------------------------------------------------
+
+    def _entity(self, kind: str, layer: str, groups: Sequence[Tuple[int, Any]],
+                color: Optional[int] = None) -> None:
+        parts = [f"  0\n{kind}\n  8\n{layer}\n"]
+        if color is not None:
+            parts.append(f" 62\n{color}\n")
+        for code, value in groups:
+            if 10 <= code < 60:  # Coordinates, sizes and angles are reals
+                value = lisp_number(value)
+            parts.append(f"{code:3d}\n{value}\n")
+        self._out.write("".join(parts))
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, layer: Optional[str] = None,
+             color: Optional[int] = None) -> None:
+        self._entity("LINE", self._layer(layer, False), ((10, x1), (20, y1), (30, 0.0),
+                                                         (11, x2), (21, y2), (31, 0.0)), color)
+        self.count += 1
+
+    def polyline(self, points: Sequence[Sequence[float]], closed: bool = False,
+                 layer: Optional[str] = None, current: bool = True) -> None:
+        layer = self._layer(layer, current)
+        self._entity("POLYLINE", layer, ((66, 1), (10, 0.0), (20, 0.0), (30, 0.0),
+                                         (70, 1 if closed else 0)))
+        for x, y, *_ in points:
+            self._entity("VERTEX", layer, ((10, x), (20, y), (30, 0.0)))
+        self._entity("SEQEND", layer, ())
+        self.count += 1
+
+    def circle(self, x: float, y: float, radius: float, layer: Optional[str] = None,
+               color: Optional[int] = None) -> None:
+        self._entity("CIRCLE", self._layer(layer, False),
+                     ((10, x), (20, y), (30, 0.0), (40, radius)), color)
+        self.count += 1
+
+    def arc(self, x: float, y: float, radius: float, start_angle: float, end_angle: float,
+            layer: Optional[str] = None) -> None:
+        self._entity("ARC", self._layer(layer), ((10, x), (20, y), (30, 0.0), (40, radius),
+                                                 (50, start_angle), (51, end_angle)))
+        self.count += 1
+
+    def ellipse(self, x: float, y: float, major_dx: float, major_dy: float, ratio: float,
+                layer: Optional[str] = None) -> None:
+        """An ellipse (major axis end relative to the centre) as a closed polyline."""
+        minor_dx, minor_dy = -major_dy * ratio, major_dx * ratio
+        points = []
+        for i in range(ELLIPSE_SEGMENTS):
+            angle = 2 * math.pi * i / ELLIPSE_SEGMENTS
+            c, s = math.cos(angle), math.sin(angle)
+            points.append((x + major_dx * c + minor_dx * s, y + major_dy * c + minor_dy * s))
+        self.polyline(points, True, layer)
+
+    def text(self, x: float, y: float, height: float, value: str, rotation: float = 0.0,
+             justify: str = "left", layer: Optional[str] = None, current: bool = True,
+             color: Optional[int] = None) -> None:
+        horizontal, vertical = _JUSTIFY[justify]
+        groups = [(10, x), (20, y), (30, 0.0), (40, height), (1, dxf_text(value))]
+        if rotation:
+            groups.append((50, rotation))
+        if horizontal or vertical:
+            groups += [(72, horizontal), (11, x), (21, y), (31, 0.0), (73, vertical)]
+        self._entity("TEXT", self._layer(layer, current), groups, color)
+        self.count += 1
+
+    def insert(self, name: str, x: float, y: float, scale: float = 1.0, rotation: float = 0.0,
+               layer: Optional[str] = None, category: Optional[str] = None) -> None:
+        """A block reference. With a library category, the symbol is loaded before import."""
+        self.blocks.setdefault(name, None)
+        if category is not None and (category, name) not in self.symbols:
+            self.symbols.append((category, name))
+        groups = [(2, name), (10, x), (20, y), (30, 0.0)]
+        if scale != 1:
+            groups += [(41, scale), (42, scale), (43, scale)]
+        if rotation:
+            groups.append((50, rotation))
+        self._entity("INSERT", self._layer(layer), groups)
+        self.count += 1
+
+    # ---- batch_draw operations ----------------------------------------------------
+
+    def write_op(self, op: Dict[str, Any]) -> bool:
+        """Write one (valid) batch_draw operation. Lines, circles, text and
+        polylines may also carry an entity "layer" (and lines, circles and text
+        an ACI "color", and text a "justify"), as the batch_create_* tools and
+        routed process lines draw them; unlike the operations' own layer fields, these don't make
+        the layer current. Returns False if the operation was deferred to be
+        sent as LISP after the import."""
+        op_type = op["type"]
+        f = batch_draw_fields(op)
+        layer = f.get("layer")
+        entity_layer, color = op.get("layer"), op.get("color")
+        if op_type == "line":
+            self.line(f["x1"], f["y1"], f["x2"], f["y2"], entity_layer, color)
+        elif op_type == "circle":
+            self.circle(f["center_x"], f["center_y"], f["radius"], entity_layer, color)
+        elif op_type == "text":
+            self.text(f["x"], f["y"], f["height"], f["text_string"], f["rotation"],
+                      op.get("justify", "middle"), entity_layer, False, color)
+        elif op_type == "mtext":
+            self.text(f["x"], f["y"], f["height"], f["text_string"], f["rotation"], layer=layer)
+        elif op_type == "polyline":
+            self.polyline(f["points"], bool(f["closed"]), entity_layer, False)
+        elif op_type == "rectangle":
+            x1, y1, x2, y2 = f["x1"], f["y1"], f["x2"], f["y2"]
+            self.polyline([(x1, y1), (x2, y1), (x2, y2), (x1, y2)], True, layer)
+        elif op_type == "arc":
+            self.arc(f["center_x"], f["center_y"], f["radius"], f["start_angle"], f["end_angle"],
+                     layer)
+        elif op_type == "ellipse":
+            self.ellipse(f["center_x"], f["center_y"], f["major_axis_end_x"],
+                         f["major_axis_end_y"], f["minor_axis_ratio"], layer)
+        elif op_type == "layer":
+            self.set_layer(f["layer_name"], f["color"])
+        elif op_type == "pid_layers":
+            for name, color in PID_LAYERS.items():
+                self.set_layer(name, color, current=False)
+        elif op_type == "block":
+            if f["block_id"]:
+                self.deferred.append(op)  # The ID attribute is set and indexed by c:insert_block
+                return False
+            self.insert(f["block_name"], f["x"], f["y"], f["scale"], f["rotation"])
+        elif op_type == "pid_symbol":
+            self.insert(f["symbol_name"], f["x"], f["y"], f["scale"], f["rotation"],
+                        category=f["category"])
+        elif op_type == "process_line":
+            self.polyline([(f["x1"], f["y1"]), (f["x2"], f["y2"])], layer=PROCESS_LAYER)
+        elif op_type == "connect_equipment":
+            self.polyline(elbow_route(f["x1"], f["y1"], f["x2"], f["y2"]), layer=PROCESS_LAYER)
+        elif op_type == "flow_arrow":
+            self.insert("ANNOT-FLOWARROW", f["x"], f["y"], rotation=f["rotation"],
+                        category="ANNOTATION")
+        elif op_type == "equipment_tag":
+            layer = PID_TOOL_LAYERS[op_type]
+            self.insert("ANNOT-EQUIP_TAG", f["x"], f["y"], layer=layer, category="ANNOTATION")
+            self.text(f["x"], f["y"], 2.5, f["tag"], justify="middle", layer=layer)
+            if f["description"]:
+                self.text(f["x"], f["y"] - 4.0, 2.0, f["description"], justify="top_center",
+                          layer=layer)
+        elif op_type == "line_number":
+            layer = PID_TOOL_LAYERS[op_type]
+            self.insert("ANNOT-LINE_NUMBER", f["x"], f["y"], layer=layer, category="ANNOTATION")
+            self.text(f["x"], f["y"], 2.0, f"{f['line_num']}-{f['spec']}", justify="middle",
+                      layer=layer)
+        elif op_type in ("valve", "instrument", "pump", "tank"):
+            category, name, scale = pid_type_symbol(op_type, f[f"{op_type}_type"])
+            self.insert(name, f["x"], f["y"], scale * f.get("scale", 1.0), f.get("rotation", 0.0),
+                        PID_TOOL_LAYERS.get(op_type), category)
+        else:
+            raise ValueError(f"unknown type {op_type!r}")
+        return True
+
+    # ---- finishing ----------------------------------------------------------------
+
+    def _head(self) -> str:
+        parts = ["  0\nSECTION\n  2\nHEADER\n  9\n$ACADVER\n  1\nAC1009\n  0\nENDSEC\n",
+                 "  0\nSECTION\n  2\nTABLES\n",
+                 "  0\nTABLE\n  2\nLTYPE\n 70\n1\n",
+                 "  0\nLTYPE\n  2\nCONTINUOUS\n 70\n0\n  3\nSolid line\n 72\n65\n 73\n0\n 40\n0.0\n",
+                 "  0\nENDTAB\n",
+                 f"  0\nTABLE\n  2\nLAYER\n 70\n{len(self.layers)}\n"]
+        for name, color in self.layers.items():
+            parts.append(f"  0\nLAYER\n  2\n{name}\n 70\n0\n 62\n{color}\n  6\nCONTINUOUS\n")
+        parts.append("  0\nENDTAB\n  0\nENDSEC\n  0\nSECTION\n  2\nBLOCKS\n")
+        for name in self.blocks:
+            parts.append(f"  0\nBLOCK\n  8\n0\n  2\n{name}\n 70\n0\n 10\n0.0\n 20\n0.0\n 30\n0.0\n"
+                         f"  3\n{name}\n  0\nENDBLK\n  8\n0\n")
+        parts.append("  0\nENDSEC\n  0\nSECTION\n  2\nENTITIES\n")
+        return "".join(parts)
+
+    def close(self) -> str:
+        """Finish the file and return its path."""
+        if not self._out.closed:
+            self._out.close()
+            with open(self.path, "w", encoding="ascii") as out:
+                out.write(self._head())
+                with open(self._entities_path, encoding="ascii") as entities:
+                    shutil.copyfileobj(entities, out, 1 << 20)
+                out.write("  0\nENDSEC\n  0\nEOF\n")
+            os.remove(self._entities_path)
+        return self.path
+
+    def abort(self) -> None:
+        """Stop writing and delete the partial output."""
+        if not self._out.closed:
+            self._out.close()
+        for path in (self._entities_path, self.path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Instance Pool
+Spreads sheet jobs over every AutoCAD drawing window on the desktop instead of
+only the first one, so a project's sheets are drawn by several instances at once.
+
+Each instance gets its own AutoCADSession (see session.py): its own loaded-LISP
+registry, lock and worker thread. The instances share one keyboard and
+clipboard, so keystrokes still go to one instance at a time, but typing a
+sheet takes a fraction of a second and drawing it takes much longer. While one
+instance draws, the next is typed into, so sheets per hour grow with the
+number of instances until typing itself becomes the limit.
+
+Jobs are assigned as they are submitted to the instance with the least work
+outstanding (weighted by job size) and wait in that instance's queue. A failed
+job is retried on another instance. An instance whose jobs fail max_failures
+times in a row is taken out of rotation and its queued jobs move elsewhere;
+the other instances carry on unaffected. A job that raises TimeoutError got no
+answer at all, so its instance is taken out at once: it may still be busy
+with that job, and the job must make sure a late finish is discarded before
+raising, since it is retried elsewhere:
+
+    pool = InstancePool(session, make_session)
+    pool.refresh(transport)                        # find the open windows
+    results = await pool.run([("PID-001", 120, job), ...])
+    # job(session) -> awaitable (success, message), e.g. session.run(...),
+    # raising TimeoutError when the instance did not answer
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from session import AutoCADSession
+
+logger = logging.getLogger("autocad-lisp-mcp.instance_pool")
+
+Job = Callable[[AutoCADSession], Awaitable[Tuple[bool, str]]]
+
+
+@dataclass
+class PoolInstance:
+    """One AutoCAD window in the pool and how its jobs have gone."""
+    session: AutoCADSession
+    title: str
+    status: str = "ready"  # "ready", "failed" (out of rotation) or "closed" (window gone)
+    outstanding: float = 0.0  # Weight of jobs assigned to it and not finished
+    completed: int = 0
+    failed: int = 0
+    consecutive_failures: int = 0
+    last_error: str = ""
+
+    @property
+    def window(self) -> int:
+        return self.session.window
+
+    @property
+    def available(self) -> bool:
+        return self.status == "ready"
+
+
+@dataclass
+class JobResult:
+    """Outcome of one job; instance is the one that ran its last attempt."""
+    name: str
+    success: bool
+    message: str
+    instance: str
+    attempts: int
+    seconds: float
+
+
+class InstancePool:
+    """The AutoCAD instances jobs can run in, with per-instance queues."""
+
+    def __init__(self, primary: AutoCADSession,
+                 make_session: Callable[[int, str], AutoCADSession], max_failures: int = 2):
+        self.primary = primary  # The session the other tools draw with; reused for its window
+        self.make_session = make_session
+        self.max_failures = max(1, max_failures)
+        self.instances: Dict[int, PoolInstance] = {}
+
+    def refresh(self, transport, retry_failed: bool = False) -> List[PoolInstance]:
+        """Track the AutoCAD windows open now. New windows join the pool, closed
+        ones leave rotation (and rejoin if they reappear), and with retry_failed
+        instances taken out for failing get another chance."""
+        windows = transport.find_windows()
+        for hwnd in windows:
+            instance = self.instances.get(hwnd)
+            if instance is None:
+                if hwnd == self.primary.find_window():
+                    target = self.primary
+                else:
+                    target = self.make_session(hwnd, f"autocad-{len(self.instances) + 1}")
+                self.instances[hwnd] = PoolInstance(target, transport.window_title(hwnd))
+                logger.info(f"Found AutoCAD instance {target.name}: {self.instances[hwnd].title}")
+            elif instance.status == "closed" or (retry_failed and instance.status == "failed"):
+                instance.status = "ready"
+                instance.consecutive_failures = 0
+        for hwnd, instance in self.instances.items():
+            if hwnd not in windows:
+                instance.status = "closed"
+        return [instance for instance in self.instances.values() if instance.available]
+
+    def assign(self, weight: float, exclude: Sequence[int] = ()) -> Optional[PoolInstance]:
+        """Reserve the available instance with the least outstanding work,
+        skipping windows in exclude. None when no instance is available."""
+        candidates = [instance for instance in self.instances.values()
+                      if instance.available and instance.window not in exclude]
+        if not candidates:
+            return None
+        instance = min(candidates, key=lambda candidate: candidate.outstanding)
+        instance.outstanding += weight
+        return instance
+
+    def _failed(self, instance: PoolInstance, message: str, unresponsive: bool = False) -> None:
+        instance.failed += 1
+        instance.consecutive_failures += 1
+        instance.last_error = message
+        if not instance.available:
+            return
+        if unresponsive:
+            instance.status = "failed"
+            logger.warning(f"Taking {instance.session.name} out of rotation, it did not answer: "
+                           f"{message}")
+        elif instance.consecutive_failures >= self.max_failures:
+            instance.status = "failed"
+            logger.warning(f"Taking {instance.session.name} out of rotation after "
+                           f"{instance.consecutive_failures} failed jobs: {message}")
+
+    async def run(self, jobs: Sequence[Tuple[str, float, Job]], retries: int = 1) -> List[JobResult]:
+        """Run (name, weight, job) jobs across the pool, at most one per instance
+        at a time. Results come back in the order of jobs."""
+        turns = {hwnd: asyncio.Lock() for hwnd in self.instances}  # FIFO per instance
+        return await asyncio.gather(*(self._run_job(turns, name, weight, job, retries)
+                                      for name, weight, job in jobs))
+
+    async def _run_job(self, turns: Dict[int, asyncio.Lock], name: str, weight: float,
+                       job: Job, retries: int) -> JobResult:
+        started = time.perf_counter()
+        tried: List[int] = []
+        ran: Optional[PoolInstance] = None
+        success, message = False, "No AutoCAD instance available"
+        while len(tried) <= retries:
+            instance = self.assign(weight, tried)
+            if instance is None:
+                break
+            async with turns.setdefault(instance.window, asyncio.Lock()):
+                if not instance.available:
+                    # Taken out of rotation while this job waited; queue it elsewhere
+                    instance.outstanding -= weight
+                    continue
+                tried.append(instance.window)
+                ran = instance
+                unresponsive = False
+                try:
+                    success, message = await job(instance.session)
+                except TimeoutError as e:
+                    success, message, unresponsive = False, str(e), True
+                except Exception as e:
+                    success, message = False, f"{type(e).__name__}: {e}"
+                finally:
+                    instance.outstanding -= weight
+            if success:
+                instance.completed += 1
+                instance.consecutive_failures = 0
+                break
+            self._failed(instance, message, unresponsive)
+        return JobResult(name=name, success=success, message=message,
+                         instance=ran.session.name if ran else "-",
+                         attempts=len(tried), seconds=time.perf_counter() - started)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{"name": instance.session.name, "title": instance.title,
+                 "status": instance.status, "outstanding": instance.outstanding,
+                 "completed": instance.completed, "failed": instance.failed,
+                 "last_error": instance.last_error,
+                 "queue": instance.session.dispatcher.stats()}
+                for instance in self.instances.values()]
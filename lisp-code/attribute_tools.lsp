@@ -6,11 +6,12 @@
 (defun c:insert-block-simple (block-path x y scale rotation / block-name slash-pos dot-pos old-attreq)
   "Insert a block without attribute prompting"
   ;; Extract block name from path without using VL functions (for LT compatibility)
-  ;; Find last slash
+  ;; Find last slash (either kind, so a Windows path still yields the block name
+  ;; and an already-defined block isn't loaded from disk again)
   (setq slash-pos 0)
   (setq i 1)
   (while (<= i (strlen block-path))
-    (if (= (substr block-path i 1) "/")
+    (if (member (substr block-path i 1) '("/" "\\"))
       (setq slash-pos i))
     (setq i (1+ i))
   )
@@ -27,14 +28,8 @@
     (setq block-name (substr block-name 1 (1- dot-pos)))
   )
   
-  ;; Check if block already exists
-  (if (not (tblsearch "BLOCK" block-name))
-    (progn
-      ;; Load block definition first with cancel
-      (command "_.-INSERT" block-path nil)
-      (princ (strcat "\nLoaded block definition: " block-name))
-    )
-  )
+  ;; Load the definition only if the drawing doesn't have it yet
+  (mcp-define-block block-path block-name)
   
   ;; Insert block WITHOUT attribute prompting
   (setq old-attreq (getvar "ATTREQ"))
@@ -83,7 +78,7 @@
 (defun c:insert-pid-equipment (category symbol-name x y scale rotation equipment-no equipment-type manufacturer model-no line-no capacity / block-path block-ent)
   "Insert P&ID equipment with proper CTO block attributes"
   ;; Build full path
-  (setq block-path (strcat "C:/PIDv4-CTO/" category "/" symbol-name ".dwg"))
+  (setq block-path (mcp-symbol-path category symbol-name))
   
   ;; Insert block without attribute prompting
   (c:insert-block-simple block-path x y scale rotation)
@@ -166,7 +161,7 @@
   )
   
   ;; Build path and insert
-  (setq block-path (strcat "C:/PIDv4-CTO/VALVES/" symbol-name ".dwg"))
+  (setq block-path (mcp-symbol-path "VALVES" symbol-name))
   (c:insert-block-simple block-path x y 1.0 0)
   
   ;; Get the inserted block and update CTO valve attributes
@@ -186,7 +181,7 @@
 ;; Insert equipment tag annotation block
 (defun c:insert-equipment-tag (x y equipment-tag / block-path block-ent)
   "Insert ANNOT-EQUIP_TAG block with EQUIP_NUMBER attribute"
-  (setq block-path "C:/PIDv4-CTO/ANNOTATION/ANNOT-EQUIP_TAG.dwg")
+  (setq block-path (mcp-symbol-path "ANNOTATION" "ANNOT-EQUIP_TAG"))
   
   ;; Insert tag block
   (c:insert-block-simple block-path x y 1.0 0)
@@ -201,7 +196,7 @@
 ;; Insert equipment description annotation block
 (defun c:insert-equipment-description (x y equipment-name description1 description2 description3 description4 description5 description6 / block-path block-ent underlined-name)
   "Insert ANNOT-EQUIP_DESCR block with EQUIP and DESCR1-6 attributes"
-  (setq block-path "C:/PIDv4-CTO/ANNOTATION/ANNOT-EQUIP_DESCR.dwg")
+  (setq block-path (mcp-symbol-path "ANNOTATION" "ANNOT-EQUIP_DESCR"))
   
   ;; Insert description block
   (c:insert-block-simple block-path x y 1.0 0)
@@ -231,7 +226,7 @@
 ;; Insert line number annotation block
 (defun c:insert-line-number (x y line-number / block-path block-ent)
   "Insert ANNOT-LINE_NUMBER block with LINE_NUMBER attribute"
-  (setq block-path "C:/PIDv4-CTO/ANNOTATION/ANNOT-LINE_NUMBER.dwg")
+  (setq block-path (mcp-symbol-path "ANNOTATION" "ANNOT-LINE_NUMBER"))
   
   ;; Insert line number block
   (c:insert-block-simple block-path x y 1.0 0)
@@ -263,7 +258,7 @@
   )
   
   ;; Build path and insert
-  (setq block-path (strcat "C:/PIDv4-CTO/" category "/" symbol-name ".dwg"))
+  (setq block-path (mcp-symbol-path category symbol-name))
   (c:insert-block-simple block-path x y 0.75 0)
   
   ;; Get the inserted block and update attributes
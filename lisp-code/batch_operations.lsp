@@ -1,8 +1,113 @@
 ;;; Batch Operations for Performance Optimization
 ;;; Execute multiple drawing commands in a single call
 
-(defun c:batch-create-lines (lines-data / line-spec)
+;; --------------------------------------------------------------------------
+;; Bulk creation helpers. The batch-create functions build entities with
+;; entmake, which bypasses the command processor and OSNAP entirely. The whole
+;; batch is wrapped in one undo group and OSMODE/CMDECHO are restored
+;; afterwards. The batch runs under vl-catch-all-apply rather than a temporary
+;; *error* handler, because mcp-run already catches errors before *error* is
+;; called, and command-s closes the undo group because it also works while
+;; an error is being handled.
+
+(defun mcp-bulk-begin ()
+  (setq *mcp-bulk-saved* (list (getvar "OSMODE") (getvar "CMDECHO")))
+  (setvar "CMDECHO" 0)
+  (setvar "OSMODE" 0)
+  (command-s "_.UNDO" "_BEGIN"))
+
+(defun mcp-bulk-end ()
+  (command-s "_.UNDO" "_END")
+  (if *mcp-bulk-saved*
+    (progn
+      (setvar "OSMODE" (car *mcp-bulk-saved*))
+      (setvar "CMDECHO" (cadr *mcp-bulk-saved*))))
+  (setq *mcp-bulk-saved* nil))
+
+(defun mcp-bulk-apply (func specs noun / result)
+  "Call (FUNC SPECS) between mcp-bulk-begin and mcp-bulk-end; FUNC returns the
+   number of entities it created, printed as \"Created N NOUN\". Settings are
+   restored even when FUNC fails; the error object is then returned, so
+   mcp-run reports the failure."
+  (mcp-bulk-begin)
+  (setq result (vl-catch-all-apply func (list specs)))
+  (mcp-bulk-end)
+  (if (vl-catch-all-error-p result)
+    (progn
+      (princ (strcat "\nBatch interrupted: " (vl-catch-all-error-message result)))
+      result)
+    (progn
+      (princ (strcat "\nCreated " (itoa result) " " noun))
+      (princ))))
+
+(defun mcp-entity-props (layer color)
+  "DXF layer (8) and color (62) pairs for an entity; current layer when LAYER is nil"
+  (append
+    (list (cons 8 (if layer layer (getvar "CLAYER"))))
+    (if color (list (cons 62 color)))))
+
+(defun mcp-bulk-lines (lines-data / line-spec count)
+  (setq count 0)
+  (foreach line-spec lines-data
+    (if (and (>= (length line-spec) 4)
+             (entmake (append
+                        '((0 . "LINE"))
+                        (mcp-entity-props (nth 4 line-spec) (nth 5 line-spec))
+                        (list (list 10 (nth 0 line-spec) (nth 1 line-spec) 0.0)
+                              (list 11 (nth 2 line-spec) (nth 3 line-spec) 0.0)))))
+      (setq count (1+ count))
+      (princ (strcat "\nInvalid line specification: " (vl-princ-to-string line-spec)))))
+  count)
+
+(defun c:batch-create-lines (lines-data)
   "Create multiple lines in one operation.
+   Input: list of line specifications ((x1 y1 x2 y2 [layer [color]]) ...)"
+  (mcp-bulk-apply 'mcp-bulk-lines lines-data "lines"))
+
+(defun mcp-bulk-circles (circles-data / circle-spec count)
+  (setq count 0)
+  (foreach circle-spec circles-data
+    (if (and (>= (length circle-spec) 3)
+             (entmake (append
+                        '((0 . "CIRCLE"))
+                        (mcp-entity-props (nth 3 circle-spec) (nth 4 circle-spec))
+                        (list (list 10 (nth 0 circle-spec) (nth 1 circle-spec) 0.0)
+                              (cons 40 (nth 2 circle-spec))))))
+      (setq count (1+ count))
+      (princ (strcat "\nInvalid circle specification: " (vl-princ-to-string circle-spec)))))
+  count)
+
+(defun c:batch-create-circles (circles-data)
+  "Create multiple circles in one operation.
+   Input: list of circle specifications ((cx cy radius [layer [color]]) ...)"
+  (mcp-bulk-apply 'mcp-bulk-circles circles-data "circles"))
+
+(defun mcp-bulk-texts (texts-data / text-spec rotation count)
+  (setq count 0)
+  (foreach text-spec texts-data
+    (setq rotation (if (nth 4 text-spec) (nth 4 text-spec) 0.0))
+    (if (and (>= (length text-spec) 4)
+             (entmake (append
+                        '((0 . "TEXT"))
+                        (mcp-entity-props (nth 5 text-spec) (nth 6 text-spec))
+                        (list (list 10 (nth 0 text-spec) (nth 1 text-spec) 0.0)
+                              (cons 40 (nth 2 text-spec))
+                              (cons 1 (nth 3 text-spec))
+                              (cons 50 (* pi (/ rotation 180.0)))
+                              (cons 7 (getvar "TEXTSTYLE"))))))
+      (setq count (1+ count))
+      (princ (strcat "\nInvalid text specification: " (vl-princ-to-string text-spec)))))
+  count)
+
+(defun c:batch-create-texts (texts-data)
+  "Create multiple text entities in one operation.
+   Input: list of text specifications ((x y height string [rotation [layer [color]]]) ...)
+   Rotation is in degrees."
+  (mcp-bulk-apply 'mcp-bulk-texts texts-data "text entities"))
+
+;; Command-based versions of the batch functions
+(defun c:batch-create-lines-command (lines-data / line-spec)
+  "Create multiple lines through the LINE command (slow path, kept for benchmarks).
    Input: list of line specifications ((x1 y1 x2 y2) (x1 y1 x2 y2) ...)"
   (foreach line-spec lines-data
     (if (= (length line-spec) 4)
@@ -14,8 +119,8 @@
   (princ (strcat "\nCreated " (itoa (length lines-data)) " lines"))
   (princ))
 
-(defun c:batch-create-circles (circles-data / circle-spec)
-  "Create multiple circles in one operation.
+(defun c:batch-create-circles-command (circles-data / circle-spec)
+  "Create multiple circles through the CIRCLE command (slow path, kept for benchmarks).
    Input: list of circle specifications ((cx cy radius) (cx cy radius) ...)"
   (foreach circle-spec circles-data
     (if (= (length circle-spec) 3)
@@ -26,8 +131,8 @@
   (princ (strcat "\nCreated " (itoa (length circles-data)) " circles"))
   (princ))
 
-(defun c:batch-create-texts (texts-data / text-spec)
-  "Create multiple text entities in one operation.
+(defun c:batch-create-texts-command (texts-data / text-spec)
+  "Create multiple text entities through the TEXT command (slow path, kept for benchmarks).
    Input: list of text specifications ((x y height string) (x y height string) ...)"
   (foreach text-spec texts-data
     (if (>= (length text-spec) 4)
@@ -40,31 +145,162 @@
   (princ (strcat "\nCreated " (itoa (length texts-data)) " text entities"))
   (princ))
 
-(defun c:batch-mixed-operations (operations / op)
+;; Compare entity creation rates of the entmake and command paths.
+;; Draws COUNT lines and COUNT circles with each path on a scratch layer,
+;; prints entities per second, then erases the scratch entities.
+(defun c:benchmark-batch-create (count / lines circles i t0 t1 t2 ss old-layer)
+  (setq i 0
+        old-layer (getvar "CLAYER"))
+  (while (< i count)
+    (setq lines (cons (list (* i 1.0) 0.0 (* i 1.0) 10.0 "MCP-BENCHMARK") lines)
+          circles (cons (list (* i 1.0) 20.0 0.4 "MCP-BENCHMARK") circles)
+          i (1+ i)))
+  (if (not (tblsearch "LAYER" "MCP-BENCHMARK"))
+    (command "_.-LAYER" "_NEW" "MCP-BENCHMARK" ""))
+  (setq t0 (getvar "MILLISECS"))
+  (c:batch-create-lines lines)
+  (c:batch-create-circles circles)
+  (setq t1 (getvar "MILLISECS"))
+  (setvar "CLAYER" "MCP-BENCHMARK")
+  (c:batch-create-lines-command (mapcar '(lambda (l) (list (nth 0 l) (nth 1 l) (nth 2 l) (nth 3 l))) lines))
+  (c:batch-create-circles-command (mapcar '(lambda (c) (list (nth 0 c) (nth 1 c) (nth 2 c))) circles))
+  (setq t2 (getvar "MILLISECS"))
+  (setvar "CLAYER" old-layer)
+  (if (setq ss (ssget "X" '((8 . "MCP-BENCHMARK"))))
+    (command "_.ERASE" ss ""))
+  (princ (strcat "\nentmake path: " (itoa (* 2 count)) " entities in " (itoa (- t1 t0)) " ms ("
+                 (rtos (/ (* 2000.0 count) (max 1 (- t1 t0))) 2 0) " entities/s)"))
+  (princ (strcat "\ncommand path: " (itoa (* 2 count)) " entities in " (itoa (- t2 t1)) " ms ("
+                 (rtos (/ (* 2000.0 count) (max 1 (- t2 t1))) 2 0) " entities/s)"))
+  (princ))
+
+;; Operation name -> function for c:batch-draw. Each operation's arguments are
+;; passed to the function unchanged, so they must be in the function's order.
+(setq *mcp-batch-draw-ops*
+  '(("line" . c:create-line)
+    ("circle" . c:create-circle)
+    ("text" . c:create-text-rotated)
+    ("polyline" . c:create-polyline)
+    ("rectangle" . c:create-rectangle)
+    ("arc" . c:create-arc)
+    ("ellipse" . c:create-ellipse)
+    ("mtext" . c:create-mtext)
+    ("block" . c:insert_block)
+    ("layer" . mcp-batch-set-layer)
+    ("pid-layers" . c:setup-pid-layers)
+    ("pid-symbol" . c:insert-pid-block)
+    ("process-line" . c:draw-process-line)
+    ("connect-equipment" . c:connect-equipment)
+    ("flow-arrow" . c:add-flow-arrow)
+    ("equipment-tag" . c:add-equipment-tag)
+    ("line-number" . c:add-line-number)
+    ("valve" . c:insert-valve-on-line)
+    ("instrument" . c:insert-instrument)
+    ("pump" . c:insert-pump)
+    ("tank" . c:insert-tank)))
+
+(defun mcp-batch-set-layer (layer-name color linetype)
+  "Create the layer if needed and make it current"
+  (ensure_layer_exists layer-name color linetype)
+  (set_current_layer layer-name))
+
+(defun c:batch-draw (operations / op entry result index statuses failed)
+  "Run a heterogeneous list of drawing operations in one call.
+   Input: list of (name arg1 arg2 ...), see *mcp-batch-draw-ops* for names.
+   Returns a list of (index . status) where status is \"ok\" or an error message."
+  (setq index 0
+        failed 0)
+  (foreach op operations
+    (setq index (1+ index))
+    (setq entry (assoc (car op) *mcp-batch-draw-ops*))
+    (cond
+      ((null entry)
+       (setq result (strcat "unknown operation " (vl-princ-to-string (car op)))))
+      ((vl-catch-all-error-p
+         (setq result (vl-catch-all-apply (cdr entry) (cdr op))))
+       (setq result (vl-catch-all-error-message result)))
+      (t (setq result "ok")))
+    (if (/= result "ok")
+      (progn
+        (setq failed (1+ failed))
+        (princ (strcat "\nBatch op " (itoa index) " (" (vl-princ-to-string (car op)) ") failed: " result))))
+    (setq statuses (cons (cons index result) statuses)))
+  (princ (strcat "\nBatch draw: " (itoa (- index failed)) " ok, " (itoa failed) " failed"))
+  (reverse statuses))
+
+(defun c:batch-mixed-operations (operations / op converted)
   "Execute multiple different operations in sequence.
-   Input: list of operations (('line x1 y1 x2 y2) ('circle cx cy r) ('text x y h str) ...)"
+   Input: list of operations (('line x1 y1 x2 y2) ('circle cx cy r) ('text x y h str) ...)
+   Kept for compatibility; runs through c:batch-draw."
   (foreach op operations
     (cond
-      ((eq (car op) 'line)
-       (if (= (length op) 5)
-         (command "_LINE" 
-                  (list (nth 1 op) (nth 2 op) 0.0)
-                  (list (nth 3 op) (nth 4 op) 0.0)
-                  "")))
-      ((eq (car op) 'circle)
-       (if (= (length op) 4)
-         (command "_CIRCLE" 
-                  (list (nth 1 op) (nth 2 op) 0.0)
-                  (nth 3 op))))
-      ((eq (car op) 'text)
-       (if (>= (length op) 5)
-         (command "_TEXT" 
-                  (list (nth 1 op) (nth 2 op) 0.0)
-                  (nth 3 op)
-                  0
-                  (nth 4 op))))
+      ((and (eq (car op) 'line) (= (length op) 5))
+       (setq converted (cons (cons "line" (cdr op)) converted)))
+      ((and (eq (car op) 'circle) (= (length op) 4))
+       (setq converted (cons (cons "circle" (cdr op)) converted)))
+      ((and (eq (car op) 'text) (>= (length op) 5))
+       (setq converted (cons (list "text" (nth 1 op) (nth 2 op) (nth 4 op) (nth 3 op) 0.0) converted)))
       (t (princ (strcat "\nUnknown operation: " (vl-princ-to-string op))))))
+  (c:batch-draw (reverse converted))
   (princ "\nBatch operations completed")
   (princ))
 
+;; Count entities added after a marker entity (all entities when the marker is nil).
+;; Attributes, polyline vertices and SEQEND markers belong to their parent
+;; entity and are not counted separately.
+(defun mcp-count-entities-after (marker / ent count)
+  (setq count 0)
+  (setq ent (if marker (entnext marker) (entnext)))
+  (while ent
+    (if (not (member (cdr (assoc 0 (entget ent))) '("ATTRIB" "VERTEX" "SEQEND")))
+      (setq count (1+ count)))
+    (setq ent (entnext ent)))
+  count)
+
+;; Bring a DXF written by the MCP server (dxf_writer.py) into the drawing.
+;; symbols is a list of (category name) library symbols the file uses; their
+;; definitions are loaded first, so the file's empty placeholders are ignored.
+(defun c:import-dxf (path symbols / marker count)
+  (foreach symbol symbols
+    (mcp-define-block (mcp-symbol-path (car symbol) (cadr symbol)) (cadr symbol)))
+  (setq marker (entlast))
+  (command "_.UNDO" "_BEGIN")
+  (command "_.-INSERT" (strcat "*" path) '(0.0 0.0 0.0) 1.0 0.0)
+  (command "_.UNDO" "_END")
+  (setq count (mcp-count-entities-after marker))
+  (princ (strcat "\nImported " (itoa count) " entities from " path))
+  count)
+
+;; One sheet of generate_sheets: draw the operations with c:batch-draw, then
+;; move what they drew into a new drawing file with -WBLOCK. That also removes
+;; it from the working drawing, so each sheet starts from what was there
+;; before and sheets never pile up in one DWG. If the server gave up waiting
+;; for this attempt it has written cancel-path, and the entities are erased
+;; instead, so a sheet it retried on another instance is not saved twice.
+(defun c:mcp-sheet (path cancel-path operations / marker statuses ss ent)
+  (setq marker (entlast))
+  (setq statuses (c:batch-draw operations))
+  (setq ss (ssadd))
+  (setq ent (if marker (entnext marker) (entnext)))
+  (while ent
+    (if (not (member (cdr (assoc 0 (entget ent))) '("ATTRIB" "VERTEX" "SEQEND")))
+      (ssadd ent ss))
+    (setq ent (entnext ent)))
+  (cond
+    ((findfile cancel-path)
+     (if (> (sslength ss) 0)
+       (command "_.ERASE" ss ""))
+     (princ (strcat "\nSheet cancelled, not saved: " path)))
+    ((> (sslength ss) 0)
+     (if (findfile path)
+       (vl-file-delete path))
+     (command "_.-WBLOCK" path "" '(0.0 0.0 0.0) ss "")
+     (if (not (findfile path))
+       (progn
+         (princ (strcat "\nCould not save sheet to " path))
+         (exit)))
+     (princ (strcat "\nSaved " (itoa (sslength ss)) " entities to " path)))
+    (t (princ "\nSheet drew nothing, not saved")))
+  statuses)
+
 (princ "\nBatch operations loaded successfully\n")
\ No newline at end of file
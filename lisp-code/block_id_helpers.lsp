@@ -3,42 +3,188 @@
 
 ;; (load "drafting_helpers.lsp")
 
-(defun find_block_by_id (id_value / ss i block_ent attrib_ent attrib_data found_ent)
+;; --------------------------------------------------------------------------
+;; ID -> handle index
+;; The drawing keeps a dictionary MCP_BLOCK_IDS in its named object dictionary,
+;; holding one xrecord per ID with the handle of the block that carries it.
+;; find_block_by_id checks it first and only scans every INSERT when the ID is
+;; not indexed or the entry is stale (block erased or its ID changed); the scan
+;; indexes every block it passes, so the index fills in as it is used.
+
+(defun mcp-id-index (/ entry)
+  "Ename of the MCP_BLOCK_IDS dictionary, created on first use"
+  (if (setq entry (dictsearch (namedobjdict) "MCP_BLOCK_IDS"))
+    (cdr (assoc -1 entry))
+    (dictadd (namedobjdict) "MCP_BLOCK_IDS"
+             (entmakex '((0 . "DICTIONARY") (100 . "AcDbDictionary"))))
+  )
+)
+
+(defun mcp-index-block-id (id_value block_ent / index old)
+  "Record block_ent as the block carrying id_value"
+  ;; Dictionary keys follow symbol-table naming rules; other IDs are found by scanning
+  (if (and (/= id_value "") (snvalid id_value))
+    (progn
+      (setq index (mcp-id-index))
+      (if (setq old (dictremove index id_value))
+        (entdel old))
+      (dictadd index id_value
+               (entmakex (list '(0 . "XRECORD") '(100 . "AcDbXrecord")
+                               (cons 1 (cdr (assoc 5 (entget block_ent)))))))
+    )
+  )
+  block_ent
+)
+
+(defun mcp-block-id (block_ent / attrib_ent attrib_data result)
+  "Value of a block's ID attribute, or nil"
+  ;; Only follow entnext when attributes follow the INSERT (group 66); otherwise
+  ;; it walks on into the rest of the drawing
+  (if (= (cdr (assoc 66 (entget block_ent))) 1)
+    (setq attrib_ent (entnext block_ent)))
+  (while (and attrib_ent (not result)
+              (/= (cdr (assoc 0 (setq attrib_data (entget attrib_ent)))) "SEQEND"))
+    (if (and (= (cdr (assoc 0 attrib_data)) "ATTRIB")
+             (equal (strcase (cdr (assoc 2 attrib_data))) "ID"))
+      (setq result (cdr (assoc 1 attrib_data)))
+      (setq attrib_ent (entnext attrib_ent))
+    )
+  )
+  result
+)
+
+(defun mcp-indexed-block (id_value / rec ent)
+  "Block carrying id_value according to the index, or nil if unknown or stale"
+  (if (and (/= id_value "")
+           (snvalid id_value)
+           (setq rec (dictsearch (mcp-id-index) id_value))
+           (setq ent (handent (cdr (assoc 1 rec))))
+           (entget ent)                                   ; nil once erased
+           (equal (mcp-block-id ent) id_value))
+    ent
+  )
+)
+
+(defun mcp-scan-for-block-id (id_value stop / ss i block_ent block_id found_ent)
+  "Walk every INSERT, indexing each ID seen; stops at id_value when stop is T"
   (setq ss (ssget "X" '((0 . "INSERT"))))
-  (if (not ss)
+  (setq i 0)
+  (while (and ss (< i (sslength ss)) (not (and stop found_ent)))
+    (setq block_ent (ssname ss i))
+    (if (setq block_id (mcp-block-id block_ent))
+      (progn
+        (mcp-index-block-id block_id block_ent)
+        (if (and (not found_ent) (equal block_id id_value))
+          (setq found_ent block_ent))
+      )
+    )
+    (setq i (1+ i))
+  )
+  found_ent
+)
+
+(defun c:rebuild-block-id-index (/ index name count)
+  "Drop the ID index and re-index every block in the drawing"
+  (setq index (mcp-id-index))
+  (while (setq name (cdr (assoc 3 (entget index))))
+    (entdel (dictremove index name))
+  )
+  (mcp-scan-for-block-id "" nil)
+  (setq count 0)
+  (foreach pair (entget index)
+    (if (= (car pair) 3) (setq count (1+ count))))
+  (princ (strcat "\nIndexed " (itoa count) " block IDs"))
+  (princ)
+)
+
+(defun find_block_by_id (id_value / found_ent)
+  (setq found_ent (mcp-indexed-block id_value))
+  (if (not found_ent)
+    (setq found_ent (mcp-scan-for-block-id id_value T)))
+  (if found_ent
+    (progn
+      (princ (strcat "\nFound block with ID: " id_value))
+      found_ent
+    )
     (progn
-      (princ (strcat "\nNo blocks found while searching for ID: " id_value))
+      (princ (strcat "\nNo block found with ID: " id_value))
       nil
     )
+  )
+)
+
+(defun mcp-find-blocks-by-ids (id_list / found missing ss i block_ent block_id)
+  "Alist of (id . block) for the IDs in id_list that exist, with at most one
+   scan of the drawing for the IDs the index doesn't know"
+  (foreach id_value id_list
+    (if (setq block_ent (mcp-indexed-block id_value))
+      (setq found (cons (cons id_value block_ent) found))
+      (setq missing (cons id_value missing))
+    )
+  )
+  (if missing
     (progn
-      (setq found_ent nil)
+      (setq ss (ssget "X" '((0 . "INSERT"))))
       (setq i 0)
-      (while (and (< i (sslength ss)) (not found_ent))
+      (while (and ss missing (< i (sslength ss)))
         (setq block_ent (ssname ss i))
-        (setq attrib_ent (entnext block_ent))
-        (while (and attrib_ent (not found_ent)
-                    (/= (cdr (assoc 0 (setq attrib_data (entget attrib_ent)))) "SEQEND"))
-          (if (and (= (cdr (assoc 0 attrib_data)) "ATTRIB")
-                   (equal (strcase (cdr (assoc 2 attrib_data))) "ID")
-                   (equal (cdr (assoc 1 attrib_data)) id_value))
-            (setq found_ent block_ent)
-            (setq attrib_ent (entnext attrib_ent))
+        (if (setq block_id (mcp-block-id block_ent))
+          (progn
+            (mcp-index-block-id block_id block_ent)
+            (if (member block_id missing)
+              (setq found (cons (cons block_id block_ent) found)
+                    missing (vl-remove block_id missing)))
           )
         )
         (setq i (1+ i))
       )
-      (if found_ent
-        (progn
-          (princ (strcat "\nFound block with ID: " id_value))
-          found_ent
-        )
-        (progn
-          (princ (strcat "\nNo block found with ID: " id_value))
-          nil
+    )
+  )
+  found
+)
+
+;; Connect many block pairs in one pass, e.g.
+;; (c:connect_blocks_bulk '(("P-101" "TK-101" "CONN_DEFAULT1" "CONN_DEFAULT2" "Connections") ...))
+;; All IDs are resolved together, each layer is checked once, and the lines are
+;; made with entmake inside one undo group. Edges on the same layer should be
+;; passed together.
+(defun c:connect_blocks_bulk (edges / ids blocks start_ent end_ent layer layers count skipped)
+  (foreach edge edges
+    (foreach id_value (list (car edge) (cadr edge))
+      (if (not (member id_value ids))
+        (setq ids (cons id_value ids)))
+    )
+  )
+  (setq blocks (mcp-find-blocks-by-ids ids))
+  (setq count 0 skipped 0)
+  (command "_.UNDO" "_BEGIN")
+  (foreach edge edges
+    (setq start_ent (cdr (assoc (car edge) blocks))
+          end_ent (cdr (assoc (cadr edge) blocks))
+          layer (nth 4 edge))
+    (if (and start_ent end_ent)
+      (progn
+        (if (not (member layer layers))
+          (progn
+            (ensure_layer_exists layer "white" "CONTINUOUS")
+            (setq layers (cons layer layers))
+          )
         )
+        (entmake (list '(0 . "LINE") (cons 8 layer)
+                       (cons 10 (get_connection_point start_ent (nth 2 edge)))
+                       (cons 11 (get_connection_point end_ent (nth 3 edge)))))
+        (setq count (1+ count))
+      )
+      (progn
+        (princ (strcat "\nCould not find one or both IDs: " (car edge) ", " (cadr edge)))
+        (setq skipped (1+ skipped))
       )
     )
   )
+  (command "_.UNDO" "_END")
+  (princ (strcat "\nConnected " (itoa count) " block pairs on " (itoa (length layers))
+                 " layers, " (itoa skipped) " skipped"))
+  (princ)
 )
 
 (defun c:connect_blocks_by_id (start_id end_id layer_name from_pt to_pt / ent1 ent2)
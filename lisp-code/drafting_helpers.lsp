@@ -62,7 +62,11 @@
   (command "_.INSERT" block_name insertion_pt scale scale rotation)
   (setq ent_name (entlast))
   (if (/= id_value "")
-    (set_attribute_value ent_name "ID" id_value)
+    (progn
+      (set_attribute_value ent_name "ID" id_value)
+      ;; Keep the ID index (block_id_helpers.lsp) current when it is loaded
+      (if mcp-index-block-id (mcp-index-block-id id_value ent_name))
+    )
   )
   (princ (strcat "\nInserted block '" block_name "' at (" (rtos x 2 2) "," (rtos y 2 2)
                  ") with ID='" id_value "'"))
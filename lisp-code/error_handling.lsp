@@ -6,5 +6,113 @@
   (princ)
 )
 
+;; Result mailbox: the MCP server sends each command as (mcp-run <seq> '<form>).
+;; mcp-run evaluates the form and writes <seq>.json to *mcp-mailbox-dir* with the
+;; status, the entities created and any error message. The server waits for that
+;; file instead of sleeping a fixed time.
+(vl-load-com)
+
+(if (not *mcp-mailbox-dir*)
+  (setq *mcp-mailbox-dir* (strcat (getvar "TEMPPREFIX") "autocad-mcp-mailbox/"))
+)
+(if (not *mcp-max-handles*)
+  (setq *mcp-max-handles* 1000)
+)
+
+(defun mcp-json-string (s / i c out)
+  (setq out "" i 1)
+  (repeat (strlen s)
+    (setq c (substr s i 1))
+    (setq out (strcat out
+                (cond ((= c "\\") "\\\\")
+                      ((= c "\"") "\\\"")
+                      ((= c "\n") "\\n")
+                      ((= c "\t") "\\t")
+                      (T c))))
+    (setq i (1+ i))
+  )
+  (strcat "\"" out "\"")
+)
+
+;; Handles of top-level entities created after marker (nil = whole drawing)
+(defun mcp-handles-after (marker / ent typ handles)
+  (setq ent (if marker (entnext marker) (entnext)))
+  (while ent
+    (setq typ (cdr (assoc 0 (entget ent))))
+    (if (not (member typ '("ATTRIB" "VERTEX" "SEQEND")))
+      (setq handles (cons (cdr (assoc 5 (entget ent))) handles))
+    )
+    (setq ent (entnext ent))
+  )
+  (reverse handles)
+)
+
+(defun mcp-report (seq marker result / handles count tmp f shown)
+  (vl-mkdir *mcp-mailbox-dir*)
+  (setq handles (mcp-handles-after marker)
+        count (length handles)
+        tmp (strcat *mcp-mailbox-dir* (itoa seq) ".tmp"))
+  (if (setq f (open tmp "w"))
+    (progn
+      (princ (strcat "{\"seq\": " (itoa seq) ", \"status\": "
+                     (if (vl-catch-all-error-p result) "\"error\"" "\"ok\"")
+                     ", \"count\": " (itoa count) ", \"handles\": [") f)
+      (setq shown 0)
+      (foreach h handles
+        (if (< shown *mcp-max-handles*)
+          (progn
+            (if (> shown 0) (princ ", " f))
+            (princ (strcat "\"" h "\"") f)
+            (setq shown (1+ shown))
+          )
+        )
+      )
+      (princ (strcat "], \"error\": "
+                     (if (vl-catch-all-error-p result)
+                       (mcp-json-string (vl-catch-all-error-message result))
+                       "null")
+                     "}") f)
+      (close f)
+      (vl-file-rename tmp (strcat *mcp-mailbox-dir* (itoa seq) ".json"))
+    )
+  )
+)
+
+(defun mcp-run (seq form / marker result)
+  (setq marker (entlast))
+  (setq result (vl-catch-all-apply 'eval (list form)))
+  (mcp-report seq marker result)
+  (princ)
+)
+
+;; Scripts: the server compiles a run of commands into .scr files (see
+;; script_compiler.py) and starts them with (mcp-run-script <seq> "<path>").
+;; Every script line is (mcp-script-eval '<form>), so a failing command doesn't
+;; stop the run; the last line, (mcp-script-done), reports on <seq> like mcp-run.
+(defun mcp-run-script (seq path)
+  (setq *mcp-script-seq* seq
+        *mcp-script-marker* (entlast)
+        *mcp-script-error* nil)
+  (command "_.SCRIPT" path)
+  (princ)
+)
+
+(defun mcp-script-eval (form / result)
+  (setq result (vl-catch-all-apply 'eval (list form)))
+  (if (and (vl-catch-all-error-p result) (not *mcp-script-error*))
+    (setq *mcp-script-error* result)
+  )
+  (princ)
+)
+
+(defun mcp-script-done ()
+  (if *mcp-script-seq*
+    (mcp-report *mcp-script-seq* *mcp-script-marker*
+                (if *mcp-script-error* *mcp-script-error* T))
+  )
+  (setq *mcp-script-seq* nil)
+  (princ)
+)
+
 (princ "\nError handling loaded.\n")
 (princ)
@@ -2,20 +2,62 @@
 ;;; Tools for creating Process Flow Diagrams and Piping & Instrumentation Diagrams
 ;;; Using CAD Tools Online (CTO) P&ID Symbol Library
 
-;; Insert P&ID block from CTO library without attributes
-(defun c:insert-pid-block (category symbol-name x y scale rotation / block-path block-name old-attreq)
-  "Insert a P&ID symbol from the CTO library without attribute prompting"
-  (setq block-path (strcat "C:/PIDv4-CTO/" category "/" symbol-name ".dwg"))
-  (setq block-name symbol-name)
-  
-  ;; Check if block already exists in drawing
+;; Root of the symbol library; the MCP server sets this when it uses another location
+(if (not *mcp-symbol-library*)
+  (setq *mcp-symbol-library* "C:/PIDv4-CTO/"))
+
+(defun mcp-symbol-path (category symbol-name)
+  "Full path of a symbol's .dwg file in the library"
+  (strcat *mcp-symbol-library* category "/" symbol-name ".dwg")
+)
+
+;; Bring a block definition in from disk unless the drawing already has it
+(defun mcp-define-block (block-path block-name)
+  "Define block-name from block-path if needed; returns T if it was loaded now"
   (if (not (tblsearch "BLOCK" block-name))
     (progn
-      ;; Load block definition
       (command "_.-INSERT" block-path nil)
       (princ (strcat "\nLoaded block definition: " block-name))
+      T
     )
   )
+)
+
+;; Record the names of all named blocks in the drawing in *mcp-defined-blocks*
+;; ("NAME;NAME;..."), for the MCP server to read back
+(defun mcp-record-defined-blocks (/ rec names)
+  (setq names "")
+  (setq rec (tblnext "BLOCK" T))
+  (while rec
+    (if (/= (substr (cdr (assoc 2 rec)) 1 1) "*")
+      (setq names (strcat names (strcase (cdr (assoc 2 rec))) ";")))
+    (setq rec (tblnext "BLOCK"))
+  )
+  (setq *mcp-defined-blocks* names)
+)
+
+;; Define many library symbols in one pass, e.g.
+;; (c:preload-blocks '(("VALVES" "VA-GATE") ("PUMPS-BLOWERS" "PUMP-GEAR")))
+(defun c:preload-blocks (symbols / loaded)
+  "Load the definitions of library symbols without inserting them"
+  (setq loaded 0)
+  (foreach sym symbols
+    (if (mcp-define-block (mcp-symbol-path (car sym) (cadr sym)) (cadr sym))
+      (setq loaded (1+ loaded)))
+  )
+  (mcp-record-defined-blocks)
+  (princ (strcat "\nPreloaded " (itoa loaded) " block definitions"))
+  (princ)
+)
+
+;; Insert P&ID block from CTO library without attributes
+(defun c:insert-pid-block (category symbol-name x y scale rotation / block-path block-name old-attreq)
+  "Insert a P&ID symbol from the CTO library without attribute prompting"
+  (setq block-path (mcp-symbol-path category symbol-name))
+  (setq block-name symbol-name)
+  
+  ;; Load the definition only if the drawing doesn't have it yet
+  (mcp-define-block block-path block-name)
   
   ;; Insert block without attribute prompting
   (setq old-attreq (getvar "ATTREQ"))
@@ -149,6 +191,26 @@
   (princ "\nEquipment connected with process line")
 )
 
+;; Draw routed process lines, one polyline per route, e.g.
+;; (c:draw-process-routes '(((0 0) (0 7) (30 7) (30 0)) ((50 0) (80 0))))
+;; The routes come from the MCP server's router; they are made with entmake
+;; inside one undo group, so many routes cost one command.
+(defun c:draw-process-routes (routes / count)
+  "Draw each route (a list of 2D points) as a polyline on PID-PROCESS-PIPING"
+  (setq count 0)
+  (command "_.UNDO" "_BEGIN")
+  (foreach route routes
+    (if (entmake (append (list '(0 . "LWPOLYLINE") '(100 . "AcDbEntity")
+                               '(8 . "PID-PROCESS-PIPING") '(100 . "AcDbPolyline")
+                               (cons 90 (length route)) '(70 . 0))
+                         (mapcar '(lambda (pt) (cons 10 pt)) route)))
+      (setq count (1+ count)))
+  )
+  (command "_.UNDO" "_END")
+  (princ (strcat "\nDrew " (itoa count) " routed process lines"))
+  (princ)
+)
+
 ;; Insert valve on a line
 (defun c:insert-valve-on-line (x y valve-type rotation / valve-name)
   "Insert a valve at specified location on a line"
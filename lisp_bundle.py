@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - LISP Bundle Loader
+Concatenates the lisp-code/*.lsp files a server needs into one content-hashed
+bundle, so startup costs a single (load ...) and one security-prompt delay
+instead of one per file.
+
+Every file in a bundle ends by appending "<file>@<hash>;" to the AutoCAD global
+*mcp-loaded*. A server that restarts against the same AutoCAD session reads
+that registry back first and only loads files that are missing or changed.
+
+Files can also be loaded lazily: the loader indexes every (defun ...) in
+lisp-code, works out which files call functions defined in which others, and
+resolves the functions a command uses to the files (dependencies first) that
+must be loaded before it runs.
+
+Build a bundle by hand (it is written to lisp-code/build/):
+    python lisp_bundle.py --server fast
+    python lisp_bundle.py --command "(c:create-line 0 0 10 10)"   # files a command needs
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("autocad-lisp-mcp.lisp_bundle")
+
+LISP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lisp-code")
+BUILD_DIR = os.path.join(LISP_DIR, "build")  # Inside lisp-code, so it shares its trusted path
+REGISTRY_SYMBOL = "*mcp-loaded*"
+
+# Files each server loads at startup, in load order
+SERVER_FILES = {
+    "fast": [
+        "error_handling.lsp",
+        "basic_shapes.lsp",
+        "batch_operations.lsp",
+        "advanced_geometry.lsp",
+        "advanced_entities.lsp",
+        "drafting_helpers.lsp",
+        "block_id_helpers.lsp",
+        "entity_modification.lsp",
+        "pid_tools.lsp",
+        "attribute_tools.lsp",
+    ],
+    "basic": [
+        "error_handling.lsp",
+        "basic_shapes.lsp",
+        "drafting_helpers.lsp",
+        "block_id_helpers.lsp",
+        "selection_and_file.lsp",
+        "advanced_geometry.lsp",
+        "advanced_entities.lsp",
+        "entity_modification.lsp",
+        "annotation_helpers.lsp",
+        "layout_management.lsp",
+    ],
+}
+
+
+_DEFUN = re.compile(r"\(defun\s+([^\s()]+)", re.IGNORECASE)
+_STRING_OR_COMMENT = re.compile(r'"(?:\\.|[^"\\])*"|;[^\n]*')
+_SYMBOL = re.compile(r"[^\s()'\".;]+")
+
+
+def symbols(source: str) -> Set[str]:
+    """Lower-cased symbols used in LISP source, ignoring strings and comments."""
+    return {token.lower() for token in _SYMBOL.findall(_STRING_OR_COMMENT.sub(" ", source))}
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def strip_comments(source: str) -> str:
+    """Drop blank lines and whole-line ; comments to shrink the bundle.
+    Lines inside multi-line string literals are kept as they are."""
+    kept = []
+    in_string = False
+    for line in source.splitlines():
+        if not in_string and (not line.strip() or line.lstrip().startswith(";")):
+            continue
+        kept.append(line)
+        escaped = False
+        for char in line:
+            if escaped:
+                escaped = False
+            elif in_string and char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = not in_string
+            elif char == ";" and not in_string:
+                break
+    return "\n".join(kept) + "\n"
+
+
+def registry_form(entry: str) -> str:
+    """LISP that records entry as loaded in this AutoCAD session."""
+    return (f'(setq {REGISTRY_SYMBOL} (strcat (if {REGISTRY_SYMBOL} {REGISTRY_SYMBOL} "") '
+            f'"{entry};"))')
+
+
+def parse_registry(value: Optional[str]) -> Set[str]:
+    """Entries recorded in *mcp-loaded*, e.g. {"basic_shapes.lsp@1a2b3c4d5e6f"}."""
+    return {entry for entry in (value or "").split(";") if entry}
+
+
+class LispLoader:
+    """Builds bundles of .lsp files and tracks which are loaded in AutoCAD."""
+
+    def __init__(self, lisp_dir: str = LISP_DIR, build_dir: str = BUILD_DIR):
+        self.lisp_dir = lisp_dir
+        self.build_dir = build_dir
+        self.loaded: Set[str] = set()
+        self.synced = False  # True once the registry has been read from AutoCAD
+        self._functions: Optional[Dict[str, str]] = None
+        self._requires: Dict[str, List[str]] = {}
+        # name -> (mtime_ns, size, content hash), so unchanged files aren't re-read
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+
+    def _read(self, name: str) -> str:
+        with open(os.path.join(self.lisp_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    def _hash(self, name: str) -> str:
+        """Content hash of a file, recomputed only when its mtime or size changes."""
+        stat = os.stat(os.path.join(self.lisp_dir, name))
+        cached = self._hashes.get(name)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = content_hash(self._read(name))
+        self._hashes[name] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def entry(self, name: str) -> str:
+        """Registry entry for the current contents of a file."""
+        return f"{name}@{self._hash(name)}"
+
+    def sync(self, registry_value: Optional[str]) -> None:
+        """Adopt the registry read back from AutoCAD."""
+        self.loaded = parse_registry(registry_value)
+        self.synced = registry_value is not None
+
+    def function_index(self) -> Dict[str, str]:
+        """Lower-cased function name -> .lsp file defining it."""
+        if self._functions is None:
+            functions: Dict[str, str] = {}
+            sources = {}
+            for path in sorted(glob.glob(os.path.join(self.lisp_dir, "*.lsp"))):
+                name = os.path.basename(path)
+                sources[name] = self._read(name)
+                for function in _DEFUN.findall(sources[name]):
+                    functions.setdefault(function.lower(), name)
+            # A file requires every other file defining a function it mentions
+            for name, source in sources.items():
+                self._requires[name] = sorted({functions[symbol] for symbol in symbols(source)
+                                               if symbol in functions} - {name})
+            self._functions = functions
+        return self._functions
+
+    def files_for_functions(self, functions: Iterable[str]) -> List[str]:
+        """Files defining the given functions plus everything they require,
+        dependencies before the files that use them."""
+        index = self.function_index()
+        ordered: List[str] = []
+        visiting: Set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in ordered or name in visiting:
+                return
+            visiting.add(name)
+            for required in self._requires.get(name, []):
+                visit(required)
+            ordered.append(name)
+
+        for function in functions:
+            if function.lower() in index:
+                visit(index[function.lower()])
+        return ordered
+
+    def files_for_command(self, command: str) -> List[str]:
+        """Files that must be loaded before a LISP command can run."""
+        return self.files_for_functions(sorted(symbols(command)))
+
+    def all_loaded(self) -> bool:
+        """Whether every indexed .lsp file is loaded in its current version,
+        so no command can need anything more."""
+        self.function_index()
+        return not self.missing(self._requires)
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        """Files (deduplicated, in order) not loaded in their current version."""
+        result = []
+        for name in names:
+            if name not in result and self.entry(name) not in self.loaded:
+                result.append(name)
+        return result
+
+    def build_bundle(self, names: Iterable[str]) -> Tuple[str, List[str]]:
+        """Write a bundle of the given files and return (path, files included).
+
+        Files are deduplicated by name and by content. The bundle is named by
+        the hash of its contents, so an unchanged bundle is never rewritten."""
+        parts = []
+        included = []
+        seen_hashes = set()
+        for name in names:
+            if name in included:
+                continue
+            source = self._read(name)
+            digest = content_hash(source)
+            included.append(name)
+            parts.append(f";; ---- {name} ----\n")
+            if digest not in seen_hashes:
+                seen_hashes.add(digest)
+                parts.append(strip_comments(source))
+            parts.append(registry_form(f"{name}@{digest}") + "\n")
+        bundle = "".join(parts) + "(princ)\n"
+        path = os.path.join(self.build_dir, f"mcp-bundle-{content_hash(bundle)}.lsp")
+        if not os.path.exists(path):
+            os.makedirs(self.build_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(bundle)
+            logger.info(f"Built LISP bundle {os.path.basename(path)} from {len(included)} files")
+        return path, included
+
+    def mark_loaded(self, names: Iterable[str]) -> None:
+        self.loaded.update(self.entry(name) for name in names)
+
+    def is_loaded(self, name: str) -> bool:
+        return self.entry(name) in self.loaded
+
+    def ensure_loaded(self, transport, hwnd: int, names: Iterable[str],
+                      load_file: Callable[[str], Tuple[bool, str]],
+                      refresh: bool = True) -> Tuple[bool, str]:
+        """Load whatever part of `names` AutoCAD doesn't have yet, as one bundle.
+
+        Reads *mcp-loaded* back from AutoCAD before (unless refresh is False and
+        it has been read already) and after loading, so a restarted server skips
+        files that are already there and a failed load (e.g. a declined
+        security prompt) is noticed."""
+        names = list(names)
+        if refresh or not self.synced:
+            registry = transport.read_variable(hwnd, REGISTRY_SYMBOL)
+            if registry is None:
+                logger.warning("AutoCAD did not report its loaded LISP files; loading all of them")
+            self.sync(registry)
+        missing = self.missing(names)
+        if not missing:
+            return True, f"All {len(names)} LISP files already loaded in this AutoCAD session"
+        path, included = self.build_bundle(missing)
+        success, message = load_file(path)
+        if not success:
+            return False, message
+        registry = transport.read_variable(hwnd, REGISTRY_SYMBOL)
+        if registry is None:
+            self.mark_loaded(included)  # No answer; assume the load went through
+        else:
+            self.sync(registry)
+        not_loaded = self.missing(included)
+        if not_loaded:
+            return False, f"AutoCAD did not load: {', '.join(not_loaded)}"
+        return True, f"Loaded {len(included)} LISP files as {os.path.basename(path)}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=sorted(SERVER_FILES), default="fast")
+    parser.add_argument("--output", default=BUILD_DIR, help="directory to write the bundle to")
+    parser.add_argument("--command", help="only list the files a LISP command needs")
+    args = parser.parse_args()
+
+    loader = LispLoader(build_dir=args.output)
+    if args.command:
+        print("\n".join(loader.files_for_command(args.command)) or "(no lisp-code files needed)")
+        return 0
+    path, included = loader.build_bundle(SERVER_FILES[args.server])
+    source_size = sum(os.path.getsize(os.path.join(LISP_DIR, name)) for name in included)
+    print(f"{path}\n{len(included)} files, {source_size} -> {os.path.getsize(path)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
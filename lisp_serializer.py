@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - LISP Serializer
+Turns Python values into AutoLISP source text. All tools build their commands
+through these helpers so numbers, strings and point lists are formatted and
+escaped the same way everywhere.
+
+    lisp_call("c:create-line", 0, 0, 10.5, 0)      -> (c:create-line 0 0 10.5 0)
+    lisp_call("c:create-text", 1, 2, 'say "hi"')   -> (c:create-text 1 2 "say \"hi\"")
+    lisp_call("c:create-polyline", quoted_points([(0, 0), (5, 5)]), T)
+                                                   -> (c:create-polyline '((0 0 0.0) (5 5 0.0)) T)
+
+Floats can be rounded to a drawing precision (set_precision / precision) so
+values like 12.300000000000001 go out as 12.3.
+"""
+import math
+import re
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+__all__ = ["Expr", "Symbol", "T", "NIL", "lisp_number", "lisp_string", "lisp_point",
+           "lisp_points", "quoted_points", "lisp_data", "lisp_quoted", "lisp_call",
+           "set_precision", "get_precision", "precision"]
+
+
+class Expr(str):
+    """Already-serialized LISP source, inserted verbatim."""
+    __slots__ = ()
+
+
+class Symbol(Expr):
+    """A bare LISP symbol, emitted without quotes (e.g. T, nil)."""
+    __slots__ = ()
+
+
+T = Symbol("T")
+NIL = Symbol("nil")
+
+MAX_DECIMALS = 15
+
+# Decimal places floats are rounded to; None sends full repr precision
+_decimals: Optional[int] = None
+
+
+def set_precision(decimals: Optional[int]) -> Optional[int]:
+    """Round floats to `decimals` places (None disables rounding). Returns the previous setting."""
+    global _decimals
+    if decimals is not None:
+        if isinstance(decimals, bool) or not isinstance(decimals, int):
+            raise TypeError(f"decimals must be an integer or None, got {decimals!r}")
+        if not 0 <= decimals <= MAX_DECIMALS:
+            raise ValueError(f"decimals must be between 0 and {MAX_DECIMALS}, got {decimals}")
+    previous = _decimals
+    _decimals = decimals
+    return previous
+
+
+def get_precision() -> Optional[int]:
+    """Decimal places floats are currently rounded to, or None for full precision."""
+    return _decimals
+
+
+@contextmanager
+def precision(decimals: Optional[int]) -> Iterator[None]:
+    """Temporarily serialize with a different precision."""
+    previous = set_precision(decimals)
+    try:
+        yield
+    finally:
+        set_precision(previous)
+
+
+# Characters a plain decimal point list can contain; anything else sends
+# lisp_points down the per-value path (exponents, nan/inf, bools, strings)
+_POINT_LIST_CHARS = str.maketrans("", "", "0123456789.-() ")
+
+# Patterns matching a repr'd value with more than N decimal places, which
+# rounding to N decimals would change; -0.0 is checked for separately
+_ROUNDING_NEEDED = {}
+_ROUNDING_SAMPLE = 64
+
+# AutoLISP string escapes for characters that can't appear literally
+_STRING_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    '"': '\\"',
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+})
+
+
+def lisp_number(value: Any) -> str:
+    """Format an int or float in the shortest form AutoLISP reads back exactly."""
+    if type(value) is int:
+        return str(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"expected a number, got {value!r}")
+    if isinstance(value, int):
+        return str(int(value))
+    if _decimals is not None:
+        # + 0.0 turns the -0.0 that rounding tiny negatives produces into 0.0
+        value = round(value, _decimals) + 0.0
+    text = repr(value)
+    if "e" in text or "n" in text:
+        if not math.isfinite(value):
+            raise ValueError(f"cannot send non-finite number {value!r} to AutoCAD")
+        # AutoLISP's reader prefers plain decimals over Python's exponent form
+        text = format(value, ".17f").rstrip("0")
+        if text.endswith("."):
+            text += "0"
+    return text
+
+
+def lisp_string(value: str) -> str:
+    """Quote a Python string as an AutoLISP string literal."""
+    if not isinstance(value, str):
+        raise TypeError(f"expected a string, got {value!r}")
+    return '"' + value.translate(_STRING_ESCAPES) + '"'
+
+
+def lisp_point(point: Sequence[float]) -> str:
+    """Format an (x, y) or (x, y, z) point as a 3D point list; z defaults to 0.0."""
+    if len(point) == 2:
+        return f"({lisp_number(point[0])} {lisp_number(point[1])} 0.0)"
+    if len(point) == 3:
+        return f"({lisp_number(point[0])} {lisp_number(point[1])} {lisp_number(point[2])})"
+    raise ValueError(f"expected an (x, y) or (x, y, z) point, got {point!r}")
+
+
+def _rounding_needed(decimals: int, text: str) -> bool:
+    """Whether rounding to `decimals` places would change any value in repr'd text."""
+    pattern = _ROUNDING_NEEDED.get(decimals)
+    if pattern is None:
+        pattern = re.compile(r"\.[0-9]{%d}" % (decimals + 1))
+        _ROUNDING_NEEDED[decimals] = pattern
+    return ("-0.0 " in text or "-0.0)" in text or text.endswith("-0.0")
+            or pattern.search(text) is not None)
+
+
+def lisp_points(points: Iterable[Sequence[float]]) -> str:
+    """Format a sequence of points as a list of 3D point lists."""
+    points = points if isinstance(points, (list, tuple)) else list(points)
+    # Fast path for the common case of 2D int/float points: format everything
+    # with repr in one go, then check the result only holds plain decimals.
+    decimals = _decimals
+    try:
+        text = None
+        if decimals is None:
+            text = "(" + " ".join([f"({x!r} {y!r} 0.0)" for x, y in points]) + ")"
+        else:
+            # Values already within the precision come out of repr unchanged,
+            # so skip rounding unless the text shows one that isn't. A sample
+            # of the first points sends computed coordinates straight to it.
+            sample = " ".join([f"{x!r} {y!r}" for x, y in points[:_ROUNDING_SAMPLE]])
+            if not _rounding_needed(decimals, sample):
+                text = "(" + " ".join([f"({x!r} {y!r} 0.0)" for x, y in points]) + ")"
+                if _rounding_needed(decimals, text):
+                    text = None
+        if text is None:
+            # + 0 turns -0.0 into 0.0 and leaves ints as ints
+            text = "(" + " ".join([f"({round(x, decimals) + 0!r} {round(y, decimals) + 0!r} 0.0)"
+                                   for x, y in points]) + ")"
+    except (TypeError, ValueError):
+        text = None
+    if text is not None and not text.translate(_POINT_LIST_CHARS):
+        return text
+    return "(" + " ".join([lisp_point(p) for p in points]) + ")"
+
+
+def quoted_points(points: Iterable[Sequence[float]]) -> Expr:
+    """A quoted list of 3D points, ready to pass to lisp_call."""
+    return Expr("'" + lisp_points(points))
+
+
+def lisp_data(value: Any) -> str:
+    """Format a Python value as LISP data (the inside of a quoted list).
+
+    None/False -> nil, True -> T, numbers, strings, Expr/Symbol verbatim,
+    nested lists/tuples -> LISP lists, dicts -> association lists of dotted pairs.
+    """
+    if value is None or value is False:
+        return "nil"
+    if value is True:
+        return "T"
+    if isinstance(value, Expr):
+        return str(value)
+    if isinstance(value, str):
+        return lisp_string(value)
+    if isinstance(value, (int, float)):
+        return lisp_number(value)
+    if isinstance(value, (list, tuple)):
+        return "(" + " ".join([lisp_data(item) for item in value]) + ")"
+    if isinstance(value, dict):
+        return "(" + " ".join([f"({lisp_data(k)} . {lisp_data(v)})" for k, v in value.items()]) + ")"
+    raise TypeError(f"cannot serialize {type(value).__name__} to LISP")
+
+
+def lisp_quoted(value: Any) -> str:
+    """Format a list as a quoted LISP literal, e.g. '((0 0 1 1) (2 2 3 3))."""
+    return "'" + lisp_data(value)
+
+
+def lisp_call(function: str, *args: Any) -> str:
+    """Build a LISP function call. List and dict arguments are passed as quoted literals."""
+    parts = [function]
+    for arg in args:
+        if isinstance(arg, (list, tuple, dict)):
+            parts.append(lisp_quoted(arg))
+        else:
+            parts.append(lisp_data(arg))
+    return "(" + " ".join(parts) + ")"
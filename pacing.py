@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Adaptive Pacing
+Tunes the sleeps between keystrokes from how AutoCAD actually responds instead
+of fixed delays. Each command class ("typed", "paste", ...) keeps its own
+delay scale and latency estimate:
+
+- every command that goes through shrinks the scale a little
+- every few commands a verification probe checks nothing was dropped; a
+  failed probe doubles the scale and forces the next command to be probed too
+- the latency measured by successful probes is the lower bound for the wait
+  after submitting a command, so commands never run faster than AutoCAD answers
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("autocad-lisp-mcp.pacing")
+
+
+@dataclass
+class PacingClass:
+    """Delay state for one class of command."""
+    scale: float = 1.0
+    latency: Optional[float] = None  # Moving estimate of AutoCAD's response time
+    since_probe: int = 0
+    successes: int = 0
+    failures: int = 0
+
+
+class AdaptivePacer:
+    """Scales fixed delays up or down per command class."""
+
+    def __init__(self, min_scale: float = 0.05, max_scale: float = 4.0,
+                 shrink: float = 0.85, backoff: float = 2.0, smoothing: float = 0.3,
+                 probe_every: int = 10, min_delay: float = 0.002):
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.shrink = shrink
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.probe_every = max(1, probe_every)
+        self.min_delay = min_delay
+        self.classes: Dict[str, PacingClass] = {}
+
+    def _state(self, command_class: str) -> PacingClass:
+        state = self.classes.get(command_class)
+        if state is None:
+            # Probe the first command of a class so its latency is known early
+            state = self.classes[command_class] = PacingClass(since_probe=self.probe_every - 1)
+        return state
+
+    def delay(self, command_class: str, base: float) -> float:
+        """Scaled version of a fixed delay for this command class."""
+        return max(self.min_delay, base * self._state(command_class).scale)
+
+    def settle_delay(self, command_class: str, base: float) -> float:
+        """Wait after submitting a command: the scaled delay, but never less than
+        the measured response latency."""
+        state = self._state(command_class)
+        delay = self.delay(command_class, base)
+        if state.latency is not None:
+            delay = max(delay, state.latency)
+        return delay
+
+    def should_probe(self, command_class: str) -> bool:
+        """True when the command just sent should be verified."""
+        state = self._state(command_class)
+        state.since_probe += 1
+        return state.since_probe >= self.probe_every
+
+    def succeeded(self, command_class: str, latency: Optional[float] = None) -> None:
+        """Record a command that went through; latency comes from a probe, if one ran."""
+        state = self._state(command_class)
+        state.successes += 1
+        state.scale = max(self.min_scale, state.scale * self.shrink)
+        if latency is not None:
+            state.since_probe = 0
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += self.smoothing * (latency - state.latency)
+
+    def failed(self, command_class: str) -> None:
+        """Record a dropped or garbled command: back off and probe the next one."""
+        state = self._state(command_class)
+        state.failures += 1
+        state.scale = min(self.max_scale, state.scale * self.backoff)
+        state.since_probe = self.probe_every - 1
+        logger.warning(f"Dropped '{command_class}' command detected; delay scale now {state.scale:.2f}")
+
+    def reset(self) -> None:
+        self.classes.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {"scale": state.scale, "latency": state.latency,
+                       "successes": state.successes, "failures": state.failures}
+                for name, state in self.classes.items()}
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Result Mailbox
+Return channel from AutoCAD to Python. Commands are wrapped in (mcp-run <seq>
+'<form>) (see error_handling.lsp), which evaluates the form and writes one
+record per command to <mailbox dir>/<seq>.json:
+
+    {"seq": 12, "status": "ok", "count": 2, "handles": ["2A3", "2A4"], "error": null}
+
+count is the number of entities the command created; handles lists them (up to
+*mcp-max-handles*). Records are written to a .tmp file and renamed, so a .json
+file is always complete when it appears.
+
+Waiting uses Windows directory change notifications, so the server sleeps until
+AutoCAD writes something instead of polling the disk.
+"""
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, TypeVar
+
+logger = logging.getLogger("autocad-lisp-mcp.result_mailbox")
+
+MAILBOX_DIR = os.path.join(tempfile.gettempdir(), "autocad-mcp-mailbox")
+
+T = TypeVar("T")
+
+
+@dataclass
+class ResultRecord:
+    """What AutoCAD reported back for one command."""
+    seq: int
+    status: str
+    count: int = 0
+    handles: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    @classmethod
+    def from_json(cls, text: str) -> "ResultRecord":
+        data = json.loads(text)
+        return cls(seq=int(data["seq"]), status=str(data.get("status", "ok")),
+                   count=int(data.get("count", 0)), handles=list(data.get("handles") or []),
+                   error=data.get("error"))
+
+    def summary(self) -> str:
+        if not self.ok:
+            return f"AutoCAD reported an error: {self.error}"
+        if not self.count:
+            return "AutoCAD created no entities"
+        shown = ", ".join(self.handles[:5]) + (", ..." if self.count > 5 else "")
+        noun = "entity" if self.count == 1 else "entities"
+        return f"AutoCAD created {self.count} {noun} ({shown})"
+
+
+def record_path(seq: int, directory: str = MAILBOX_DIR) -> str:
+    return os.path.join(directory, f"{seq}.json")
+
+
+def read_record(seq: int, directory: str = MAILBOX_DIR) -> Optional[ResultRecord]:
+    """The record for seq if AutoCAD has written it, else None."""
+    try:
+        with open(record_path(seq, directory)) as f:
+            return ResultRecord.from_json(f.read())
+    except OSError:
+        return None
+    except (ValueError, KeyError) as e:
+        logger.error(f"Unreadable mailbox record {seq}: {str(e)}")
+        return ResultRecord(seq=seq, status="error", error=f"unreadable result record: {e}")
+
+
+def clear_mailbox(directory: str = MAILBOX_DIR) -> None:
+    """Create the mailbox directory and remove records from earlier sessions,
+    so sequence numbers can start again from 1."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")) + glob.glob(os.path.join(directory, "*.tmp")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def variable_query_command(symbol: str, path: str) -> str:
+    """LISP that writes the value of a string-valued global to path ("" if it
+    isn't a string). Uses only built-ins, so it works before anything is loaded."""
+    path = path.replace("\\", "/")
+    return (f'(progn (vl-load-com) (setq mcp-query-file (open "{path}.tmp" "w")) '
+            f'(write-line (if (= (type {symbol}) (quote STR)) {symbol} "") mcp-query-file) '
+            f'(close mcp-query-file) (vl-file-rename "{path}.tmp" "{path}") (princ))')
+
+
+def mailbox_setup_command(directory: str = MAILBOX_DIR) -> str:
+    """LISP pointing mcp-run at the mailbox directory this process watches."""
+    directory = directory.replace("\\", "/").rstrip("/") + "/"
+    return f'(setq *mcp-mailbox-dir* "{directory}")'
+
+
+class DirectoryWatcher:
+    """Blocks until a directory's contents change, using a Windows change
+    notification handle. Without pywin32 it degrades to short sleeps."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._handle = None
+        try:
+            import win32con
+            import win32event
+            import win32file
+        except ImportError:
+            self._win32event = None
+            return
+        self._win32event = win32event
+        self._win32file = win32file
+        # Armed on creation: changes made before wait() is called are not missed
+        self._handle = win32file.FindFirstChangeNotification(
+            directory, False,
+            win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE)
+
+    def wait(self, timeout: float) -> None:
+        """Return once something changed (or timeout seconds passed)."""
+        if self._handle is None:
+            time.sleep(min(timeout, 0.01))
+            return
+        result = self._win32event.WaitForSingleObject(self._handle, max(0, int(timeout * 1000)))
+        if result == self._win32event.WAIT_OBJECT_0:
+            self._win32file.FindNextChangeNotification(self._handle)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._win32file.FindCloseChangeNotification(self._handle)
+            self._handle = None
+
+
+class Mailbox:
+    """Waits for result records in the mailbox directory."""
+
+    def __init__(self, directory: str = MAILBOX_DIR):
+        self.directory = directory
+        self._watcher: Optional[DirectoryWatcher] = None
+
+    def reset(self) -> None:
+        clear_mailbox(self.directory)
+
+    def _ensure_watcher(self) -> DirectoryWatcher:
+        if self._watcher is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._watcher = DirectoryWatcher(self.directory)
+        return self._watcher
+
+    def _wait(self, read: Callable[[], Optional[T]], timeout: float) -> Optional[T]:
+        watcher = self._ensure_watcher()
+        deadline = time.perf_counter() + timeout
+        while True:
+            value = read()
+            if value is not None:
+                return value
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            watcher.wait(remaining)
+
+    def wait_for(self, seq: int, timeout: float) -> Optional[ResultRecord]:
+        """Block until the record for seq arrives; None after timeout seconds."""
+        return self._wait(lambda: read_record(seq, self.directory), timeout)
+
+    def query_path(self, name: str) -> str:
+        """A fresh path in the mailbox for a one-off answer from AutoCAD."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        for stale in (path, path + ".tmp"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        return path
+
+    def wait_for_text(self, path: str, timeout: float) -> Optional[str]:
+        """Block until AutoCAD has written path; returns its contents."""
+        return self._wait(lambda: read_text(path), timeout)
+
+    def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Orthogonal Pipe Router
+Finds orthogonal routes for process lines that go around placed equipment and
+don't run along existing lines, so generated P&IDs stay legible.
+
+Routes are searched with A* over a sparse orthogonal visibility grid: the
+candidate x and y coordinates are the route's end points plus the edges of
+every obstacle (grown by the clearance). Cost is compared as
+(bends, crossings, length), so the route with the fewest bends wins, then the
+one crossing the fewest existing lines, then the shortest. Obstacles and
+lines live in a spatial hash, so checking a grid step only looks at nearby
+geometry.
+
+    router = Router(clearance=2.0)
+    router.add_obstacle(10, -5, 20, 5)          # equipment footprint
+    router.route((0, 0), (30, 0))               # [(0, 0), (0, 7), (30, 7), (30, 0)]
+"""
+import heapq
+import math
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+Point = Tuple[float, float]
+Rect = Tuple[float, float, float, float]  # min x, min y, max x, max y
+
+# Step directions: +x, -x, +y, -y
+_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class SpatialHash:
+    """Buckets items by the grid cells their bounding boxes touch."""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def _span(self, low: float, high: float) -> range:
+        return range(math.floor(low / self.cell_size), math.floor(high / self.cell_size) + 1)
+
+    def insert(self, item: int, box: Rect) -> None:
+        for cx in self._span(box[0], box[2]):
+            for cy in self._span(box[1], box[3]):
+                self.cells.setdefault((cx, cy), []).append(item)
+
+    def remove(self, item: int, box: Rect) -> None:
+        """Forget an item; box must be the one it was inserted with."""
+        for cx in self._span(box[0], box[2]):
+            for cy in self._span(box[1], box[3]):
+                bucket = self.cells.get((cx, cy))
+                if bucket is not None and item in bucket:
+                    bucket.remove(item)
+                    if not bucket:
+                        del self.cells[(cx, cy)]
+
+    def query(self, box: Rect) -> Set[int]:
+        found: Set[int] = set()
+        for cx in self._span(box[0], box[2]):
+            for cy in self._span(box[1], box[3]):
+                found.update(self.cells.get((cx, cy), ()))
+        return found
+
+
+def _normalize(x1: float, y1: float, x2: float, y2: float) -> Rect:
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+def _inside(rect: Rect, x: float, y: float) -> bool:
+    return rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]
+
+
+def simplify(points: Sequence[Point]) -> List[Point]:
+    """Drop repeated points and the middle point of collinear runs."""
+    result: List[Point] = []
+    for point in points:
+        if result and result[-1] == point:
+            continue
+        if len(result) >= 2:
+            (ax, ay), (bx, by) = result[-2], result[-1]
+            if (ax == bx == point[0]) or (ay == by == point[1]):
+                result[-1] = point
+                continue
+        result.append(point)
+    return result
+
+
+def elbow_route(x1: float, y1: float, x2: float, y2: float) -> List[Point]:
+    """The single-bend route c:connect-equipment draws: the longer leg first."""
+    middle = (x2, y1) if abs(x2 - x1) > abs(y2 - y1) else (x1, y2)
+    return simplify([(x1, y1), middle, (x2, y2)])
+
+
+class Router:
+    """Orthogonal router over a set of rectangular obstacles and existing lines."""
+
+    def __init__(self, clearance: float = 2.0, cell_size: float = 20.0, margin: float = 20.0,
+                 lanes: int = 3, max_expansions: int = 20000):
+        self.clearance = clearance
+        self.lanes = max(1, lanes)
+        self.margin = margin  # How far routes may leave the box around their end points and obstacles
+        self.max_expansions = max_expansions
+        self.obstacles: List[Rect] = []   # Grown by the clearance
+        self.lines: List[Rect] = []       # Axis-aligned segments as degenerate boxes
+        self._obstacle_hash = SpatialHash(cell_size)
+        self._line_hash = SpatialHash(cell_size)
+
+    def clear(self) -> None:
+        """Forget all obstacles and lines."""
+        cell_size = self._obstacle_hash.cell_size
+        self.obstacles.clear()
+        self.lines.clear()
+        self._obstacle_hash = SpatialHash(cell_size)
+        self._line_hash = SpatialHash(cell_size)
+
+    def add_obstacle(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        """Block a rectangle (e.g. an equipment footprint) for routes."""
+        c = self.clearance
+        box = _normalize(x1, y1, x2, y2)
+        grown = (box[0] - c, box[1] - c, box[2] + c, box[3] + c)
+        self._obstacle_hash.insert(len(self.obstacles), grown)
+        self.obstacles.append(grown)
+
+    def add_line(self, points: Sequence[Point]) -> None:
+        """Register an existing line or polyline. Routes may cross it but not run along it."""
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            box = _normalize(x1, y1, x2, y2)
+            self._line_hash.insert(len(self.lines), box)
+            self.lines.append(box)
+
+    def _crossings(self, box: Rect, horizontal: bool, ignored: Set[int]) -> Optional[int]:
+        """Number of existing lines a grid step crosses, or None if it runs along one."""
+        crossings = 0
+        c = self.clearance
+        for index in self._line_hash.query((box[0] - c, box[1] - c, box[2] + c, box[3] + c)):
+            if index in ignored:
+                continue
+            line = self.lines[index]
+            if (line[1] == line[3]) == horizontal:
+                # Parallel: reject if it overlaps the line closer than the clearance
+                if horizontal and abs(line[1] - box[1]) < c and line[0] < box[2] and box[0] < line[2]:
+                    return None
+                if not horizontal and abs(line[0] - box[0]) < c and line[1] < box[3] and box[1] < line[3]:
+                    return None
+            elif horizontal:
+                # Count a crossing once, at the step that reaches the line's x
+                if box[0] < line[0] <= box[2] and line[1] < box[1] < line[3]:
+                    crossings += 1
+            elif box[1] < line[1] <= box[3] and line[0] < box[0] < line[2]:
+                crossings += 1
+        return crossings
+
+    def route(self, start: Point, end: Point) -> Optional[List[Point]]:
+        """Fewest-bend orthogonal route from start to end, or None if there is none.
+
+        Obstacles containing start or end are ignored for this route, so
+        connection points on or inside a footprint work. So are lines passing
+        within the clearance of start or end, so a route can tee into a line."""
+        start = (float(start[0]), float(start[1]))
+        end = (float(end[0]), float(end[1]))
+        if start == end:
+            return [start]
+
+        low_x = min(start[0], end[0]) - self.margin
+        high_x = max(start[0], end[0]) + self.margin
+        low_y = min(start[1], end[1]) - self.margin
+        high_y = max(start[1], end[1]) + self.margin
+        nearby = [self.obstacles[i] for i in self._obstacle_hash.query((low_x, low_y, high_x, high_y))]
+        obstacles = [o for o in nearby if not (_inside(o, *start) or _inside(o, *end))]
+        c = self.clearance
+        ignored = set()
+        for x, y in (start, end):
+            for index in self._line_hash.query((x - c, y - c, x + c, y + c)):
+                if self._near(self.lines[index], x, y):
+                    ignored.add(index)
+        # Grow the search box to take in the obstacles it cuts, so routes can go round them
+        for o in obstacles:
+            low_x, low_y = min(low_x, o[0] - self.margin), min(low_y, o[1] - self.margin)
+            high_x, high_y = max(high_x, o[2] + self.margin), max(high_y, o[3] + self.margin)
+        # Each obstacle side gets `lanes` parallel grid lines, a clearance apart, so
+        # several routes can pass the same obstacle side by side
+        xs = {start[0], end[0], low_x, high_x}
+        ys = {start[1], end[1], low_y, high_y}
+        for o in obstacles:
+            for k in range(self.lanes):
+                xs.update((o[0] - k * c, o[2] + k * c))
+                ys.update((o[1] - k * c, o[3] + k * c))
+        points = self._search(start, end, obstacles, ignored, sorted(xs), sorted(ys))
+        if points is None and self.lines:
+            # Existing lines can wall a route in; retry with grid lines one
+            # clearance either side of them, so routes can run beside them
+            for index in self._line_hash.query((low_x, low_y, high_x, high_y)):
+                line = self.lines[index]
+                if line[0] == line[2] and low_x < line[0] < high_x:
+                    xs.update((line[0] - c, line[0] + c))
+                elif line[1] == line[3] and low_y < line[1] < high_y:
+                    ys.update((line[1] - c, line[1] + c))
+            points = self._search(start, end, obstacles, ignored, sorted(xs), sorted(ys))
+        return points
+
+    def _near(self, line: Rect, x: float, y: float) -> bool:
+        c = self.clearance
+        return line[0] - c < x < line[2] + c and line[1] - c < y < line[3] + c
+
+    def _search(self, start: Point, end: Point, obstacles: List[Rect], ignored: Set[int],
+                xs: List[float], ys: List[float]) -> Optional[List[Point]]:
+        """A* over the grid formed by xs and ys."""
+
+        # Every obstacle edge is a grid line, so a step between neighbouring grid
+        # coordinates is either wholly inside an obstacle or wholly outside it
+        blocked: Set[Tuple[int, int, int]] = set()  # (i, j, 0) = step +x from (i, j); (i, j, 1) = +y
+        for o in obstacles:
+            x0, x1 = bisect_left(xs, o[0]), bisect_left(xs, o[2])
+            y0, y1 = bisect_left(ys, o[1]), bisect_left(ys, o[3])
+            for i in range(x0, x1):
+                for j in range(y0 + 1, y1):
+                    blocked.add((i, j, 0))
+            for i in range(x0 + 1, x1):
+                for j in range(y0, y1):
+                    blocked.add((i, j, 1))
+        crossings_cache: Dict[Tuple[int, int, int], Optional[int]] = {}
+
+        def step_crossings(i, j, axis):
+            key = (i, j, axis)
+            if key not in crossings_cache:
+                if axis == 0:
+                    box = (xs[i], ys[j], xs[i + 1], ys[j])
+                else:
+                    box = (xs[i], ys[j], xs[i], ys[j + 1])
+                crossings_cache[key] = self._crossings(box, axis == 0, ignored) if self.lines else 0
+            return crossings_cache[key]
+
+        goal = (bisect_left(xs, end[0]), bisect_left(ys, end[1]))
+        origin = (bisect_left(xs, start[0]), bisect_left(ys, start[1]))
+
+        def heuristic(node, direction):
+            dx, dy = xs[goal[0]] - xs[node[0]], ys[goal[1]] - ys[node[1]]
+            bends = 0
+            if dx and dy:
+                bends = 1
+            elif direction is not None and (dx or dy):
+                # Aligned with the goal but heading another way
+                along = (dx > 0) - (dx < 0), (dy > 0) - (dy < 0)
+                if along != direction:
+                    bends = 2 if along == (-direction[0], -direction[1]) else 1
+            return bends, abs(dx) + abs(dy)
+
+        counter = 0
+        h_bends, h_length = heuristic(origin, None)
+        queue = [(h_bends, 0, h_length, counter, origin, None)]
+        best: Dict[Tuple, Tuple[int, int, float]] = {(origin, None): (0, 0, 0.0)}
+        parents: Dict[Tuple, Tuple] = {}
+        done: Set[Tuple] = set()
+        while queue:
+            _, _, _, _, node, direction = heapq.heappop(queue)
+            state = (node, direction)
+            if state in done:
+                continue
+            done.add(state)
+            if node == goal:
+                points = [(xs[node[0]], ys[node[1]])]
+                while state in parents:
+                    state = parents[state]
+                    points.append((xs[state[0][0]], ys[state[0][1]]))
+                return simplify(points[::-1])
+            if len(done) > self.max_expansions:
+                return None
+            bends, crossings, length = best[state]
+            for step in _DIRECTIONS:
+                if direction is not None and step == (-direction[0], -direction[1]):
+                    continue
+                nx, ny = node[0] + step[0], node[1] + step[1]
+                if not (0 <= nx < len(xs) and 0 <= ny < len(ys)):
+                    continue
+                # Steps are keyed by their lower grid node
+                i, j = min(node[0], nx), min(node[1], ny)
+                axis = 0 if step[1] == 0 else 1
+                if (i, j, axis) in blocked:
+                    continue
+                extra = step_crossings(i, j, axis)
+                if extra is None:
+                    continue
+                cost = (bends + (direction is not None and step != direction),
+                        crossings + extra,
+                        length + abs(xs[nx] - xs[node[0]]) + abs(ys[ny] - ys[node[1]]))
+                next_state = ((nx, ny), step)
+                if next_state in best and best[next_state] <= cost:
+                    continue
+                best[next_state] = cost
+                parents[next_state] = state
+                h_bends, h_length = heuristic((nx, ny), step)
+                counter += 1
+                heapq.heappush(queue, (cost[0] + h_bends, cost[1], cost[2] + h_length, counter,
+                                       (nx, ny), step))
+        return None
+
+    def route_and_add(self, start: Point, end: Point) -> Optional[List[Point]]:
+        """Route, then register the route as an existing line for later routes."""
+        points = self.route(start, end)
+        if points and len(points) > 1:
+            self.add_line(points)
+        return points
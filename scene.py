@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Scene Model
+Remembers what the server has drawn, so questions about the drawing ("what is
+at (x, y)?", "would a pump here overlap anything?", "where is P-101?") are
+answered in Python instead of with a round-trip to AutoCAD.
+
+Every entity is a small slotted record with its bounding box. The boxes live in
+a spatial hash, so point and area queries only look at nearby entities. Block
+sizes are not known to the server, so blocks are recorded with the footprint
+the caller gives (see FOOTPRINTS in server_lisp_fast.py).
+
+The model only knows what went through the server: anything drawn or edited by
+hand in AutoCAD is invisible to it until clear() is called and the drawing is
+rebuilt through the tools.
+
+    scene = Scene()
+    scene.add_block("PUMP", 20, 0, 10, 10, tag="P-101")
+    scene.add_line(0, 0, 40, 0, layer="PID-PROCESS-PIPING")
+    [e.kind for e in scene.at(20, 3)]           # ["block"]
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from routing import Point, Rect, SpatialHash
+
+DEFAULT_LAYER = "0"
+
+
+@dataclass(slots=True)
+class Layer:
+    name: str
+    color: str = "white"
+    linetype: str = "CONTINUOUS"
+
+
+@dataclass(slots=True)
+class Entity:
+    """One drawn entity. points holds the vertices of lines and polylines, the
+    centre of circles and the insertion point of blocks and text."""
+    id: int
+    kind: str  # "line", "polyline", "circle", "text", "block", "arc", ...
+    layer: str
+    bbox: Rect
+    points: Tuple[Point, ...] = ()
+    radius: float = 0.0
+    closed: bool = False
+    name: str = ""  # Block name or text string
+    tag: str = ""   # Block ID / equipment tag
+
+    @property
+    def area(self) -> float:
+        return (self.bbox[2] - self.bbox[0]) * (self.bbox[3] - self.bbox[1])
+
+    def describe(self) -> str:
+        x, y = self.points[0] if self.points else (self.bbox[0], self.bbox[1])
+        label = f" {self.name}" if self.name else ""
+        tag = f" [{self.tag}]" if self.tag else ""
+        return f"#{self.id} {self.kind}{label}{tag} on {self.layer} at ({x:g}, {y:g})"
+
+
+def _bounds(points: Iterable[Point]) -> Rect:
+    xs, ys = zip(*points)
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _intersects(a: Rect, b: Rect) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _segment_distance(x: float, y: float, a: Point, b: Point) -> float:
+    (ax, ay), (bx, by) = a, b
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if not length else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length))
+    return math.hypot(x - (ax + t * dx), y - (ay + t * dy))
+
+
+def _inside_polygon(x: float, y: float, points: Sequence[Point]) -> bool:
+    inside = False
+    for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1]):
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+class Scene:
+    """In-memory model of the entities, blocks, tags and layers in the drawing."""
+
+    def __init__(self, cell_size: float = 50.0):
+        self.cell_size = cell_size
+        self.version = 0  # Bumped on every change, so derived data knows when to rebuild
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget everything, e.g. after the drawing was changed by hand."""
+        self.entities: Dict[int, Entity] = {}
+        self.layers: Dict[str, Layer] = {DEFAULT_LAYER: Layer(DEFAULT_LAYER)}
+        self.current_layer = DEFAULT_LAYER
+        self.tags: Dict[str, int] = {}  # Upper-cased tag -> entity id
+        self.version += 1
+        self._next_id = 1
+        self._index = SpatialHash(self.cell_size)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    # ---- layers ---------------------------------------------------------------
+
+    def set_layer(self, name: str, color: Optional[str] = None, linetype: Optional[str] = None,
+                  current: bool = True) -> Layer:
+        """Record a layer (creating it if needed) and optionally make it current."""
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = self.layers[name] = Layer(name)
+        if color is not None:
+            layer.color = color
+        if linetype is not None:
+            layer.linetype = linetype
+        if current:
+            self.current_layer = name
+        self.version += 1
+        return layer
+
+    # ---- adding and changing entities ------------------------------------------
+
+    def add(self, kind: str, bbox: Rect, layer: Optional[str] = None, **fields) -> Entity:
+        """Record an entity of any kind by its bounding box; the add_* helpers
+        below work the box out for the common kinds."""
+        layer = layer or self.current_layer
+        if layer not in self.layers:
+            self.layers[layer] = Layer(layer)
+        entity = Entity(self._next_id, kind, layer, bbox, **fields)
+        self._next_id += 1
+        self.entities[entity.id] = entity
+        self._index.insert(entity.id, bbox)
+        if entity.tag:
+            self.tags[entity.tag.upper()] = entity.id
+        self.version += 1
+        return entity
+
+    def add_line(self, x1: float, y1: float, x2: float, y2: float,
+                 layer: Optional[str] = None) -> Entity:
+        points = ((x1, y1), (x2, y2))
+        return self.add("line", _bounds(points), layer, points=points)
+
+    def add_polyline(self, points: Sequence[Sequence[float]], closed: bool = False,
+                     layer: Optional[str] = None) -> Entity:
+        points = tuple((float(x), float(y)) for x, y, *_ in points)
+        return self.add("polyline", _bounds(points), layer, points=points, closed=closed)
+
+    def add_circle(self, x: float, y: float, radius: float, layer: Optional[str] = None) -> Entity:
+        return self.add("circle", (x - radius, y - radius, x + radius, y + radius), layer,
+                        points=((x, y),), radius=radius)
+
+    def add_text(self, x: float, y: float, text: str, height: float, centered: bool = False,
+                 tag: str = "", layer: Optional[str] = None) -> Entity:
+        """Record text inserted at its left baseline, or at its middle when
+        centered; the width is estimated from the character count."""
+        width = 0.8 * height * max(1, len(text))
+        left, bottom = (x - width / 2.0, y - height / 2.0) if centered else (x, y)
+        return self.add("text", (left, bottom, left + width, bottom + height), layer,
+                        points=((x, y),), name=text, tag=tag)
+
+    def add_block(self, name: str, x: float, y: float, width: float, height: float,
+                  tag: str = "", layer: Optional[str] = None) -> Entity:
+        """Record a block reference with a width x height footprint centred on (x, y)."""
+        bbox = (x - width / 2.0, y - height / 2.0, x + width / 2.0, y + height / 2.0)
+        return self.add("block", bbox, layer, points=((x, y),), name=name, tag=tag)
+
+    def remove(self, entity_id: int) -> Optional[Entity]:
+        entity = self.entities.pop(entity_id, None)
+        if entity is not None:
+            self._index.remove(entity_id, entity.bbox)
+            if entity.tag and self.tags.get(entity.tag.upper()) == entity_id:
+                del self.tags[entity.tag.upper()]
+            self.version += 1
+        return entity
+
+    def move(self, entity_id: int, dx: float, dy: float) -> Optional[Entity]:
+        entity = self.entities.get(entity_id)
+        if entity is None:
+            return None
+        self._index.remove(entity_id, entity.bbox)
+        x1, y1, x2, y2 = entity.bbox
+        entity.bbox = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+        entity.points = tuple((x + dx, y + dy) for x, y in entity.points)
+        self._index.insert(entity_id, entity.bbox)
+        self.version += 1
+        return entity
+
+    def last(self) -> Optional[Entity]:
+        """The most recently added entity still in the scene, like (entlast)."""
+        return self.entities[next(reversed(self.entities))] if self.entities else None
+
+    # ---- batches ----------------------------------------------------------------
+
+    def checkpoint(self) -> int:
+        """Marker for rollback(); entities added after it can be dropped again."""
+        return self._next_id
+
+    def rollback(self, checkpoint: int) -> int:
+        """Remove every entity added since checkpoint; returns how many."""
+        added = [entity_id for entity_id in self.entities if entity_id >= checkpoint]
+        for entity_id in added:
+            self.remove(entity_id)
+        return len(added)
+
+    # ---- queries ----------------------------------------------------------------
+
+    def find_tag(self, tag: str) -> Optional[Entity]:
+        entity_id = self.tags.get(tag.upper())
+        return self.entities.get(entity_id) if entity_id is not None else None
+
+    def in_area(self, x1: float, y1: float, x2: float, y2: float, kind: Optional[str] = None,
+                layer: Optional[str] = None) -> List[Entity]:
+        """Entities whose bounding box touches the rectangle, oldest first."""
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        found = []
+        for entity_id in sorted(self._index.query(box)):
+            entity = self.entities[entity_id]
+            if ((kind is None or entity.kind == kind)
+                    and (layer is None or entity.layer.upper() == layer.upper())
+                    and _intersects(entity.bbox, box)):
+                found.append(entity)
+        return found
+
+    def at(self, x: float, y: float, tolerance: float = 0.5) -> List[Entity]:
+        """Entities at a point, smallest first: lines and outlines within
+        tolerance of it, and blocks, text, circles and closed polylines containing it."""
+        found = []
+        for entity in self.in_area(x - tolerance, y - tolerance, x + tolerance, y + tolerance):
+            if entity.kind in ("line", "polyline"):
+                segments = list(zip(entity.points, entity.points[1:]))
+                if entity.closed and len(entity.points) > 2:
+                    segments.append((entity.points[-1], entity.points[0]))
+                hit = any(_segment_distance(x, y, a, b) <= tolerance for a, b in segments)
+                if not hit and entity.closed and len(entity.points) > 2:
+                    hit = _inside_polygon(x, y, entity.points)
+            elif entity.kind == "circle":
+                cx, cy = entity.points[0]
+                hit = math.hypot(x - cx, y - cy) <= entity.radius + tolerance
+            else:
+                hit = True  # Blocks, text, arcs...: the bounding box is all that is known
+            if hit:
+                found.append(entity)
+        found.sort(key=lambda entity: entity.area)
+        return found
+
+    def overlaps(self, x1: float, y1: float, x2: float, y2: float,
+                 kinds: Sequence[str] = ("block", "text")) -> List[Entity]:
+        """Entities of the given kinds a new footprint would overlap, for
+        placement checks before anything is drawn."""
+        return [entity for entity in self.in_area(x1, y1, x2, y2) if entity.kind in kinds]
+
+    def obstacles(self) -> List[Rect]:
+        """Bounding boxes of every block, for the router."""
+        return [entity.bbox for entity in self.entities.values() if entity.kind == "block"]
+
+    def lines_on(self, layer: str) -> List[Tuple[Point, ...]]:
+        """Vertices of every line and polyline on a layer."""
+        return [entity.points + (entity.points[:1] if entity.closed else ())
+                for entity in self.entities.values()
+                if entity.kind in ("line", "polyline") and entity.layer.upper() == layer.upper()]
+
+    def summary(self) -> Dict[str, int]:
+        """Number of entities of each kind."""
+        counts: Dict[str, int] = {}
+        for entity in self.entities.values():
+            counts[entity.kind] = counts.get(entity.kind, 0) + 1
+        return counts
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Script Compiler
+Compiles a run of LISP commands into AutoCAD script (.scr) files, so the whole
+run executes with one SCRIPT command: AutoCAD reads the commands from disk
+itself instead of having them typed into the command line a key at a time.
+
+Each command becomes one script line, (mcp-script-eval '<form>), which runs the
+form and carries on if it fails. Long runs are split into several files of at
+most max_lines commands; each file ends by starting the next with SCRIPT, and
+the last ends with (mcp-script-done), which reports the run's result the way
+mcp-run does (see error_handling.lsp).
+
+Files are named by the hash of their contents, so compiling the same run again
+finds the scripts already on disk and writes nothing:
+
+    paths, cached = compile_script(["(c:create-line 0 0 10 0)", ...])
+    # then in AutoCAD: (mcp-run-script 12 "<paths[0]>")
+"""
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from lisp_bundle import BUILD_DIR, content_hash
+from lisp_serializer import Expr, lisp_call
+
+logger = logging.getLogger("autocad-lisp-mcp.script_compiler")
+
+SCRIPT_DIR = os.path.join(BUILD_DIR, "scripts")  # Inside lisp-code, so it shares its trusted path
+MAX_SCRIPT_LINES = 5000  # Commands per script file
+SCRIPT_DONE = "(mcp-script-done)"
+
+
+def script_line(form: str) -> str:
+    """A LISP form as one script line. Forms built by lisp_serializer never
+    contain raw newlines, and a blank line would repeat the last command."""
+    if "\n" in form or "\r" in form:
+        raise ValueError("a script line can't contain a newline")
+    return lisp_call("mcp-script-eval", Expr("'" + form))
+
+
+def script_path(script_dir: str, text: str) -> str:
+    """Where a script with this content lives, with the forward slashes AutoCAD wants."""
+    return os.path.join(script_dir, f"mcp-script-{content_hash(text)}.scr").replace("\\", "/")
+
+
+def compile_script(forms: Sequence[str], max_lines: int = MAX_SCRIPT_LINES,
+                   script_dir: Optional[str] = None) -> Tuple[List[str], bool]:
+    """Write forms as a chain of script files.
+
+    Returns (paths, cached): the files in the order they run, so paths[0] is
+    the one to start, and whether every file was already on disk. The files
+    are built last to first, because each one names the next."""
+    if max_lines < 1:
+        raise ValueError("max_lines must be at least 1")
+    script_dir = script_dir or SCRIPT_DIR
+    lines = [script_line(form) for form in forms]
+    chunks = [lines[i:i + max_lines] for i in range(0, len(lines), max_lines)] or [[]]
+    paths: List[str] = []
+    written = 0
+    tail = SCRIPT_DONE
+    for chunk in reversed(chunks):
+        text = "\n".join(chunk + [tail]) + "\n"
+        path = script_path(script_dir, text)
+        if not os.path.exists(path):
+            os.makedirs(script_dir, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+            written += 1
+        paths.append(path)
+        tail = lisp_call("command", "_.SCRIPT", path)
+    paths.reverse()
+    if written:
+        logger.info(f"Compiled {len(lines)} commands into {len(paths)} scripts "
+                    f"({written} written, {len(paths) - written} reused)")
+    return paths, not written
@@ -13,17 +13,14 @@ import logging
 import sys
 import os
 import time
-import subprocess
-import tempfile
-import pyperclip
-from pathlib import Path
-import win32gui
-import win32con
-import keyboard
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, List, Tuple
 
 from mcp.server.fastmcp import FastMCP
 
+from transport import get_transport
+from lisp_serializer import lisp_call, quoted_points
+from lisp_bundle import SERVER_FILES, LispLoader
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -37,7 +34,9 @@ autocad_mcp = FastMCP("autocad-lisp-server")
 
 # Global variables
 acad_window = None
+lisp_initialized = False  # Set once initialize_autocad_lisp has found AutoCAD
 lisp_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lisp-code")
+lisp_loader = LispLoader(lisp_path)
 
 # Configuration flag to disable ESC key presses if they cause issues
 # Set to False if AutoCAD help menu keeps opening
@@ -45,20 +44,12 @@ USE_ESC_KEY = True
 
 def find_autocad_window():
     """Find the AutoCAD LT window handle by checking window titles."""
-    def enum_windows_callback(hwnd, result):
-        if win32gui.IsWindowVisible(hwnd):
-            window_text = win32gui.GetWindowText(hwnd)
-            win_text = window_text.lower()
-            if "autocad" in win_text and ("drawing" in win_text or ".dwg" in win_text):
-                result.append(hwnd)
-        return True
-    
-    windows = []
-    win32gui.EnumWindows(enum_windows_callback, windows)
-    
-    if windows:
-        return windows[0]
-    return None
+    return get_transport().find_window()
+
+def ensure_initialized():
+    """Load the LISP libraries the first time a tool needs AutoCAD, not at startup."""
+    if not lisp_initialized:
+        initialize_autocad_lisp()
 
 def load_lisp_file(file_path):
     """Load a LISP file into AutoCAD by simulating typed commands."""
@@ -69,20 +60,21 @@ def load_lisp_file(file_path):
         if not acad_window:
             return False, "AutoCAD LT window not found"
     
+    transport = get_transport()
     try:
-        win32gui.SetForegroundWindow(acad_window)
-        time.sleep(0.5)
+        transport.focus(acad_window)
+        transport.sleep(0.5)
         
         # Single ESC with proper delay
-        keyboard.press_and_release('esc')
-        time.sleep(0.5)
-        keyboard.write("(load \"{}\")".format(file_path.replace('\\', '/')))
-        time.sleep(0.5)
-        keyboard.press_and_release('enter')
+        transport.press('esc')
+        transport.sleep(0.5)
+        transport.write("(load \"{}\")".format(file_path.replace('\\', '/')))
+        transport.sleep(0.5)
+        transport.press('enter')
         
         # Extended delay for security prompt acceptance
         # Adjust this value if you need more time to accept the prompt
-        time.sleep(3.0)  # Increased from 0.5 to 3.0 seconds
+        transport.sleep(3.0)  # Increased from 0.5 to 3.0 seconds
         
         return True, f"LISP file '{os.path.basename(file_path)}' loaded successfully"
     except Exception as e:
@@ -93,24 +85,26 @@ def execute_lisp_command(command):
     """Execute a LISP command in AutoCAD by simulating typed commands."""
     global acad_window
     
+    ensure_initialized()
     if not acad_window:
         acad_window = find_autocad_window()
         if not acad_window:
             return False, "AutoCAD LT window not found"
     
+    transport = get_transport()
     try:
-        win32gui.SetForegroundWindow(acad_window)
-        time.sleep(0.2)
+        transport.focus(acad_window)
+        transport.sleep(0.2)
         
         if USE_ESC_KEY:
             # Single ESC with longer delay to avoid accidental key combinations
-            keyboard.press_and_release('esc')
-            time.sleep(0.3)  # Increased delay to ensure clean key release
+            transport.press('esc')
+            transport.sleep(0.3)  # Increased delay to ensure clean key release
         
-        keyboard.write(command)
-        time.sleep(0.1)
-        keyboard.press_and_release('enter')
-        time.sleep(0.2)  # Small wait to ensure command is fully processed
+        transport.write(command)
+        transport.sleep(0.1)
+        transport.press('enter')
+        transport.sleep(0.2)  # Small wait to ensure command is fully processed
         return True, f"Command executed: {command}"
     except Exception as e:
         logger.error(f"Error executing LISP command: {str(e)}")
@@ -120,29 +114,31 @@ def execute_lisp_from_clipboard():
     """Execute LISP code from clipboard in AutoCAD."""
     global acad_window
     
+    ensure_initialized()
     if not acad_window:
         acad_window = find_autocad_window()
         if not acad_window:
             return False, "AutoCAD LT window not found"
     
+    transport = get_transport()
     try:
-        win32gui.SetForegroundWindow(acad_window)
-        time.sleep(0.2)
+        transport.focus(acad_window)
+        transport.sleep(0.2)
         
         if USE_ESC_KEY:
             # Single ESC with longer delay to avoid accidental key combinations
-            keyboard.press_and_release('esc')
-            time.sleep(0.3)  # Increased delay to ensure clean key release
+            transport.press('esc')
+            transport.sleep(0.3)  # Increased delay to ensure clean key release
         
-        keyboard.write("(eval (read))")
-        time.sleep(0.1)
-        keyboard.press_and_release('enter')
-        time.sleep(0.2)
+        transport.write("(eval (read))")
+        transport.sleep(0.1)
+        transport.press('enter')
+        transport.sleep(0.2)
         
-        keyboard.press_and_release('ctrl+v')
-        time.sleep(0.1)
-        keyboard.press_and_release('enter')
-        time.sleep(0.5)
+        transport.press('ctrl+v')
+        transport.sleep(0.1)
+        transport.press('enter')
+        transport.sleep(0.5)
         
         return True, "LISP code from clipboard executed successfully"
     except Exception as e:
@@ -154,38 +150,29 @@ def initialize_autocad_lisp():
     Initialize AutoCAD with LISP capabilities for general drafting.
     Loads multiple LISP files for advanced drafting, geometry, annotation, etc.
     """
-    global acad_window, lisp_path
+    global acad_window, lisp_path, lisp_initialized
     
     acad_window = find_autocad_window()
     if not acad_window:
         logger.error("AutoCAD LT window not found. Make sure AutoCAD LT is running with a drawing open.")
         return False
+    lisp_initialized = True
     
-    lisp_files = [
-        "error_handling.lsp",
-        "basic_shapes.lsp",
-        "drafting_helpers.lsp",
-        "block_id_helpers.lsp",
-        "selection_and_file.lsp",
-        "advanced_geometry.lsp",
-        "advanced_entities.lsp",
-        "entity_modification.lsp",
-        "annotation_helpers.lsp",
-        "layout_management.lsp"
-    ]
-    
+    # Loaded as one bundle; files this AutoCAD session already has are skipped
+    lisp_files = SERVER_FILES["basic"]
     for f in lisp_files:
         full_path = os.path.join(lisp_path, f)
-        if os.path.exists(full_path):
-            success, message = load_lisp_file(full_path)
-            if not success:
-                logger.error(f"Failed to load {f}: {message}")
-                return False
-        else:
+        if not os.path.exists(full_path):
             logger.error(f"LISP file not found: {full_path}")
             return False
     
-    logger.info("Successfully loaded all LISP libraries for a general 2D drafting assistant.")
+    success, message = lisp_loader.ensure_loaded(get_transport(), acad_window, lisp_files,
+                                                 load_lisp_file)
+    if not success:
+        logger.error(f"Failed to load LISP libraries: {message}")
+        return False
+    
+    logger.info(f"{message}. LISP libraries for a general 2D drafting assistant are ready.")
     return True
 
 @autocad_mcp.tool()
@@ -195,18 +182,18 @@ async def get_autocad_status() -> str:
     
     if acad_window is None:
         if initialize_autocad_lisp():
-            window_title = win32gui.GetWindowText(acad_window)
+            window_title = get_transport().window_title(acad_window)
             return f"Successfully connected to AutoCAD LT: {window_title}"
         else:
             return "Failed to connect to AutoCAD LT. Please ensure it is running with a drawing open."
     
     try:
-        window_title = win32gui.GetWindowText(acad_window)
+        window_title = get_transport().window_title(acad_window)
         if "AutoCAD LT" in window_title:
             return f"Connected to AutoCAD: {window_title}"
         else:
             if initialize_autocad_lisp():
-                window_title = win32gui.GetWindowText(acad_window)
+                window_title = get_transport().window_title(acad_window)
                 return f"Reconnected to AutoCAD: {window_title}"
             return "Lost connection to AutoCAD LT."
     except Exception as e:
@@ -220,7 +207,7 @@ async def get_autocad_status() -> str:
 
 @autocad_mcp.tool()
 async def create_line(start_x: float, start_y: float, end_x: float, end_y: float) -> str:
-    cmd = f"(c:create-line {start_x} {start_y} {end_x} {end_y})"
+    cmd = lisp_call("c:create-line", start_x, start_y, end_x, end_y)
     success, message = execute_lisp_command(cmd)
     if success:
         return f"Line created from ({start_x},{start_y}) to ({end_x},{end_y})."
@@ -228,7 +215,7 @@ async def create_line(start_x: float, start_y: float, end_x: float, end_y: float
 
 @autocad_mcp.tool()
 async def create_circle(center_x: float, center_y: float, radius: float) -> str:
-    cmd = f"(c:create-circle {center_x} {center_y} {radius})"
+    cmd = lisp_call("c:create-circle", center_x, center_y, radius)
     success, message = execute_lisp_command(cmd)
     if success:
         return f"Circle created at ({center_x},{center_y}), radius {radius}."
@@ -236,8 +223,7 @@ async def create_circle(center_x: float, center_y: float, radius: float) -> str:
 
 @autocad_mcp.tool()
 async def create_text(x: float, y: float, text: str, height: float = 2.5) -> str:
-    text_escaped = text.replace('"', '\\"')
-    cmd = f'(c:create-text {x} {y} "{text_escaped}" {height})'
+    cmd = lisp_call("c:create-text", x, y, text, height)
     success, message = execute_lisp_command(cmd)
     if success:
         return f"Text '{text}' created at ({x},{y})."
@@ -246,8 +232,7 @@ async def create_text(x: float, y: float, text: str, height: float = 2.5) -> str
 @autocad_mcp.tool()
 async def insert_block(block_name: str, x: float, y: float, block_id: str = "",
                        scale: float = 1.0, rotation: float = 0.0) -> str:
-    block_id_escaped = block_id.replace('"', '\\"')
-    cmd = f'(c:insert_block "{block_name}" {x} {y} "{block_id_escaped}" {scale} {rotation})'
+    cmd = lisp_call("c:insert_block", block_name, x, y, block_id, scale, rotation)
     success, message = execute_lisp_command(cmd)
     if success:
         return f"Block '{block_name}' inserted at ({x},{y}) with ID '{block_id}'."
@@ -256,16 +241,51 @@ async def insert_block(block_name: str, x: float, y: float, block_id: str = "",
 @autocad_mcp.tool()
 async def connect_blocks(start_id: str, end_id: str, layer: str = "Connections", 
                          from_point: str = "CONN_DEFAULT1", to_point: str = "CONN_DEFAULT2") -> str:
-    cmd = f'(c:connect_blocks_by_id "{start_id}" "{end_id}" "{layer}" "{from_point}" "{to_point}")'
+    cmd = lisp_call("c:connect_blocks_by_id", start_id, end_id, layer, from_point, to_point)
     success, message = execute_lisp_command(cmd)
     if success:
         return f"Connected block '{start_id}' to '{end_id}' on layer '{layer}'."
     return message
 
+@autocad_mcp.tool()
+async def connect_blocks_bulk(connections: List[Dict[str, str]]) -> str:
+    """Connect many pairs of blocks in one operation.
+    
+    connections: list of {"start_id", "end_id", "from_point", "to_point", "layer"};
+    only the IDs are required, the rest default as in connect_blocks.
+    All IDs are looked up together and the lines are drawn layer by layer."""
+    edges = []
+    rejected = 0
+    for connection in connections:
+        if (not isinstance(connection, dict) or not connection.get("start_id")
+                or not connection.get("end_id")):
+            rejected += 1
+            continue
+        edges.append([str(connection["start_id"]), str(connection["end_id"]),
+                      str(connection.get("from_point", "CONN_DEFAULT1")),
+                      str(connection.get("to_point", "CONN_DEFAULT2")),
+                      str(connection.get("layer", "Connections"))])
+    if not edges:
+        return "No connections with both a start_id and an end_id."
+    # Stable sort, so each layer is set up once and its lines go out together
+    edges.sort(key=lambda edge: edge[4])
+    try:
+        get_transport().copy(lisp_call("c:connect_blocks_bulk", edges))
+        success, message = execute_lisp_from_clipboard()
+    except Exception as e:
+        logger.error(f"Error in connect_blocks_bulk: {str(e)}")
+        return f"Error: {str(e)}"
+    if not success:
+        return message
+    layers = len({edge[4] for edge in edges})
+    result = f"Sent {len(edges)} connections on {layers} layer(s) in one operation."
+    if rejected:
+        result += f" {rejected} skipped for missing IDs."
+    return result
+
 @autocad_mcp.tool()
 async def label_block(block_id: str, label_text: str, height: float = 2.5) -> str:
-    label_escaped = label_text.replace('"', '\\"')
-    cmd = f'(c:label_block_by_id "{block_id}" "{label_escaped}" {height})'
+    cmd = lisp_call("c:label_block_by_id", block_id, label_text, height)
     success, message = execute_lisp_command(cmd)
     if success:
         return f"Labeled block '{block_id}' with text '{label_text}'."
@@ -275,12 +295,8 @@ async def label_block(block_id: str, label_text: str, height: float = 2.5) -> st
 async def arrange_blocks(blocks_and_ids: list, start_x: float, start_y: float, 
                          direction: str = "right", distance: float = 20.0) -> str:
     try:
-        block_list_lisp = "("
-        for (b_name, b_id) in blocks_and_ids:
-            block_list_lisp += f'("{b_name}" (("ID" . "{b_id}"))) '
-        block_list_lisp += ")"
-        
-        cmd = f'(c:arrange_blocks {block_list_lisp} {start_x} {start_y} "{direction}" {distance})'
+        block_list = [[b_name, {"ID": b_id}] for (b_name, b_id) in blocks_and_ids]
+        cmd = lisp_call("c:arrange_blocks", block_list, start_x, start_y, direction, distance)
         success, message = execute_lisp_command(cmd)
         if success:
             return f"Arranged {len(blocks_and_ids)} blocks starting at ({start_x},{start_y})."
@@ -290,22 +306,27 @@ async def arrange_blocks(blocks_and_ids: list, start_x: float, start_y: float,
         logger.error(f"Error in arrange_blocks: {str(e)}")
         return f"Error: {str(e)}"
 
+@autocad_mcp.tool()
+async def rebuild_block_id_index() -> str:
+    """Re-index the ID attribute of every block in the drawing. ID lookups keep
+    the index current by themselves; this is for drawings edited by hand."""
+    success, message = execute_lisp_command("(c:rebuild-block-id-index)")
+    if success:
+        return "Rebuilt the block ID index."
+    return message
+
 @autocad_mcp.tool()
 async def create_polyline(points: List[Tuple[float, float]], closed: bool = False) -> str:
     if len(points) < 2:
         return "Need at least two points to create a polyline."
-    pts_str = ""
-    for (x, y) in points:
-        pts_str += f" (list {x} {y} 0.0)"
-    cmd = f"(c:create-polyline (list {pts_str}) {'T' if closed else 'nil'})"
+    cmd = lisp_call("c:create-polyline", quoted_points(points), closed)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Polyline created."
 
 @autocad_mcp.tool()
 async def create_rectangle(x1: float, y1: float, x2: float, y2: float,
                            layer: Optional[str] = None) -> str:
-    layer_part = f' "{layer}"' if layer else " nil"
-    cmd = f"(c:create-rectangle {x1} {y1} {x2} {y2}{layer_part})"
+    cmd = lisp_call("c:create-rectangle", x1, y1, x2, y2, layer or None)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Rectangle created."
 
@@ -313,9 +334,8 @@ async def create_rectangle(x1: float, y1: float, x2: float, y2: float,
 async def create_arc(center_x: float, center_y: float, radius: float,
                      start_angle: float, end_angle: float,
                      layer: Optional[str] = None) -> str:
-    layer_part = f' "{layer}"' if layer else " nil"
-    cmd = (f"(c:create-arc {center_x} {center_y} {radius} {start_angle}"
-           f" {end_angle}{layer_part})")
+    cmd = lisp_call("c:create-arc", center_x, center_y, radius, start_angle, end_angle,
+                    layer or None)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Arc created."
 
@@ -324,9 +344,8 @@ async def create_ellipse(center_x: float, center_y: float,
                          major_axis_end_x: float, major_axis_end_y: float,
                          minor_axis_ratio: float,
                          layer: Optional[str] = None) -> str:
-    layer_part = f' "{layer}"' if layer else " nil"
-    cmd = (f"(c:create-ellipse {center_x} {center_y} {major_axis_end_x}"
-           f" {major_axis_end_y} {minor_axis_ratio}{layer_part})")
+    cmd = lisp_call("c:create-ellipse", center_x, center_y, major_axis_end_x,
+                    major_axis_end_y, minor_axis_ratio, layer or None)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Ellipse created."
 
@@ -335,46 +354,39 @@ async def create_mtext(x: float, y: float, width: float, text_string: str,
                        height: float, layer: Optional[str] = None,
                        style: Optional[str] = None,
                        rotation: Optional[float] = 0.0) -> str:
-    text_escaped = text_string.replace('"', '\\"')
-    style_part = f' "{style}"' if style else " nil"
-    layer_part = f' "{layer}"' if layer else " nil"
-    cmd = (f'(c:create-mtext {x} {y} {width} "{text_escaped}" {height}'
-           f'{layer_part}{style_part} {rotation})')
+    cmd = lisp_call("c:create-mtext", x, y, width, text_string, height,
+                    layer or None, style or None, rotation or 0.0)
     success, message = execute_lisp_command(cmd)
     return message if not success else "MText created."
 
 @autocad_mcp.tool()
 async def create_wipeout_from_points(points: List[Tuple[float, float]],
                                      frame_visible: bool = False) -> str:
-    pts_str = ""
-    for (x, y) in points:
-        pts_str += f" (list {x} {y} 0.0)"
-    frame_flag = 'T' if frame_visible else 'nil'
-    cmd = f"(c:create-wipeout-from-points (list {pts_str}) {frame_flag})"
+    cmd = lisp_call("c:create-wipeout-from-points", quoted_points(points), frame_visible)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Wipeout created."
 
 @autocad_mcp.tool()
 async def move_last_entity(delta_x: float, delta_y: float) -> str:
-    cmd = f"(c:move-last-entity {delta_x} {delta_y})"
+    cmd = lisp_call("c:move-last-entity", delta_x, delta_y)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Entity moved."
 
 @autocad_mcp.tool()
 async def rotate_entity_by_id(block_id: str, base_x: float, base_y: float, angle_degrees: float) -> str:
-    cmd = f'(c:rotate_entity_by_id "{block_id}" {base_x} {base_y} {angle_degrees})'
+    cmd = lisp_call("c:rotate_entity_by_id", block_id, base_x, base_y, angle_degrees)
     success, message = execute_lisp_command(cmd)
     return message if not success else f"Rotated entity {block_id} around ({base_x}, {base_y}) by {angle_degrees} degrees."
 
 @autocad_mcp.tool()
 async def create_linear_dimension(x1: float, y1: float, x2: float, y2: float, dim_x: float, dim_y: float) -> str:
-    cmd = f"(c:create-linear-dim {x1} {y1} {x2} {y2} {dim_x} {dim_y})"
+    cmd = lisp_call("c:create-linear-dim", x1, y1, x2, y2, dim_x, dim_y)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Linear dimension created."
 
 @autocad_mcp.tool()
 async def create_hatch(polyline_id: str, hatch_pattern: str = "ANSI31") -> str:
-    cmd = f'(c:hatch_closed_poly_by_id "{polyline_id}" "{hatch_pattern}")'
+    cmd = lisp_call("c:hatch_closed_poly_by_id", polyline_id, hatch_pattern)
     success, message = execute_lisp_command(cmd)
     return message if not success else "Hatch created."
 
@@ -399,7 +411,8 @@ async def set_layer_properties(layer_name: str, color: str, linetype: str = "CON
 
     # We'll pass them as a single command
     # (c:create_or_set_layer layer_name color linetype lineweight plot_style transparency)
-    cmd = f'(c:create_or_set_layer "{layer_name}" "{color_str}" "{linetype_str}" "{lineweight_str}" "{plot_style_str}" {transp_str})'
+    cmd = lisp_call("c:create_or_set_layer", layer_name, color_str, linetype_str,
+                    lineweight_str, plot_style_str, transparency)
     
     success, message = execute_lisp_command(cmd)
     if success:
@@ -413,7 +426,7 @@ async def set_layer_properties(layer_name: str, color: str, linetype: str = "CON
 async def execute_custom_autolisp(code: str) -> str:
     """Execute custom AutoLISP code directly from a string."""
     try:
-        pyperclip.copy(code)
+        get_transport().copy(code)
         success, message = execute_lisp_from_clipboard()
         return message if not success else "Custom AutoLISP code executed successfully."
     except Exception as e:
@@ -421,8 +434,6 @@ async def execute_custom_autolisp(code: str) -> str:
         return f"Error executing custom AutoLISP: {str(e)}"
 
 if __name__ == "__main__":
-    if initialize_autocad_lisp():
-        logger.info("Successfully initialized AutoCAD LT with advanced LISP libraries.")
-    else:
-        logger.warning("Failed to initialize AutoCAD LT with LISP. Will retry on tool calls.")
+    # AutoCAD is initialized on the first tool call that needs it
+    logger.info("AutoCAD LT MCP Server starting; LISP libraries load on first use.")
     autocad_mcp.run(transport='stdio')
@@ -3,17 +3,34 @@
 AutoCAD LT MCP Server - Fast Version
 Optimized for speed with reduced delays and batch operations
 """
+import inspect
+import itertools
 import logging
+import math
 import sys
 import os
+import re
+import tempfile
 import time
-import pyperclip
-from pathlib import Path
-import win32gui
-import keyboard
-from typing import Optional, Dict, Any, List, Tuple
+from collections import deque
+from typing import Optional, Deque, Dict, Any, List, Set, Tuple
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
+
+from result_mailbox import ResultRecord, mailbox_setup_command
+from lisp_serializer import Expr, Symbol, T, lisp_call, quoted_points, set_precision
+from compaction import compact_circles, compact_lines, compact_points, payload_summary
+from lisp_bundle import SERVER_FILES, LispLoader
+from symbol_catalog import DEFAULT_LIBRARY_ROOT, SymbolCatalog
+from routing import Router, elbow_route
+from scene import Scene
+from dxf_writer import DxfWriter
+from script_compiler import MAX_SCRIPT_LINES, compile_script
+from session import AutoCADSession, exclusive
+from instance_pool import InstancePool
+from batching import (PID_LAYERS, PID_TOOL_LAYERS, PROCESS_LAYER, AdaptiveChunker,
+                      BatchTransaction, CommandCoalescer, batch_draw_fields, build_batch_draw_op,
+                      join_forms, stream_batch)
 
 # Set up logging
 logging.basicConfig(
@@ -27,213 +44,1053 @@ logger = logging.getLogger("autocad-lisp-mcp-fast")
 autocad_mcp = FastMCP("autocad-lisp-server")
 
 # Global variables
-acad_window = None
 lisp_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lisp-code")
+# The AutoCAD window, its pacing settings and loaded LISP files, and the lock
+# and job queue every command is sent through (see session.py)
+session = AutoCADSession(LispLoader(lisp_path))
+symbol_catalog = SymbolCatalog()  # Reads the library (or its cached index) on first use
+# Upper-cased names of blocks known to be defined in the drawing; placements of
+# these skip the catalog check and preload_blocks doesn't load them again
+defined_blocks: Set[str] = set()
+# Everything drawn through this server (entities, blocks, tags, layers), so
+# layout questions are answered without asking AutoCAD
+scene = Scene()
+# Routes process lines around the scene's blocks; rebuilt when the scene changes
+router = Router()
+router_version = -1  # scene.version the router was built from
+batch_checkpoint = 0  # scene.checkpoint() at begin_batch/begin_dxf, for abort_batch/abort_dxf
+
+# Lazy LISP loading: startup only loads error_handling.lsp, and each other file
+# is loaded (once per AutoCAD session) the first time a command needs it
+LAZY_LOADING = True
+CORE_LISP_FILES = ["error_handling.lsp"]
+
+# Adaptive pacing (opt-in, see set_performance_mode): delays shrink while
+# commands succeed and back off when a verification probe shows one was dropped
+PROBE_TIMEOUT = 2.0  # Seconds to wait for AutoCAD to answer a probe
+probe_tokens = itertools.count(1)
+
+# Completion detection and result mailbox: once error_handling.lsp (which
+# defines mcp-run) is loaded, each command is sent as (mcp-run <seq> '<form>)
+# and the server waits for AutoCAD's result record instead of sleeping a fixed time
+COMPLETION_SIGNALS = True
+COMPLETION_TIMEOUT = 10.0  # Seconds to wait for a typed command to finish
+BATCH_COMPLETION_TIMEOUT = 120.0  # Seconds to wait for a pasted program to finish
+result_seq = itertools.count(1)  # Shared by every instance, so records never collide
+mailbox_cleared = False
+command_results: Deque[ResultRecord] = deque(maxlen=100)
+confirmed_entities = 0  # Entities AutoCAD reported creating, for per-call totals
+unconfirmed: Dict[Tuple[str, str], int] = {}  # (session name, command text) -> seq of a send that timed out
 
-# Performance configuration
-FAST_MODE = True  # Enable fast mode with minimal delays
-USE_ESC_KEY = False  # Disable ESC to avoid help menu issues
-MINIMAL_DELAY = 0.05  # Minimal delay for fast mode
-NORMAL_DELAY = 0.1  # Reduced normal delay
-FOCUS_DELAY = 0.1  # Reduced window focus delay
-
-def find_autocad_window():
-    """Find the AutoCAD LT window handle by checking window titles."""
-    def enum_windows_callback(hwnd, result):
-        if win32gui.IsWindowVisible(hwnd):
-            window_text = win32gui.GetWindowText(hwnd)
-            win_text = window_text.lower()
-            if "autocad" in win_text and ("drawing" in win_text or ".dwg" in win_text):
-                result.append(hwnd)
+# Command coalescing configuration (opt-in)
+COALESCE_MODE = False  # Merge consecutive tool calls into one clipboard paste
+COALESCE_WINDOW = 0.05  # Seconds to wait for more commands before flushing
+COALESCE_MAX_COMMANDS = 50  # Flush immediately once this many are queued
+
+# Chunked streaming configuration for the batch tools
+CHUNK_TARGET_SECONDS = 1.0  # Size chunks so each paste completes in about this long
+
+# Drawing precision: decimal places coordinates are rounded to before sending
+DRAWING_PRECISION = 6
+UNIT_PRECISION = {  # Sensible decimal places per drawing unit system
+    "millimeters": 2,
+    "centimeters": 3,
+    "meters": 4,
+    "inches": 4,
+    "feet": 5,
+}
+set_precision(DRAWING_PRECISION)
+
+def verify_delivery(target, transport, command_class):
+    """In adaptive mode, probe AutoCAD every few commands of a class.
+    Returns False when the probe shows the command was dropped or garbled."""
+    if not target.pacing.adaptive:
         return True
-    
-    windows = []
-    win32gui.EnumWindows(enum_windows_callback, windows)
-    
-    if windows:
-        return windows[0]
+    pacer = target.pacer
+    if not pacer.should_probe(command_class):
+        pacer.succeeded(command_class)
+        return True
+    latency = transport.probe(target.window, f"mcp-probe-{next(probe_tokens)}", PROBE_TIMEOUT)
+    if latency is None:
+        pacer.failed(command_class)
+        return False
+    pacer.succeeded(command_class, latency)
+    return True
+
+def next_result_seq(target):
+    """Sequence number for the next command's result record, or None when
+    completion detection is off or the LISP side isn't loaded."""
+    if COMPLETION_SIGNALS and target.mailbox_ready:
+        return next(result_seq)
     return None
 
-def execute_lisp_command_fast(command):
-    """Execute a LISP command with minimal delays."""
-    global acad_window
-    
-    if not acad_window:
-        acad_window = find_autocad_window()
-        if not acad_window:
-            return False, "AutoCAD LT window not found"
+def wrap_for_result(seq, command):
+    """(mcp-run seq '<command>): run the command and report its result."""
+    return lisp_call("mcp-run", seq, Expr("'" + command))
+
+def already_completed(target, transport, command):
+    """Result of an earlier send of this exact command that timed out but has
+    since finished successfully, so it need not be sent again."""
+    seq = unconfirmed.pop((target.name, command), None)
+    if seq is None:
+        return None
+    record = transport.wait_for_result(seq, 0)
+    if record is None or not record.ok:
+        return None
+    record_result(record)
+    return record
+
+def record_result(record):
+    global confirmed_entities
+    command_results.append(record)
+    confirmed_entities += record.count
+
+def await_result(target, transport, command_class, seq, timeout, command):
+    """Wait for the result record of seq, feeding the adaptive pacer and the
+    result history. Returns (success, summary)."""
+    started = time.perf_counter()
+    record = transport.wait_for_result(seq, timeout)
+    if record is None:
+        unconfirmed[(target.name, command)] = seq
+        if target.pacing.adaptive:
+            target.pacer.failed(command_class)
+        return False, (f"AutoCAD did not report a result within {timeout}s; "
+                       f"the command may still be running or was dropped.")
+    if target.pacing.adaptive:
+        target.pacer.succeeded(command_class, time.perf_counter() - started)
+    record_result(record)
+    return record.ok, record.summary()
+
+DROPPED_MESSAGE = ("AutoCAD did not confirm the command, so it may have been dropped. "
+                   "Delays were increased; check the drawing before retrying.")
+
+def ensure_initialized(target):
+    """Run the startup initialization the first time a tool needs AutoCAD, so the
+    server answers tool listings and file lookups before AutoCAD is touched."""
+    if not target.initialized:
+        initialize_session(target)
+
+def load_lisp(target, names, refresh=True):
+    """Load lisp-code files into the session's AutoCAD as one bundle (see lisp_bundle.py)."""
+    with target.input_lock:
+        target.transport.focus(target.window)  # The registry is read back through this window
+        return target.loader.ensure_loaded(target.transport, target.window, names,
+                                           lambda path: load_lisp_file(target, path), refresh)
+
+def ensure_lisp_for(target, command):
+    """Lazily load the lisp-code files a command calls into, as one bundle."""
+    if not LAZY_LOADING:
+        return True, ""
+    loader = target.loader
+    if loader.all_loaded():
+        return True, ""  # Nothing left to load, so skip tokenizing the command
+    missing = loader.missing(loader.files_for_command(command))
+    if not missing:
+        return True, ""
+    logger.info(f"Loading LISP on first use into {target.name}: {', '.join(missing)}")
+    return load_lisp(target, missing, refresh=False)
+
+@exclusive
+def type_command(target, command):
+    """Type a LISP command into the session's AutoCAD with minimal delays."""
+    ensure_initialized(target)
+    if not target.find_window():
+        return False, "AutoCAD LT window not found"
     
+    loaded, message = ensure_lisp_for(target, command)
+    if not loaded:
+        return False, f"Could not load the LISP this command needs: {message}"
+    transport = target.transport
+    pacing = target.pacing  # Settings changed mid-command apply from the next one
+    if already_completed(target, transport, command):
+        return True, f"Command already completed: {command}"
+    seq = next_result_seq(target)
     try:
-        win32gui.SetForegroundWindow(acad_window)
-        time.sleep(FOCUS_DELAY if FAST_MODE else 0.2)
-        
-        if USE_ESC_KEY:
-            keyboard.press_and_release('esc')
-            time.sleep(MINIMAL_DELAY if FAST_MODE else 0.3)
-        
-        keyboard.write(command)
-        time.sleep(MINIMAL_DELAY if FAST_MODE else 0.1)
-        keyboard.press_and_release('enter')
-        time.sleep(NORMAL_DELAY if FAST_MODE else 0.2)
-        return True, f"Command executed: {command}"
+        with target.input_lock:
+            transport.focus(target.window)
+            transport.sleep(target.pace("typed", pacing.focus_delay if pacing.fast_mode else 0.2))
+            
+            if pacing.use_esc_key:
+                transport.press('esc')
+                transport.sleep(target.pace("typed", pacing.minimal_delay if pacing.fast_mode else 0.3))
+            
+            transport.write(command if seq is None else wrap_for_result(seq, command))
+            transport.sleep(target.pace("typed", pacing.minimal_delay if pacing.fast_mode else 0.1))
+            transport.press('enter')
+            if seq is None:
+                transport.sleep(target.settle("typed", pacing.normal_delay if pacing.fast_mode else 0.2))
+                if not verify_delivery(target, transport, "typed"):
+                    return False, DROPPED_MESSAGE
+                return True, f"Command executed: {command}"
+        # Other instances can be typed into while this one finishes
+        success, summary = await_result(target, transport, "typed", seq, COMPLETION_TIMEOUT, command)
+        return success, (f"Command executed: {command}. {summary}" if success else summary)
     except Exception as e:
         logger.error(f"Error executing LISP command: {str(e)}")
         return False, f"Error executing LISP command: {str(e)}"
 
-def load_lisp_file_with_delay(file_path):
+def execute_lisp_command_fast(command):
+    """Execute a LISP command with minimal delays."""
+    return type_command(session, command)
+
+@exclusive
+def load_lisp_file(target, file_path):
     """Load a LISP file with proper delay for security prompts."""
-    global acad_window
-    
-    if not acad_window:
-        acad_window = find_autocad_window()
-        if not acad_window:
-            return False, "AutoCAD LT window not found"
+    if not target.find_window():
+        return False, "AutoCAD LT window not found"
     
+    transport = target.transport
     try:
-        win32gui.SetForegroundWindow(acad_window)
-        time.sleep(0.5)
-        
-        if USE_ESC_KEY:
-            keyboard.press_and_release('esc')
-            time.sleep(0.5)
-        
-        keyboard.write("(load \"{}\")".format(file_path.replace('\\', '/')))
-        time.sleep(0.5)
-        keyboard.press_and_release('enter')
-        
-        # Keep the 3-second delay for security prompt acceptance
-        time.sleep(3.0)
+        with target.input_lock:
+            transport.focus(target.window)
+            transport.sleep(0.5)
+            
+            if target.pacing.use_esc_key:
+                transport.press('esc')
+                transport.sleep(0.5)
+            
+            transport.write("(load \"{}\")".format(file_path.replace('\\', '/')))
+            transport.sleep(0.5)
+            transport.press('enter')
+            
+            # Keep the 3-second delay for security prompt acceptance
+            transport.sleep(3.0)
         
         return True, f"LISP file '{os.path.basename(file_path)}' loaded successfully"
     except Exception as e:
         logger.error(f"Error loading LISP file: {str(e)}")
         return False, f"Error loading LISP file: {str(e)}"
 
-def execute_batch_from_clipboard(lisp_code):
-    """Execute multiple LISP commands via clipboard for speed."""
-    global acad_window
-    
-    if not acad_window:
-        acad_window = find_autocad_window()
-        if not acad_window:
-            return False, "AutoCAD LT window not found"
+@exclusive
+def paste_program(target, lisp_code):
+    """Execute multiple LISP commands in the session's AutoCAD via clipboard for speed."""
+    ensure_initialized(target)
+    if not target.find_window():
+        return False, "AutoCAD LT window not found"
     
+    transport = target.transport
+    pacing = target.pacing
     try:
         # Ensure LISP code is properly formatted for execution
         # Wrap in progn if not already wrapped
         if not lisp_code.strip().startswith("(progn"):
             lisp_code = f"(progn {lisp_code})"
+        loaded, message = ensure_lisp_for(target, lisp_code)
+        if not loaded:
+            return False, f"Could not load the LISP this batch needs: {message}"
+        if already_completed(target, transport, lisp_code):
+            return True, "Batch already completed"
+        seq = next_result_seq(target)
         
-        # Copy LISP code to clipboard
-        pyperclip.copy(lisp_code)
-        
-        win32gui.SetForegroundWindow(acad_window)
-        time.sleep(FOCUS_DELAY)
-        
-        if USE_ESC_KEY:
-            keyboard.press_and_release('esc')
-            time.sleep(MINIMAL_DELAY)
-        
-        # Type the command directly instead of using (eval (read))
-        # This ensures we're in command mode, not text mode
-        keyboard.write("(vl-load-com)")  # Initialize Visual LISP
-        time.sleep(MINIMAL_DELAY)
-        keyboard.press_and_release('enter')
-        time.sleep(MINIMAL_DELAY)
-        
-        # Now paste and execute the LISP code
-        keyboard.press_and_release('ctrl+v')
-        time.sleep(MINIMAL_DELAY)
-        keyboard.press_and_release('enter')
-        time.sleep(NORMAL_DELAY * 2)  # Give more time for complex scripts
-        
-        return True, "Batch commands executed successfully"
+        with target.input_lock:
+            # Copy LISP code to clipboard
+            transport.copy(lisp_code if seq is None else wrap_for_result(seq, lisp_code))
+            
+            transport.focus(target.window)
+            transport.sleep(target.pace("paste", pacing.focus_delay))
+            
+            if pacing.use_esc_key:
+                transport.press('esc')
+                transport.sleep(target.pace("paste", pacing.minimal_delay))
+            
+            # Type the command directly instead of using (eval (read))
+            # This ensures we're in command mode, not text mode
+            transport.write("(vl-load-com)")  # Initialize Visual LISP
+            transport.sleep(target.pace("paste", pacing.minimal_delay))
+            transport.press('enter')
+            transport.sleep(target.pace("paste", pacing.minimal_delay))
+            
+            # Now paste and execute the LISP code
+            transport.press('ctrl+v')
+            transport.sleep(target.pace("paste", pacing.minimal_delay))
+            transport.press('enter')
+            if seq is None:
+                transport.sleep(target.settle("paste", pacing.normal_delay * 2))  # Give more time for complex scripts
+                if not verify_delivery(target, transport, "paste"):
+                    return False, DROPPED_MESSAGE
+                return True, "Batch commands executed successfully"
+        success, summary = await_result(target, transport, "paste", seq, BATCH_COMPLETION_TIMEOUT,
+                                        lisp_code)
+        return success, (f"Batch commands executed successfully. {summary}"
+                         if success else summary)
     except Exception as e:
         logger.error(f"Error executing batch: {str(e)}")
         return False, f"Error executing batch: {str(e)}"
 
+def execute_batch_from_clipboard(lisp_code):
+    """Execute multiple LISP commands via clipboard for speed."""
+    return paste_program(session, lisp_code)
+
+@exclusive
+def paste_forms(target, forms):
+    """Paste independent LISP forms as one program. Each form runs in its own
+    (mcp-run seq ...), so a failing form doesn't stop the ones after it and
+    each reports its own result. Returns one (success, message) per form."""
+    ensure_initialized(target)
+    seqs = [next_result_seq(target) for _ in forms]
+    if None in seqs:
+        # No result mailbox: all forms share the program's result
+        return [paste_program(target, join_forms(forms))] * len(forms)
+    success, message = paste_program(
+        target, join_forms([wrap_for_result(seq, form) for seq, form in zip(seqs, forms)]))
+    if not success:
+        return [(False, message)] * len(forms)
+    results = []
+    for seq, form in zip(seqs, forms):
+        # The program's own record has the totals; these are already written
+        record = target.transport.wait_for_result(seq, 0)
+        if record is None:
+            results.append((False, f"AutoCAD did not report a result for: {form}"))
+        elif record.ok:
+            results.append((True, f"Command executed: {form}. {record.summary()}"))
+        else:
+            results.append((False, record.summary()))
+    return results
+
+@exclusive
+def run_script(target, paths, forms):
+    """Run compiled scripts (see script_compiler.py) with one typed SCRIPT command.
+    With completion signals on, waits for the last script to report."""
+    ensure_initialized(target)
+    if not target.find_window():
+        return False, "AutoCAD LT window not found"
+    
+    loaded, message = ensure_lisp_for(target, " ".join(forms))
+    if not loaded:
+        return False, f"Could not load the LISP this script needs: {message}"
+    transport = target.transport
+    pacing = target.pacing
+    seq = next_result_seq(target)
+    command = lisp_call("mcp-run-script", seq, paths[0])
+    try:
+        with target.input_lock:
+            transport.focus(target.window)
+            transport.sleep(target.pace("paste", pacing.focus_delay))
+            transport.write(command)
+            transport.sleep(target.pace("paste", pacing.minimal_delay))
+            transport.press('enter')
+            if seq is None:
+                transport.sleep(target.settle("paste", pacing.normal_delay * 2))
+                if not verify_delivery(target, transport, "paste"):
+                    return False, DROPPED_MESSAGE
+                return True, "Script started"
+        return await_result(target, transport, "paste", seq, BATCH_COMPLETION_TIMEOUT, command)
+    except Exception as e:
+        logger.error(f"Error starting script: {str(e)}")
+        return False, f"Error starting script: {str(e)}"
+
+def execute_script(paths, forms):
+    """Run compiled scripts with one typed SCRIPT command."""
+    return run_script(session, paths, forms)
+
+# Everything that drives AutoCAD's UI runs as a job on the session's single
+# worker thread, in submission order, so the event loop keeps answering other
+# tools while a command or batch is being sent
+
+def send_program(lisp_code):
+    """Queue a program for the clipboard path; returns a future for its result."""
+    return session.submit(execute_batch_from_clipboard, lisp_code)
+
+def send_forms(forms):
+    """Queue independent forms as one paste; returns a future for their results."""
+    return session.submit(paste_forms, session, forms)
+
+coalescer = CommandCoalescer(send_forms,
+                             COALESCE_WINDOW, COALESCE_MAX_COMMANDS)
+
+# Explicit transaction opened by begin_batch; None when no batch is open
+active_batch: Optional[BatchTransaction] = None
+# DXF file opened by begin_dxf; drawing tools write to it until commit_dxf
+dxf_output: Optional[DxfWriter] = None
+DXF_DIR = os.path.join(tempfile.gettempdir(), "autocad-mcp-dxf")
+SHEET_DIR = os.path.join(tempfile.gettempdir(), "autocad-mcp-sheets")  # generate_sheets output
+
+def write_dxf_ops(ops):
+    """Write a tool's batch_draw operations to the open DXF file.
+    ops is None for tools that have no DXF equivalent."""
+    if ops is None:
+        return False, "Error: this tool can't write to a DXF file. Call it after commit_dxf."
+    deferred = sum(not dxf_output.write_op(op) for op in ops)
+    message = f"Written to {os.path.basename(dxf_output.path)} ({dxf_output.count} entities so far)"
+    if deferred:
+        message += f", {deferred} operations will be sent by commit_dxf"
+    return True, message
+
+async def run_lisp_command(command, op=None):
+    """Execute a tool's LISP command, coalescing it with neighbouring calls when enabled.
+    Inside begin_batch/commit_batch the command is only recorded; inside
+    begin_dxf/commit_dxf the tool's batch_draw operation op is written instead."""
+    if dxf_output is not None:
+        return write_dxf_ops(None if op is None else [op])
+    if active_batch is not None:
+        position = active_batch.record(command)
+        return True, f"Recorded as command {position} of the open batch"
+    if COALESCE_MODE:
+        return await coalescer.submit(command)
+    return await session.run(execute_lisp_command_fast, command)
+
+async def run_lisp_program(lisp_code, ops=None):
+    """Execute a large LISP program via the clipboard, or record it into the open batch.
+    Inside begin_dxf/commit_dxf the equivalent batch_draw operations are written instead."""
+    if dxf_output is not None:
+        return write_dxf_ops(ops)
+    if active_batch is not None:
+        position = active_batch.record(lisp_code)
+        return True, f"Recorded as command {position} of the open batch"
+    return await send_program(lisp_code)
+
+# One adaptive chunker per batch tool, so each learns its own per-item cost
+chunkers: Dict[str, AdaptiveChunker] = {}
+
+async def stream_lisp_batch(kind, items, build_command, ctx=None, to_op=None):
+    """Send batch items to AutoCAD in adaptively sized chunks, reporting progress.
+    Inside begin_batch/commit_batch the whole batch is recorded as one command;
+    inside begin_dxf/commit_dxf each item is written as the operation to_op makes of it.
+    Returns (success, items sent, message); on failure the first items sent
+    have been drawn and the rest have not."""
+    if dxf_output is not None:
+        success, message = write_dxf_ops(None if to_op is None else [to_op(item) for item in items])
+        return success, len(items) if success else 0, message
+    if active_batch is not None:
+        success, message = await run_lisp_program(build_command(items))
+        return success, len(items) if success else 0, message
+    chunker = chunkers.setdefault(kind, AdaptiveChunker(target_seconds=CHUNK_TARGET_SECONDS))
+    
+    async def report(done, total):
+        if ctx is not None:
+            try:
+                await ctx.report_progress(done, total)
+            except ValueError:
+                pass  # Not running inside an MCP request
+    
+    confirmed_before = confirmed_entities
+    results_before = len(command_results)
+    success, sent, message = await stream_batch(items, build_command, send_program, chunker,
+                                                report)
+    if len(command_results) != results_before:
+        message += f", AutoCAD confirmed {confirmed_entities - confirmed_before} entities"
+    return success, sent, message
+
+def batch_entity_props(layer, color):
+    """Optional [layer [color]] tail for c:batch-create-* specifications."""
+    if layer is None and color is None:
+        return []
+    if color is None:
+        return [layer]
+    return [layer, int(color)]
+
 # Batch operation tools
 @autocad_mcp.tool()
-async def batch_create_lines(lines: List[List[float]]) -> str:
+async def batch_create_lines(lines: List[List[float]], layer: Optional[str] = None,
+                             color: Optional[int] = None, ctx: Optional[Context] = None) -> str:
     """Create multiple lines in a single operation.
-    lines: List of [x1, y1, x2, y2] coordinates"""
-    lines_data = "("
-    for line in lines:
-        if len(line) == 4:
-            lines_data += f"({line[0]} {line[1]} {line[2]} {line[3]}) "
-    lines_data += ")"
+    lines: List of [x1, y1, x2, y2] coordinates
+    layer, color: Optional layer name and ACI color (1-255) for every line
+    Large inputs are streamed to AutoCAD in chunks with progress reporting."""
+    props = batch_entity_props(layer, color)
+    valid = [line for line in lines if len(line) == 4]
+    compacted, dropped = compact_lines(valid)
+    
+    # Sizes of the commands as built for sending, for the payload report
+    sizes = []
+    def build(chunk):
+        command = lisp_call("c:batch-create-lines", [[*line, *props] for line in chunk])
+        sizes.append(len(command))
+        return command
     
-    cmd = f"(c:batch-create-lines '{lines_data})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Created {len(lines)} lines"
+    def to_op(line):
+        x1, y1, x2, y2 = line
+        return {"type": "line", "x1": x1, "y1": y1, "x2": x2, "y2": y2,
+                "layer": layer, "color": color}
+    
+    success, sent, message = await stream_lisp_batch("lines", compacted, build, ctx, to_op)
+    for x1, y1, x2, y2 in compacted[:sent]:
+        scene.add_line(x1, y1, x2, y2, layer)
+    if not success:
+        return message
+    summary = payload_summary(sum(sizes), dropped, 'lines')
+    return f"Created {len(compacted)} lines. {message}." + (f" {summary}" if summary else "")
 
 @autocad_mcp.tool()
-async def batch_create_circles(circles: List[List[float]]) -> str:
+async def batch_create_circles(circles: List[List[float]], layer: Optional[str] = None,
+                               color: Optional[int] = None, ctx: Optional[Context] = None) -> str:
     """Create multiple circles in a single operation.
-    circles: List of [center_x, center_y, radius]"""
-    circles_data = "("
-    for circle in circles:
-        if len(circle) == 3:
-            circles_data += f"({circle[0]} {circle[1]} {circle[2]}) "
-    circles_data += ")"
+    circles: List of [center_x, center_y, radius]
+    layer, color: Optional layer name and ACI color (1-255) for every circle
+    Large inputs are streamed to AutoCAD in chunks with progress reporting."""
+    props = batch_entity_props(layer, color)
+    valid = [circle for circle in circles if len(circle) == 3]
+    compacted, dropped = compact_circles(valid)
+    
+    # Sizes of the commands as built for sending, for the payload report
+    sizes = []
+    def build(chunk):
+        command = lisp_call("c:batch-create-circles", [[*circle, *props] for circle in chunk])
+        sizes.append(len(command))
+        return command
+    
+    def to_op(circle):
+        cx, cy, radius = circle
+        return {"type": "circle", "center_x": cx, "center_y": cy, "radius": radius,
+                "layer": layer, "color": color}
     
-    cmd = f"(c:batch-create-circles '{circles_data})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Created {len(circles)} circles"
+    success, sent, message = await stream_lisp_batch("circles", compacted, build, ctx, to_op)
+    for cx, cy, radius in compacted[:sent]:
+        scene.add_circle(cx, cy, radius, layer)
+    if not success:
+        return message
+    summary = payload_summary(sum(sizes), dropped, 'circles')
+    return f"Created {len(compacted)} circles. {message}." + (f" {summary}" if summary else "")
 
 @autocad_mcp.tool()
-async def batch_create_texts(texts: List[Dict[str, Any]]) -> str:
+async def batch_create_texts(texts: List[Dict[str, Any]], ctx: Optional[Context] = None) -> str:
     """Create multiple text entities in a single operation.
-    texts: List of dicts with keys: x, y, height, string, rotation (optional)"""
-    texts_data = "("
-    for text in texts:
-        # Escape quotes in the string
-        escaped_string = text["string"].replace('"', '\\"')
-        texts_data += f'({text["x"]} {text["y"]} {text["height"]} "{escaped_string}") '
-    texts_data += ")"
-    
-    cmd = f"(c:batch-create-texts '{texts_data})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Created {len(texts)} text entities"
+    texts: List of dicts with keys: x, y, height, string,
+           rotation (optional, degrees), layer (optional), color (optional ACI 1-255)
+    Large inputs are streamed to AutoCAD in chunks with progress reporting."""
+    def text_spec(text):
+        return [text["x"], text["y"], text["height"], text["string"], text.get("rotation", 0.0),
+                *batch_entity_props(text.get("layer"), text.get("color"))]
+    
+    def build(chunk):
+        return lisp_call("c:batch-create-texts", [text_spec(t) for t in chunk])
+    
+    def to_op(text):
+        return {"type": "text", "x": text["x"], "y": text["y"], "text_string": text["string"],
+                "height": text["height"], "rotation": text.get("rotation", 0.0),
+                "justify": "left", "layer": text.get("layer"), "color": text.get("color")}
+    
+    success, sent, message = await stream_lisp_batch("texts", texts, build, ctx, to_op)
+    for text in texts[:sent]:
+        scene.add_text(text["x"], text["y"], text["string"], text["height"], layer=text.get("layer"))
+    if not success:
+        return message
+    return f"Created {len(texts)} text entities. {message}"
+
+@autocad_mcp.tool()
+async def benchmark_batch_creation(count: int = 1000) -> str:
+    """Compare entity creation rates of the entmake and command-based batch paths.
+    
+    Draws count lines and count circles with each path on a scratch layer,
+    then erases them. AutoCAD prints entities per second for both paths."""
+    cmd = lisp_call("c:benchmark-batch-create", int(count))
+    success, message = await run_lisp_command(cmd)
+    return message if not success else (f"Benchmark of {2 * int(count)} entities per path started. "
+                                        f"Rates are printed on the AutoCAD command line.")
+
+def build_batch_draw(operations):
+    """c:batch-draw entries for operations, checking pid_symbol names against the
+    catalog. Returns (entries, accepted operations, per-operation statuses)."""
+    entries = []
+    accepted = []
+    statuses = []
+    for index, op in enumerate(operations, start=1):
+        op_type = op.get("type", "?") if isinstance(op, dict) else "?"
+        try:
+            if not isinstance(op, dict):
+                raise ValueError("operation must be an object")
+            if (op_type == "pid_symbol" and "category" in op and "symbol_name" in op
+                    and str(op["symbol_name"]).upper() not in defined_blocks):
+                valid, message = symbol_catalog.validate(str(op["category"]), str(op["symbol_name"]))
+                if not valid:
+                    raise ValueError(message)
+                category, symbol_name = message.split("/", 1)
+                op = {**op, "category": category, "symbol_name": symbol_name}
+            entries.append(build_batch_draw_op(op))
+            accepted.append(op)
+            statuses.append(f"#{index} {op_type}: sent")
+        except ValueError as e:
+            statuses.append(f"#{index} {op_type}: rejected ({e})")
+    return entries, accepted, statuses
+
+@autocad_mcp.tool()
+async def batch_draw(operations: List[Dict[str, Any]]) -> str:
+    """Draw a heterogeneous list of entities in a single LISP call.
+    
+    operations: List of dicts, each with a "type" key plus that type's fields:
+        line: x1, y1, x2, y2
+        circle: center_x, center_y, radius
+        text: x, y, text_string, height=2.5, rotation=0
+        polyline: points ([[x, y], ...]), closed=False
+        rectangle: x1, y1, x2, y2, layer=None
+        arc: center_x, center_y, radius, start_angle, end_angle, layer=None
+        ellipse: center_x, center_y, major_axis_end_x, major_axis_end_y, minor_axis_ratio, layer=None
+        mtext: x, y, width, text_string, height=2.5, layer=None, style=None, rotation=0
+        block: block_name, x, y, block_id="", scale=1, rotation=0
+        layer: layer_name, color="white", linetype="CONTINUOUS" (switches the current layer)
+        pid_layers: (no fields)
+        pid_symbol: category, symbol_name, x, y, scale=1, rotation=0 (checked against the symbol catalog)
+        process_line / connect_equipment: x1, y1, x2, y2
+        flow_arrow: x, y, rotation=0
+        equipment_tag: x, y, tag, description=""
+        line_number: x, y, line_num, spec
+        valve: x, y, valve_type="GATE", rotation=0
+        instrument: x, y, instrument_type, rotation=0
+        pump: x, y, pump_type="CENTRIFUGAL", rotation=0
+        tank: x, y, tank_type="VERTICAL", scale=1
+    
+    Invalid operations are reported and skipped; runtime failures of individual
+    operations are reported on the AutoCAD command line without stopping the batch."""
+    entries, accepted, statuses = build_batch_draw(operations)
+    if not entries:
+        return "No valid operations to draw.\n" + "\n".join(statuses)
+    
+    cmd = "(c:batch-draw '(" + " ".join(entries) + "))"
+    success, message = await run_lisp_program(cmd, accepted)
+    if not success:
+        return message
+    if active_batch is None and dxf_output is None:
+        defined_blocks.update(str(op["symbol_name"]).upper() for op in operations
+                              if isinstance(op, dict) and op.get("type") == "pid_symbol"
+                              and "symbol_name" in op)
+    for op in accepted:
+        record_batch_draw_op(op)
+    rejected = len(operations) - len(entries)
+    return (f"Sent {len(entries)} operations in one call ({rejected} rejected):\n"
+            + "\n".join(statuses))
 
 # Note: execute_lisp_script removed - use batch operations or execute_custom_autolisp instead
 
 @autocad_mcp.tool()
 async def set_performance_mode(fast_mode: bool, minimal_delay: float = 0.05, 
-                              normal_delay: float = 0.1) -> str:
-    """Configure performance settings."""
-    global FAST_MODE, MINIMAL_DELAY, NORMAL_DELAY
-    FAST_MODE = fast_mode
-    MINIMAL_DELAY = minimal_delay
-    NORMAL_DELAY = normal_delay
+                              normal_delay: float = 0.1, adaptive: bool = False,
+                              probe_every: int = 10) -> str:
+    """Configure performance settings.
+    adaptive: Scale the delays to AutoCAD's measured responsiveness, shrinking
+              them while commands succeed and backing off when a verification
+              probe (sent every probe_every commands) shows one was dropped."""
+    for target in all_sessions():
+        target.configure(fast_mode=fast_mode, minimal_delay=minimal_delay,
+                         normal_delay=normal_delay, adaptive=adaptive, probe_every=probe_every)
     mode = "fast" if fast_mode else "normal"
-    return f"Performance mode set to {mode} with delays: minimal={minimal_delay}s, normal={normal_delay}s"
+    pacing = (f", adaptive pacing probing every {session.pacer.probe_every} commands"
+              if adaptive else "")
+    return (f"Performance mode set to {mode} with delays: minimal={minimal_delay}s, "
+            f"normal={normal_delay}s{pacing}")
+
+@autocad_mcp.tool()
+async def get_pacing_status() -> str:
+    """Show the adaptive pacing state per command class: delay scale,
+    measured latency and probe results."""
+    if not session.pacing.adaptive:
+        return "Adaptive pacing is off. Enable it with set_performance_mode(adaptive=True)."
+    stats = session.pacer.stats()
+    if not stats:
+        return "Adaptive pacing is on; no commands sent yet."
+    lines = ["Adaptive pacing:"]
+    for name, state in stats.items():
+        latency = f"{state['latency'] * 1000:.0f}ms" if state["latency"] is not None else "not measured"
+        lines.append(f"  {name}: delay scale {state['scale']:.2f}, latency {latency}, "
+                     f"{state['successes']} ok, {state['failures']} dropped")
+    return "\n".join(lines)
+
+@autocad_mcp.tool()
+async def set_drawing_precision(decimals: Optional[int] = None, units: Optional[str] = None,
+                                full_precision: bool = False) -> str:
+    """Set how many decimal places coordinates are rounded to before sending.
+    
+    decimals: Decimal places (0-15)
+    units: Pick a default for a unit system instead: millimeters, centimeters,
+           meters, inches or feet
+    full_precision: Send floats unrounded
+    Fewer digits mean shorter commands and faster pasting."""
+    global DRAWING_PRECISION
+    if full_precision:
+        new_precision = None
+    elif decimals is not None:
+        new_precision = decimals
+    elif units is not None:
+        if units.lower() not in UNIT_PRECISION:
+            return f"Error: unknown units '{units}'. Choose from: {', '.join(UNIT_PRECISION)}"
+        new_precision = UNIT_PRECISION[units.lower()]
+    else:
+        new_precision = DRAWING_PRECISION
+    try:
+        set_precision(new_precision)
+    except ValueError as e:
+        return f"Error: {e}"
+    DRAWING_PRECISION = new_precision
+    if DRAWING_PRECISION is None:
+        return "Coordinates are sent at full precision"
+    return f"Coordinates are rounded to {DRAWING_PRECISION} decimal places"
+
+@autocad_mcp.tool()
+async def set_completion_signals(enabled: bool, timeout: float = 10.0,
+                                 batch_timeout: float = 120.0) -> str:
+    """Wait for AutoCAD to signal that each command finished instead of sleeping
+    a fixed time. Short commands return as soon as they are done, and long
+    batches are waited for up to batch_timeout seconds."""
+    global COMPLETION_SIGNALS, COMPLETION_TIMEOUT, BATCH_COMPLETION_TIMEOUT
+    COMPLETION_SIGNALS = enabled
+    COMPLETION_TIMEOUT = timeout
+    BATCH_COMPLETION_TIMEOUT = batch_timeout
+    if not enabled:
+        return "Completion signals disabled; fixed delays are used after each command"
+    status = f"Completion signals enabled (timeout {timeout}s, batches {batch_timeout}s)"
+    if not session.mailbox_ready:
+        status += ". They take effect once the LISP libraries are loaded by initialization."
+    return status
+
+@autocad_mcp.tool()
+async def get_command_results(limit: int = 10) -> str:
+    """Show what AutoCAD reported back for the most recent commands:
+    sequence number, status, entities created (with handles) and errors."""
+    if not command_results:
+        if not session.mailbox_ready:
+            return "No results yet; AutoCAD reports results once the LISP libraries are loaded."
+        return "No results yet."
+    lines = []
+    for record in list(command_results)[-max(1, limit):]:
+        lines.append(f"#{record.seq} {record.status}: {record.summary()}")
+    return "\n".join(lines)
+
+@autocad_mcp.tool()
+async def get_dispatch_status() -> str:
+    """Show the AutoCAD command queue: the job running now, how many are
+    waiting, and how long jobs have waited. Tools that don't send anything to
+    AutoCAD are answered straight away, even while the queue is busy."""
+    stats = session.dispatcher.stats()
+    current = stats["current"] or "idle"
+    return (f"AutoCAD worker: {current}, {stats['pending']} waiting; {stats['completed']} jobs "
+            f"done in {stats['busy_seconds']:.2f}s, longest wait {stats['max_wait'] * 1000:.0f}ms")
+
+def new_instance_session(window, name):
+    """Session for another AutoCAD window: its own LISP registry, lock and
+    queue, with the main session's pacing settings."""
+    target = AutoCADSession(LispLoader(lisp_path), name, window)
+    target.pacing = session.pacing
+    return target
+
+# Every AutoCAD drawing window on the desktop, for generate_sheets; the main
+# session is the pool's instance for its own window
+instance_pool = InstancePool(session, new_instance_session)
+
+def all_sessions():
+    return [session] + [instance.session for instance in instance_pool.instances.values()
+                        if instance.session is not session]
+
+@autocad_mcp.tool()
+async def list_autocad_instances(retry_failed: bool = False) -> str:
+    """Find every open AutoCAD drawing window and show the instances
+    generate_sheets spreads sheets over: status, sheets drawn and queued work.
+    retry_failed: Put instances taken out of rotation for failing back in."""
+    instance_pool.refresh(session.transport, retry_failed)
+    if not instance_pool.instances:
+        return "No AutoCAD LT windows found"
+    lines = []
+    for stats in instance_pool.stats():
+        line = (f"{stats['name']}: {stats['title']} - {stats['status']}, {stats['completed']} sheets "
+                f"drawn, {stats['failed']} failed, {stats['queue']['pending']} jobs waiting")
+        if stats["status"] == "failed":
+            line += f" (last error: {stats['last_error']})"
+        lines.append(line)
+    return "\n".join(lines)
+
+def sheet_job(path, entries):
+    """A generate_sheets job drawing entries into a new drawing saved as path
+    (see c:mcp-sheet). If AutoCAD doesn't answer in time, the attempt is
+    cancelled before the pool retries the sheet on another instance, so the
+    late instance erases the sheet instead of saving it too."""
+    async def job(target):
+        cancel_path = f"{path}.{target.name}.cancel"
+        if os.path.exists(cancel_path):
+            os.remove(cancel_path)
+        program = join_forms([lisp_call("c:mcp-sheet", path.replace("\\", "/"),
+                                        cancel_path.replace("\\", "/"),
+                                        Expr("'(" + " ".join(entries) + ")"))])
+        success, message = await target.run(paste_program, target, program)
+        if not success and unconfirmed.pop((target.name, program), None) is not None:
+            with open(cancel_path, "w"):
+                pass
+            raise TimeoutError(message)
+        return success, message
+    return job
+
+@autocad_mcp.tool()
+async def generate_sheets(sheets: List[Dict[str, Any]], retries: int = 1,
+                          output_dir: Optional[str] = None) -> str:
+    """Draw many sheets at once, spread over every open AutoCAD drawing window.
+    
+    sheets: List of {"name": "PID-001", "operations": [...]}, where operations
+            are batch_draw operations
+    retries: How many other instances a failed sheet is retried on
+    output_dir: Folder the sheets are saved to as <name>.dwg (default: a
+                folder in the temp directory)
+    
+    Each sheet goes to the instance with the least work queued, and each
+    instance draws one sheet at a time while the others draw theirs. A sheet
+    is drawn in the instance's open drawing, then moved out into its own new
+    DWG, so the open drawing is left as it was. An instance that doesn't
+    answer, or whose sheets fail twice in a row, is taken out of rotation
+    (see list_autocad_instances). Sheets are not added to the scene model."""
+    if active_batch is not None:
+        return "A batch is open. Call commit_batch or abort_batch first."
+    if dxf_output is not None:
+        return "A DXF file is open. Call commit_dxf or abort_dxf first."
+    output_dir = os.path.abspath(output_dir or SHEET_DIR)
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except OSError as e:
+        return f"Error: could not create {output_dir}: {e}"
+    jobs = []
+    rejected = []
+    for index, sheet in enumerate(sheets, start=1):
+        name = str(sheet.get("name") or f"sheet-{index}")
+        entries, _, statuses = build_batch_draw(sheet.get("operations", []))
+        if not entries:
+            rejected.append(f"{name}: no valid operations")
+            continue
+        rejected += [f"{name} {status}" for status in statuses if ": rejected" in status]
+        path = os.path.join(output_dir, re.sub(r'[<>:"/\\|?*]', "_", name) + ".dwg")
+        jobs.append((name, len(entries), sheet_job(path, entries)))
+    if not jobs:
+        return "No sheets to draw.\n" + "\n".join(rejected)
+    
+    instances = instance_pool.refresh(session.transport)
+    if not instances:
+        return "Error: no AutoCAD LT window is available for drawing sheets"
+    started = time.perf_counter()
+    results = await instance_pool.run(jobs, retries=max(0, retries))
+    elapsed = time.perf_counter() - started
+    drawn = sum(result.success for result in results)
+    lines = [f"Drew {drawn} of {len(jobs)} sheets on {len(instances)} AutoCAD instances in "
+             f"{elapsed:.1f}s ({drawn / max(elapsed, 1e-6) * 3600:.0f} sheets/hour), "
+             f"saved to {output_dir}"]
+    for result in results:
+        status = "ok" if result.success else f"FAILED: {result.message}"
+        lines.append(f"  {result.name}: {result.instance}, {result.attempts} attempt(s), "
+                     f"{result.seconds:.1f}s - {status}")
+    if rejected:
+        lines.append("Skipped operations:")
+        lines += [f"  {entry}" for entry in rejected]
+    return "\n".join(lines)
+
+def tool_lisp_functions(tool_fn):
+    """c: functions a tool's command templates call, read from its source."""
+    return sorted(set(re.findall(r"(?<![\w\-])(c:[\w\-]+)", inspect.getsource(tool_fn))))
+
+@autocad_mcp.tool()
+async def get_lisp_modules(tool_name: Optional[str] = None) -> str:
+    """Show which lisp-code files are loaded in AutoCAD, or for one tool, which
+    c: functions it calls and which files (with dependencies) those need."""
+    if tool_name is None:
+        loaded = sorted(entry.split("@")[0] for entry in session.loader.loaded)
+        mode = "lazy" if LAZY_LOADING else "eager"
+        return (f"LISP loading is {mode}. Loaded: {', '.join(loaded) or 'nothing yet'}")
+    if tool_name not in {tool.name for tool in await autocad_mcp.list_tools()}:
+        return f"Error: unknown tool '{tool_name}'"
+    functions = tool_lisp_functions(globals()[tool_name])
+    if not functions:
+        return f"{tool_name} does not call any lisp-code functions directly"
+    lines = [f"{tool_name} calls {', '.join(functions)}"]
+    for name in session.loader.files_for_functions(functions):
+        state = "loaded" if session.loader.is_loaded(name) else "not loaded"
+        lines.append(f"  {name} ({state})")
+    return "\n".join(lines)
+
+@autocad_mcp.tool()
+async def set_coalescing_mode(enabled: bool, window_ms: float = 50.0,
+                              max_commands: int = 50) -> str:
+    """Merge consecutive drawing commands into a single clipboard paste.
+    
+    When enabled, commands are queued for up to window_ms milliseconds (or until
+    max_commands are waiting) and then sent to AutoCAD as one (progn ...).
+    Each tool call still returns its own result."""
+    global COALESCE_MODE, COALESCE_WINDOW, COALESCE_MAX_COMMANDS
+    if not enabled:
+        coalescer.flush()
+    COALESCE_MODE = enabled
+    COALESCE_WINDOW = window_ms / 1000.0
+    COALESCE_MAX_COMMANDS = max(1, max_commands)
+    coalescer.window = COALESCE_WINDOW
+    coalescer.max_commands = COALESCE_MAX_COMMANDS
+    if not enabled:
+        return "Command coalescing disabled"
+    return f"Command coalescing enabled: window={window_ms}ms, max_commands={COALESCE_MAX_COMMANDS}"
+
+@autocad_mcp.tool()
+async def begin_batch() -> str:
+    """Start recording drawing commands instead of sending them to AutoCAD.
+    
+    Every drawing tool called before commit_batch only records its LISP command.
+    commit_batch then runs them all in a single paste; abort_batch discards them."""
+    global active_batch, batch_checkpoint
+    if active_batch is not None:
+        return f"A batch is already open with {len(active_batch)} recorded commands"
+    if dxf_output is not None:
+        return "A DXF file is open. Call commit_dxf or abort_dxf first."
+    coalescer.flush()
+    active_batch = BatchTransaction()
+    batch_checkpoint = scene.checkpoint()
+    return "Batch started. Drawing commands will be recorded until commit_batch or abort_batch."
+
+@autocad_mcp.tool()
+async def commit_batch(as_script: bool = False, max_script_lines: int = MAX_SCRIPT_LINES) -> str:
+    """Send every command recorded since begin_batch to AutoCAD as one program.
+    
+    With as_script=True the commands are compiled into AutoCAD script files of
+    at most max_script_lines commands each, chained together and started with
+    one SCRIPT command, so AutoCAD reads them from disk rather than from the
+    command line. Scripts are named by content hash, so committing the same
+    commands again reuses the compiled files."""
+    global active_batch
+    if active_batch is None:
+        return "No batch is open. Call begin_batch first."
+    batch, active_batch = active_batch, None
+    if not batch.forms:
+        return "Batch committed with no recorded commands"
+    
+    start = time.perf_counter()
+    if as_script:
+        try:
+            paths, cached = compile_script(batch.forms, max_script_lines)
+        except (OSError, ValueError) as e:
+            return f"Error: could not compile the batch into a script: {e}"
+        success, message = await session.run(execute_script, paths, batch.forms)
+        elapsed = time.perf_counter() - start
+        if not success:
+            scene.rollback(batch_checkpoint)
+            return f"Script of {len(batch)} commands failed: {message}"
+        return (f"Ran batch of {len(batch)} commands as {len(paths)} script file(s) "
+                f"({'reused' if cached else 'compiled'}) in {elapsed:.2f}s. {message}")
+
+    results_before = len(command_results)
+    success, message = await send_program(batch.program())
+    elapsed = time.perf_counter() - start
+    if not success:
+        scene.rollback(batch_checkpoint)
+        return f"Batch of {len(batch)} commands failed: {message}"
+    if len(command_results) == results_before:
+        # No result mailbox: the program prints the count on the command line
+        message = "AutoCAD reports the number of entities created on its command line."
+    return f"Committed batch of {len(batch)} commands in {elapsed:.2f}s. {message}"
+
+@autocad_mcp.tool()
+async def abort_batch() -> str:
+    """Discard every command recorded since begin_batch."""
+    global active_batch
+    if active_batch is None:
+        return "No batch is open."
+    discarded = len(active_batch)
+    active_batch = None
+    scene.rollback(batch_checkpoint)
+    return f"Batch aborted, {discarded} recorded commands discarded"
+
+@autocad_mcp.tool()
+async def begin_dxf(path: Optional[str] = None) -> str:
+    """Start writing drawing tools' output to a DXF file instead of AutoCAD.
+    
+    Until commit_dxf, the drawing tools (create_*, insert_block, the P&ID tools,
+    route_connections, batch_draw and the batch_create_* tools) write their
+    entities to the file, which takes microseconds per entity instead of a
+    round-trip each. commit_dxf then brings the whole file in with one INSERT.
+    Tools with no DXF equivalent (attributes, edits, preload_blocks) are
+    refused until then. path defaults to a new file in the temp directory."""
+    global dxf_output, batch_checkpoint
+    if dxf_output is not None:
+        return f"A DXF file is already open: {dxf_output.path}"
+    if active_batch is not None:
+        return "A batch is open. Call commit_batch or abort_batch first."
+    coalescer.flush()
+    try:
+        if not path:
+            os.makedirs(DXF_DIR, exist_ok=True)
+            handle, path = tempfile.mkstemp(".dxf", "drawing-", DXF_DIR)
+            os.close(handle)
+        dxf_output = DxfWriter(os.path.abspath(path))
+    except OSError as e:
+        return f"Error: could not create the DXF file: {e}"
+    batch_checkpoint = scene.checkpoint()
+    return f"Writing drawing tools' output to {dxf_output.path} until commit_dxf or abort_dxf."
+
+@autocad_mcp.tool()
+async def commit_dxf(import_into_drawing: bool = True) -> str:
+    """Finish the DXF file started by begin_dxf and import it into the drawing.
+    
+    The import loads the library symbols the file uses, inserts the file
+    exploded at the origin, then sends any operations the file couldn't hold
+    (blocks with an ID), all in one paste. With import_into_drawing=False the
+    file is only written, e.g. to be opened or inserted by hand."""
+    global dxf_output
+    if dxf_output is None:
+        return "No DXF file is open. Call begin_dxf first."
+    dxf, dxf_output = dxf_output, None
+    start = time.perf_counter()
+    try:
+        path = dxf.close()
+    except OSError as e:
+        dxf.abort()
+        scene.rollback(batch_checkpoint)
+        return f"Error: could not write {dxf.path}: {e}"
+    summary = (f"Wrote {dxf.count} entities to {path} ({os.path.getsize(path) / 1024:.0f} KB) "
+               f"in {time.perf_counter() - start:.2f}s")
+    if not import_into_drawing:
+        if dxf.deferred:
+            summary += f"; {len(dxf.deferred)} operations that need LISP were not sent"
+        return summary
+    
+    forms = [lisp_call("c:import-dxf", path.replace("\\", "/"), [list(s) for s in dxf.symbols])]
+    if dxf.deferred:
+        forms.append("(c:batch-draw '(" + " ".join(map(build_batch_draw_op, dxf.deferred)) + "))")
+    start = time.perf_counter()
+    success, message = await send_program(join_forms(forms))
+    if not success:
+        scene.rollback(batch_checkpoint)
+        return (f"{summary}, but the import failed: {message}. The file is kept at {path} "
+                f"for a manual import; the scene no longer includes its entities.")
+    defined_blocks.update(name.upper() for _, name in dxf.symbols)
+    return (f"{summary}; imported in {time.perf_counter() - start:.2f}s"
+            + (f" with {len(dxf.deferred)} operations sent as LISP" if dxf.deferred else ""))
+
+@autocad_mcp.tool()
+async def abort_dxf() -> str:
+    """Discard the DXF file started by begin_dxf without importing anything."""
+    global dxf_output
+    if dxf_output is None:
+        return "No DXF file is open."
+    count = dxf_output.count
+    dxf_output.abort()
+    dxf_output = None
+    scene.rollback(batch_checkpoint)
+    return f"DXF output aborted, {count} entities discarded"
 
 # Include all original tools with fast execution
 @autocad_mcp.tool()
 async def create_line(x1: float, y1: float, x2: float, y2: float) -> str:
-    cmd = f"(c:create-line {x1} {y1} {x2} {y2})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Line created successfully."
+    cmd = lisp_call("c:create-line", x1, y1, x2, y2)
+    op = {"type": "line", "x1": x1, "y1": y1, "x2": x2, "y2": y2}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    scene.add_line(x1, y1, x2, y2)
+    return "Line created successfully."
 
 @autocad_mcp.tool()
 async def create_circle(center_x: float, center_y: float, radius: float) -> str:
-    cmd = f"(c:create-circle {center_x} {center_y} {radius})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Circle created successfully."
+    cmd = lisp_call("c:create-circle", center_x, center_y, radius)
+    op = {"type": "circle", "center_x": center_x, "center_y": center_y, "radius": radius}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    scene.add_circle(center_x, center_y, radius)
+    return "Circle created successfully."
 
 @autocad_mcp.tool()
 async def create_text(x: float, y: float, height: float, text_string: str, 
                       rotation: float = 0.0) -> str:
-    text_escaped = text_string.replace('"', '\\"')
     if rotation != 0.0:
         # Use the rotated text function when rotation is specified
-        cmd = f'(c:create-text-rotated {x} {y} "{text_escaped}" {height} {rotation})'
+        cmd = lisp_call("c:create-text-rotated", x, y, text_string, height, rotation)
     else:
         # Use the basic function for non-rotated text
-        cmd = f'(c:create-text {x} {y} "{text_escaped}" {height})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Text created successfully."
+        cmd = lisp_call("c:create-text", x, y, text_string, height)
+    op = {"type": "text", "x": x, "y": y, "text_string": text_string, "height": height,
+          "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    scene.add_text(x, y, text_string, height, centered=True)
+    return "Text created successfully."
 
 # Note: execute_custom_autolisp removed - use specific tools or batch operations instead
 # This avoids issues with arbitrary code being pasted as text in AutoCAD
@@ -242,41 +1099,57 @@ async def create_text(x: float, y: float, height: float, text_string: str,
 
 @autocad_mcp.tool()
 async def create_polyline(points: List[Tuple[float, float]], closed: bool = False) -> str:
-    """Create a polyline from a series of points."""
-    pts_str = ""
-    for (x, y) in points:
-        pts_str += f" (list {x} {y} 0.0)"
-    cmd = f"(c:create-polyline (list {pts_str}) {'T' if closed else 'nil'})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Polyline created."
+    """Create a polyline from a series of points.
+    Repeated consecutive vertices are dropped before sending."""
+    compacted, dropped = compact_points(points, closed)
+    if len(compacted) < 2:
+        return "Error: a polyline needs at least two distinct points."
+    cmd = lisp_call("c:create-polyline", quoted_points(compacted), closed)
+    op = {"type": "polyline", "points": compacted, "closed": closed}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    scene.add_polyline(compacted, closed)
+    return f"Polyline created. {payload_summary(len(cmd), dropped, 'vertices')}"
 
 @autocad_mcp.tool()
 async def create_rectangle(x1: float, y1: float, x2: float, y2: float,
                           layer: Optional[str] = None) -> str:
     """Create a rectangle using two opposite corners."""
-    layer_part = f' "{layer}"' if layer else " nil"
-    cmd = f"(c:create-rectangle {x1} {y1} {x2} {y2}{layer_part})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Rectangle created."
+    cmd = lisp_call("c:create-rectangle", x1, y1, x2, y2, layer or None)
+    op = {"type": "rectangle", "x1": x1, "y1": y1, "x2": x2, "y2": y2, "layer": layer or None}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_rectangle(x1, y1, x2, y2, layer)
+    return "Rectangle created."
 
 @autocad_mcp.tool()
 async def insert_block(block_name: str, x: float, y: float,
                       scale: float = 1.0, rotation: float = 0.0,
                       block_id: Optional[str] = None) -> str:
     """Insert a block at specified location with optional ID attribute."""
-    id_part = f' "{block_id}"' if block_id else ""
-    cmd = f'(c:insert-block "{block_name}" {x} {y} {scale} {rotation}{id_part})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Block '{block_name}' inserted."
+    id_args = [block_id] if block_id else []
+    cmd = lisp_call("c:insert-block", block_name, x, y, scale, rotation, *id_args)
+    op = {"type": "block", "block_name": block_name, "x": x, "y": y, "block_id": block_id or "",
+          "scale": scale, "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_footprint("block", x, y, scale, rotation, block_name, block_id or "")
+    return f"Block '{block_name}' inserted."
 
 @autocad_mcp.tool()
 async def set_layer_properties(layer_name: str, color: str, linetype: str = "CONTINUOUS",
                               lineweight: str = "Default", plot_style: str = "ByLayer",
                               transparency: int = 0) -> str:
     """Create or modify a layer with specified properties."""
-    cmd = f'(c:create_or_set_layer "{layer_name}" "{color}" "{linetype}" "{lineweight}" "{plot_style}" {transparency})'
-    success, message = execute_lisp_command_fast(cmd)
+    cmd = lisp_call("c:create_or_set_layer", layer_name, color, linetype, lineweight,
+                    plot_style, transparency)
+    op = {"type": "layer", "layer_name": layer_name, "color": color, "linetype": linetype}
+    success, message = await run_lisp_command(cmd, op)
     if success:
+        scene.set_layer(layer_name, color, linetype)
         return (f"Layer '{layer_name}' created/updated. "
                 f"Properties: color={color}, linetype={linetype}")
     else:
@@ -285,18 +1158,126 @@ async def set_layer_properties(layer_name: str, color: str, linetype: str = "CON
 @autocad_mcp.tool()
 async def move_last_entity(delta_x: float, delta_y: float) -> str:
     """Move the most recently created entity."""
-    cmd = f"(c:move-last-entity {delta_x} {delta_y})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Entity moved."
+    cmd = lisp_call("c:move-last-entity", delta_x, delta_y)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    last = scene.last()
+    if last is not None:
+        scene.move(last.id, delta_x, delta_y)
+    return "Entity moved."
 
 # P&ID specific tools
 
 @autocad_mcp.tool()
 async def setup_pid_layers() -> str:
     """Create standard layers for P&ID drawings."""
-    cmd = "(c:setup-pid-layers)"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "P&ID layers created successfully."
+    cmd = lisp_call("c:setup-pid-layers")
+    success, message = await run_lisp_command(cmd, {"type": "pid_layers"})
+    if not success:
+        return message
+    record_pid_layers()
+    return "P&ID layers created successfully."
+
+# Approximate footprints (width, height at scale 1) of the blocks the tools place,
+# centred on the insertion point; the scene records them and the router keeps
+# process lines clear of them
+FOOTPRINTS = {
+    "block": (6.0, 6.0),
+    "pid_symbol": (6.0, 6.0),
+    "flow_arrow": (4.0, 2.0),
+    "valve": (6.0, 4.0),
+    "instrument": (6.0, 6.0),
+    "pump": (10.0, 10.0),
+    "tank": (20.0, 30.0),
+}
+
+def record_pid_layers():
+    for name, color in PID_LAYERS.items():
+        scene.set_layer(name, color, current=False)
+
+def record_footprint(kind, x, y, scale=1.0, rotation=0.0, name="", tag=""):
+    """Add a block to the scene with the footprint of its kind."""
+    width, height = FOOTPRINTS[kind]
+    if round(rotation / 90.0) % 2:
+        width, height = height, width
+    layer = PID_TOOL_LAYERS.get(kind)
+    if layer is not None:
+        scene.set_layer(layer)
+    return scene.add_block(name or kind.upper(), x, y, width * scale, height * scale, tag)
+
+def record_rectangle(x1, y1, x2, y2, layer=None):
+    scene.add_polyline([(x1, y1), (x2, y1), (x2, y2), (x1, y2)], closed=True, layer=layer)
+
+def record_process_line(points, kind="process_line"):
+    scene.set_layer(PID_TOOL_LAYERS[kind])
+    if len(points) > 2:
+        scene.add_polyline(points)
+    else:
+        scene.add_line(*points[0], *points[-1])
+
+def record_route(points):
+    """A routed process line: c:draw-process-routes puts it on the process layer
+    with entmake, so the current layer stays what it was."""
+    scene.add_polyline(points, layer=PROCESS_LAYER)
+
+def record_annotation(kind, x, y, text, tag=""):
+    """A tag or line number: the block the LISP inserts plus its text."""
+    scene.set_layer(PID_TOOL_LAYERS[kind])
+    record_footprint("block", x, y, name="ANNOT-EQUIP_TAG" if kind == "equipment_tag"
+                     else "ANNOT-LINE_NUMBER")
+    scene.add_text(x, y, text, 2.5 if kind == "equipment_tag" else 2.0, centered=True, tag=tag)
+
+def record_batch_draw_op(op):
+    """Add what one batch_draw operation drew to the scene."""
+    op_type = op["type"]
+    fields = batch_draw_fields(op)
+    layer = fields.get("layer")
+    if op_type == "line":
+        scene.add_line(fields["x1"], fields["y1"], fields["x2"], fields["y2"])
+    elif op_type == "circle":
+        scene.add_circle(fields["center_x"], fields["center_y"], fields["radius"])
+    elif op_type in ("text", "mtext"):
+        scene.add_text(fields["x"], fields["y"], fields["text_string"], fields["height"],
+                       centered=op_type == "text", layer=layer)
+    elif op_type == "polyline":
+        scene.add_polyline(fields["points"], bool(fields["closed"]))
+    elif op_type == "rectangle":
+        record_rectangle(fields["x1"], fields["y1"], fields["x2"], fields["y2"], layer)
+    elif op_type in ("arc", "ellipse"):
+        x, y = fields["center_x"], fields["center_y"]
+        if op_type == "arc":
+            radius = fields["radius"]
+        else:
+            radius = math.hypot(fields["major_axis_end_x"], fields["major_axis_end_y"])
+        scene.add(op_type, (x - radius, y - radius, x + radius, y + radius), layer,
+                  points=((x, y),), radius=radius)
+    elif op_type == "layer":
+        scene.set_layer(fields["layer_name"], fields["color"], fields["linetype"])
+    elif op_type == "pid_layers":
+        record_pid_layers()
+    elif op_type == "block":
+        record_footprint("block", fields["x"], fields["y"], fields["scale"], fields["rotation"],
+                         fields["block_name"], fields["block_id"])
+    elif op_type == "pid_symbol":
+        record_footprint("pid_symbol", fields["x"], fields["y"], fields["scale"],
+                         fields["rotation"], fields["symbol_name"])
+    elif op_type == "process_line":
+        record_process_line([(fields["x1"], fields["y1"]), (fields["x2"], fields["y2"])])
+    elif op_type == "connect_equipment":
+        record_process_line(elbow_route(fields["x1"], fields["y1"], fields["x2"], fields["y2"]),
+                            op_type)
+    elif op_type == "flow_arrow":
+        record_footprint("flow_arrow", fields["x"], fields["y"], rotation=fields["rotation"],
+                         name="ANNOT-FLOWARROW")
+    elif op_type == "equipment_tag":
+        record_annotation(op_type, fields["x"], fields["y"], fields["tag"], fields["tag"])
+    elif op_type == "line_number":
+        record_annotation(op_type, fields["x"], fields["y"],
+                          f"{fields['line_num']}-{fields['spec']}")
+    elif op_type in ("valve", "instrument", "pump", "tank"):
+        record_footprint(op_type, fields["x"], fields["y"], fields.get("scale", 1.0),
+                         fields.get("rotation", 0.0), fields[f"{op_type}_type"])
 
 @autocad_mcp.tool()
 async def insert_pid_symbol(category: str, symbol_name: str, x: float, y: float,
@@ -305,133 +1286,412 @@ async def insert_pid_symbol(category: str, symbol_name: str, x: float, y: float,
     
     Categories: ACTUATORS, ANNOTATION, ELECTRICAL, EQUIPMENT, FUNCTION, 
                 INSTRUMENTS, PIPING, PRIMARY_ELEMENTS, PUMPS-BLOWERS, 
-                REGULATORS, TANKS, VALVES"""
-    cmd = f'(c:insert-pid-block "{category}" "{symbol_name}" {x} {y} {scale} {rotation})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted {symbol_name} from {category}"
+                REGULATORS, TANKS, VALVES
+    Names are checked against the symbol catalog (case-insensitively) unless the
+    block is already defined in the drawing."""
+    if symbol_name.upper() not in defined_blocks:
+        valid, message = symbol_catalog.validate(category, symbol_name)
+        if not valid:
+            return f"Error: {message}"
+        category, symbol_name = message.split("/", 1)
+    cmd = lisp_call("c:insert-pid-block", category, symbol_name, x, y, scale, rotation)
+    op = {"type": "pid_symbol", "category": category, "symbol_name": symbol_name, "x": x, "y": y,
+          "scale": scale, "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    if active_batch is None and dxf_output is None:
+        defined_blocks.add(symbol_name.upper())
+    record_footprint("pid_symbol", x, y, scale, rotation, symbol_name)
+    return f"Inserted {symbol_name} from {category}"
 
 @autocad_mcp.tool()
 async def draw_process_line(x1: float, y1: float, x2: float, y2: float) -> str:
     """Draw a process line between two points."""
-    cmd = f"(c:draw-process-line {x1} {y1} {x2} {y2})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Process line drawn."
+    cmd = lisp_call("c:draw-process-line", x1, y1, x2, y2)
+    op = {"type": "process_line", "x1": x1, "y1": y1, "x2": x2, "y2": y2}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_process_line([(x1, y1), (x2, y2)])
+    return "Process line drawn."
+
+def sync_router():
+    """Rebuild the router from the scene's blocks and process lines if the scene changed."""
+    global router_version
+    if router_version == scene.version:
+        return
+    router.clear()
+    for box in scene.obstacles():
+        router.add_obstacle(*box)
+    for points in scene.lines_on(PROCESS_LAYER):
+        router.add_line(points)
+    router_version = scene.version
+
+def plan_routes(connections):
+    """Route each (x1, y1, x2, y2) around the scene's blocks and process lines,
+    registering every route so later ones keep clear of it. A connection with
+    no route falls back to a plain elbow. Returns (routes, number of fallbacks).
+    The routes only reach the scene through record_route, once drawn."""
+    global router_version
+    sync_router()
+    router_version = -1  # The router now holds routes the scene may never get
+    routes = []
+    fallbacks = 0
+    for x1, y1, x2, y2 in connections:
+        points = router.route((x1, y1), (x2, y2))
+        if points is None:
+            points = elbow_route(x1, y1, x2, y2)
+            fallbacks += 1
+        if len(points) > 1:
+            router.add_line(points)
+        routes.append(points)
+    return routes, fallbacks
+
+def route_op(points):
+    """A routed process line as the operation the DXF writer takes."""
+    return {"type": "polyline", "points": points, "layer": PROCESS_LAYER}
+
+def along_longest_segment(points, fraction):
+    """(x, y, rotation in degrees) of the point `fraction` of the way along a
+    route's longest segment, for placing a fitting on the line."""
+    (x1, y1), (x2, y2) = max(zip(points, points[1:]),
+                             key=lambda seg: math.dist(seg[0], seg[1]))
+    rotation = math.degrees(math.atan2(y2 - y1, x2 - x1))
+    return x1 + (x2 - x1) * fraction, y1 + (y2 - y1) * fraction, rotation
 
 @autocad_mcp.tool()
 async def connect_equipment(x1: float, y1: float, x2: float, y2: float) -> str:
-    """Connect two equipment with orthogonal process line routing."""
-    cmd = f"(c:connect-equipment {x1} {y1} {x2} {y2})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Equipment connected."
+    """Connect two equipment with an orthogonal process line.
+    
+    The line is routed around equipment placed and lines drawn through this
+    server, with the fewest bends, and drawn as one polyline."""
+    (points,), fallbacks = plan_routes([(x1, y1, x2, y2)])
+    if len(points) < 2:
+        return "Nothing to connect: both points are the same."
+    cmd = lisp_call("c:draw-process-routes", [points])
+    success, message = await run_lisp_command(cmd, route_op(points))
+    if not success:
+        return message
+    record_route(points)
+    if fallbacks:
+        return "Equipment connected (no clear route found; drawn as a plain elbow)."
+    return f"Equipment connected with {len(points) - 2} bends."
+
+@autocad_mcp.tool()
+async def route_connections(connections: List[List[float]]) -> str:
+    """Route and draw many process lines in one call.
+    
+    connections: List of [x1, y1, x2, y2]. Each line is routed around equipment
+    and earlier lines (including the ones before it in this list), then all
+    of them are drawn as polylines in a single LISP call."""
+    valid = []
+    rejected = 0
+    for connection in connections:
+        if len(connection) != 4:
+            rejected += 1
+            continue
+        valid.append(tuple(float(v) for v in connection))
+    
+    start = time.perf_counter()
+    routes, fallbacks = plan_routes(valid)
+    elapsed = time.perf_counter() - start
+    routes = [points for points in routes if len(points) > 1]
+    if not routes:
+        return f"No connections to draw ({rejected} rejected)."
+    success, message = await run_lisp_program(lisp_call("c:draw-process-routes", routes),
+                                              [route_op(points) for points in routes])
+    if not success:
+        return message
+    for points in routes:
+        record_route(points)
+    bends = sum(len(points) - 2 for points in routes)
+    return (f"Routed {len(routes)} connections in {elapsed * 1000:.0f}ms with {bends} bends in total "
+            f"({fallbacks} drawn as plain elbows, {rejected} rejected)")
+
+# Scene queries: answered from what this server has drawn, without AutoCAD
+
+def describe_entities(entities, limit):
+    lines = [entity.describe() for entity in entities[:limit]]
+    if len(entities) > limit:
+        lines.append(f"... and {len(entities) - limit} more")
+    return "\n".join(lines)
+
+@autocad_mcp.tool()
+async def get_scene_summary() -> str:
+    """Summarize what this server has drawn: entity counts by kind, layers and tags."""
+    counts = scene.summary()
+    if not counts:
+        return "Nothing has been drawn through this server yet."
+    kinds = ", ".join(f"{n} {kind}" for kind, n in sorted(counts.items()))
+    return (f"{len(scene)} entities ({kinds}); {len(scene.layers)} layers, current layer "
+            f"{scene.current_layer}; {len(scene.tags)} tags")
+
+@autocad_mcp.tool()
+async def find_entities_at(x: float, y: float, tolerance: float = 0.5) -> str:
+    """List what is at a point, smallest first: lines passing within tolerance,
+    and blocks, text, circles and closed polylines containing it."""
+    found = scene.at(x, y, tolerance)
+    if not found:
+        return f"Nothing at ({x:g}, {y:g})"
+    return f"{len(found)} entities at ({x:g}, {y:g}):\n" + describe_entities(found, 20)
+
+@autocad_mcp.tool()
+async def find_entities_in_area(x1: float, y1: float, x2: float, y2: float,
+                                kind: Optional[str] = None, layer: Optional[str] = None,
+                                limit: int = 50) -> str:
+    """List entities whose extents touch a rectangle, optionally only one kind
+    (line, polyline, circle, text, block, arc, ellipse) or one layer."""
+    found = scene.in_area(x1, y1, x2, y2, kind, layer)
+    if not found:
+        return "No entities in that area"
+    return f"{len(found)} entities in area:\n" + describe_entities(found, limit)
+
+@autocad_mcp.tool()
+async def check_placement(x: float, y: float, width: float, height: float) -> str:
+    """Check whether a width x height footprint centred on (x, y) would overlap
+    any block or text drawn so far, before placing anything there."""
+    found = scene.overlaps(x - width / 2.0, y - height / 2.0, x + width / 2.0, y + height / 2.0)
+    if not found:
+        return f"Clear: nothing overlaps a {width:g} x {height:g} footprint at ({x:g}, {y:g})"
+    return f"Overlaps {len(found)} entities:\n" + describe_entities(found, 20)
+
+@autocad_mcp.tool()
+async def locate_tag(tag: str) -> str:
+    """Find the block or equipment tag with a given ID."""
+    entity = scene.find_tag(tag)
+    return entity.describe() if entity is not None else f"No entity tagged '{tag}'"
+
+@autocad_mcp.tool()
+async def clear_scene() -> str:
+    """Forget everything the scene model (and with it the router) knows, e.g.
+    after the drawing was changed by hand or a new drawing was started."""
+    scene.clear()
+    return "Scene cleared."
 
 @autocad_mcp.tool()
 async def add_flow_arrow(x: float, y: float, rotation: float = 0.0) -> str:
     """Add a flow arrow at specified location."""
-    cmd = f"(c:add-flow-arrow {x} {y} {rotation})"
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Flow arrow added."
+    cmd = lisp_call("c:add-flow-arrow", x, y, rotation)
+    op = {"type": "flow_arrow", "x": x, "y": y, "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_footprint("flow_arrow", x, y, rotation=rotation, name="ANNOT-FLOWARROW")
+    return "Flow arrow added."
 
 @autocad_mcp.tool()
 async def add_equipment_tag(x: float, y: float, tag: str, description: str = "") -> str:
     """Add equipment tag and description."""
-    desc_escaped = description.replace('"', '\\"')
-    cmd = f'(c:add-equipment-tag {x} {y} "{tag}" "{desc_escaped}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Equipment tagged: {tag}"
+    cmd = lisp_call("c:add-equipment-tag", x, y, tag, description)
+    op = {"type": "equipment_tag", "x": x, "y": y, "tag": tag, "description": description}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_annotation("equipment_tag", x, y, tag, tag)
+    return f"Equipment tagged: {tag}"
 
 @autocad_mcp.tool()
 async def add_line_number(x: float, y: float, line_num: str, spec: str) -> str:
     """Add line number with specification."""
-    cmd = f'(c:add-line-number {x} {y} "{line_num}" "{spec}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Line number added: {line_num}-{spec}"
+    cmd = lisp_call("c:add-line-number", x, y, line_num, spec)
+    op = {"type": "line_number", "x": x, "y": y, "line_num": line_num, "spec": spec}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_annotation("line_number", x, y, f"{line_num}-{spec}")
+    return f"Line number added: {line_num}-{spec}"
 
 @autocad_mcp.tool()
 async def insert_valve(x: float, y: float, valve_type: str = "GATE", 
                       rotation: float = 0.0) -> str:
     """Insert a valve. Types: GATE, GLOBE, CHECK, BALL, BUTTERFLY"""
-    cmd = f'(c:insert-valve-on-line {x} {y} "{valve_type}" {rotation})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"{valve_type} valve inserted."
+    cmd = lisp_call("c:insert-valve-on-line", x, y, valve_type, rotation)
+    op = {"type": "valve", "x": x, "y": y, "valve_type": valve_type, "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_footprint("valve", x, y, rotation=rotation, name=valve_type)
+    return f"{valve_type} valve inserted."
 
 @autocad_mcp.tool()
 async def insert_instrument(x: float, y: float, instrument_type: str,
                            rotation: float = 0.0) -> str:
     """Insert an instrument. Types: FLOW, PRESSURE, TEMPERATURE, LEVEL"""
-    cmd = f'(c:insert-instrument {x} {y} "{instrument_type}" {rotation})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"{instrument_type} instrument inserted."
+    cmd = lisp_call("c:insert-instrument", x, y, instrument_type, rotation)
+    op = {"type": "instrument", "x": x, "y": y, "instrument_type": instrument_type,
+          "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_footprint("instrument", x, y, rotation=rotation, name=instrument_type)
+    return f"{instrument_type} instrument inserted."
 
 @autocad_mcp.tool()
 async def insert_pump(x: float, y: float, pump_type: str = "CENTRIFUGAL",
                      rotation: float = 0.0) -> str:
     """Insert a pump. Types: CENTRIFUGAL, DIAPHRAGM, GEAR"""
-    cmd = f'(c:insert-pump {x} {y} "{pump_type}" {rotation})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"{pump_type} pump inserted."
+    cmd = lisp_call("c:insert-pump", x, y, pump_type, rotation)
+    op = {"type": "pump", "x": x, "y": y, "pump_type": pump_type, "rotation": rotation}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_footprint("pump", x, y, rotation=rotation, name=pump_type)
+    return f"{pump_type} pump inserted."
 
 @autocad_mcp.tool()
 async def insert_tank(x: float, y: float, tank_type: str = "VERTICAL",
                      scale: float = 1.0) -> str:
     """Insert a tank. Types: VERTICAL, HORIZONTAL, CONE"""
-    cmd = f'(c:insert-tank {x} {y} "{tank_type}" {scale})'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"{tank_type} tank inserted."
-
-@autocad_mcp.tool()
-async def list_pid_symbols(category: str) -> str:
-    """List available P&ID symbols in a category."""
-    import glob
-    path = f"C:/PIDv4-CTO/{category}/*.dwg"
-    files = glob.glob(path)
-    symbols = [os.path.splitext(os.path.basename(f))[0] for f in files]
-    if symbols:
-        return f"Available symbols in {category}: " + ", ".join(sorted(symbols)[:20])
-    else:
+    cmd = lisp_call("c:insert-tank", x, y, tank_type, scale)
+    op = {"type": "tank", "x": x, "y": y, "tank_type": tank_type, "scale": scale}
+    success, message = await run_lisp_command(cmd, op)
+    if not success:
+        return message
+    record_footprint("tank", x, y, scale, name=tank_type)
+    return f"{tank_type} tank inserted."
+
+@autocad_mcp.tool()
+async def list_pid_symbols(category: str = "", offset: int = 0, limit: int = 50) -> str:
+    """List the P&ID symbols in a category, a page at a time.
+    Without a category, lists the categories and how many symbols each has."""
+    if not symbol_catalog.available:
+        return f"No P&ID symbol library found at {symbol_catalog.root}"
+    if not category:
+        counts = symbol_catalog.categories()
+        return f"{len(counts)} categories: " + ", ".join(f"{name} ({n})" for name, n in counts.items())
+    canonical = symbol_catalog.category(category)
+    if canonical is None:
         return f"No symbols found in category: {category}"
+    symbols, total = symbol_catalog.symbols(canonical, offset, limit)
+    if not symbols:
+        return f"No symbols in {canonical} after offset {offset} ({total} in total)"
+    result = (f"Symbols {offset + 1}-{offset + len(symbols)} of {total} in {canonical}: "
+              + ", ".join(symbols))
+    if offset + len(symbols) < total:
+        result += f" (more with offset={offset + len(symbols)})"
+    return result
 
 @autocad_mcp.tool()
-async def create_simple_pid_example() -> str:
-    """Create a simple P&ID example with tank, pump, and valve."""
-    # This demonstrates how the AI can chain tools to create complex drawings
-    results = []
-    
-    # Set up layers
-    cmd = "(c:setup-pid-layers)"
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Layers created" if success else msg)
-    
-    # Insert tank at (0, 0)
-    cmd = '(c:insert-tank 0 0 "VERTICAL" 2.0)'
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Tank inserted" if success else msg)
-    
-    # Add tank tag
-    cmd = '(c:add-equipment-tag 0 15 "TK-101" "Feed Tank")'
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Tank tagged" if success else msg)
-    
-    # Insert pump at (30, -5)
-    cmd = '(c:insert-pump 30 -5 "CENTRIFUGAL" 0)'
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Pump inserted" if success else msg)
-    
-    # Connect tank to pump
-    cmd = "(c:connect-equipment 10 0 30 -5)"
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Connected" if success else msg)
+async def search_pid_symbols(query: str, category: Optional[str] = None,
+                             offset: int = 0, limit: int = 20) -> str:
+    """Find P&ID symbols by name: exact, prefix and substring matches first,
+    then close spellings. Optionally restricted to one category."""
+    if not symbol_catalog.available:
+        return f"No P&ID symbol library found at {symbol_catalog.root}"
+    matches, total = symbol_catalog.search(query, category, offset, limit)
+    if not matches:
+        return f"No symbols match '{query}'"
+    result = (f"Matches {offset + 1}-{offset + len(matches)} of {total} for '{query}': "
+              + ", ".join(f"{name}/{symbol}" for name, symbol in matches))
+    if offset + len(matches) < total:
+        result += f" (more with offset={offset + len(matches)})"
+    return result
+
+@exclusive
+def sync_defined_blocks(target, expected):
+    """Replace the block registry with the list c:preload-blocks recorded in AutoCAD."""
+    with target.input_lock:
+        target.transport.focus(target.window)
+        value = target.transport.read_variable(target.window, "*mcp-defined-blocks*")
+    if value:
+        defined_blocks.clear()
+        defined_blocks.update(name for name in value.split(";") if name)
+    else:
+        defined_blocks.update(expected)  # No answer; assume the preload went through
+
+@autocad_mcp.tool()
+async def preload_blocks(symbols: List[str], category: Optional[str] = None) -> str:
+    """Load the definitions of many library symbols in one pass before a drawing run,
+    so placing them later never reads the .dwg files from disk.
     
-    # Add valve on line
-    cmd = '(c:insert-valve-on-line 20 -2.5 "GATE" 0)'
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Valve added" if success else msg)
+    symbols: "CATEGORY/NAME" entries, or bare names when category is given.
+    Blocks the drawing already has are skipped."""
+    wanted = []
+    rejected = []
+    for entry in symbols:
+        entry_category, _, name = entry.rpartition("/")
+        entry_category = entry_category or category
+        if not entry_category:
+            rejected.append(f"{entry}: no category given")
+            continue
+        valid, message = symbol_catalog.validate(entry_category, name)
+        if not valid:
+            rejected.append(message)
+            continue
+        entry_category, name = message.split("/", 1)
+        if name.upper() not in defined_blocks and [entry_category, name] not in wanted:
+            wanted.append([entry_category, name])
     
-    # Add flow arrow
-    cmd = "(c:add-flow-arrow 25 -3.5 0)"
-    success, msg = execute_lisp_command_fast(cmd)
-    results.append("Flow arrow added" if success else msg)
+    lines = []
+    if wanted:
+        success, message = await run_lisp_program(lisp_call("c:preload-blocks", wanted))
+        if not success:
+            return message
+        if active_batch is not None:
+            lines.append(f"{len(wanted)} block definitions will load when the batch is committed")
+        else:
+            await session.run(sync_defined_blocks, session, [name.upper() for _, name in wanted])
+            missing = [name for _, name in wanted if name.upper() not in defined_blocks]
+            lines.append(f"Preloaded {len(wanted) - len(missing)} block definitions; "
+                         f"{len(defined_blocks)} blocks are now defined in the drawing")
+            if missing:
+                lines.append(f"AutoCAD did not define: {', '.join(missing)}")
+    already = len(symbols) - len(wanted) - len(rejected)
+    if already:
+        lines.append(f"{already} already defined or listed twice")
+    lines.extend(f"Rejected: {reason}" for reason in rejected)
+    return "\n".join(lines) or "Nothing to preload"
+
+@autocad_mcp.tool()
+async def create_simple_pid_example() -> str:
+    """Create a simple P&ID example with tank, pump, and valve."""
+    # This demonstrates how the AI can chain tools to create complex drawings.
+    # The tank and pump are recorded in the scene first so the line between
+    # them is routed around them, with the valve and flow arrow placed on it.
+    # Everything is sent as one program, so the drawing costs a single round-trip
+    equipment = [
+        ({"type": "pid_layers"}, "Layers created"),
+        ({"type": "tank", "x": 0, "y": 0, "tank_type": "VERTICAL", "scale": 2.0}, "Tank inserted"),
+        ({"type": "equipment_tag", "x": 0, "y": 15, "tag": "TK-101", "description": "Feed Tank"},
+         "Tank tagged"),
+        ({"type": "pump", "x": 30, "y": -5, "pump_type": "CENTRIFUGAL"}, "Pump inserted"),
+    ]
+    checkpoint = scene.checkpoint()
+    for op, _ in equipment:
+        if op["type"] in ("tank", "pump"):
+            record_batch_draw_op(op)
+    (route,), fallbacks = plan_routes([(10, 0, 30, -5)])
+    valve_x, valve_y, rotation = along_longest_segment(route, 0.5)
+    arrow_x, arrow_y, _ = along_longest_segment(route, 0.75)
+    fittings = [
+        ({"type": "valve", "x": valve_x, "y": valve_y, "valve_type": "GATE",
+          "rotation": rotation}, "Valve added"),
+        ({"type": "flow_arrow", "x": arrow_x, "y": arrow_y, "rotation": rotation},
+         "Flow arrow added"),
+    ]
+    ops = [op for op, _ in equipment + fittings]
+    if dxf_output is not None:
+        done = f"Simple P&ID written to {os.path.basename(dxf_output.path)}"
+    elif active_batch is not None:
+        done = f"Simple P&ID recorded into the open batch ({len(ops) + 1} operations)"
+    else:
+        connected = ("Connected with a plain elbow" if fallbacks
+                     else f"Connected with {len(route) - 2} bends")
+        done = "Simple P&ID created: " + ", ".join(
+            [result for _, result in equipment] + [connected] + [result for _, result in fittings])
     
-    return "Simple P&ID created: " + ", ".join(results)
+    cmd = join_forms(["(c:batch-draw '(" + " ".join(map(build_batch_draw_op, ops)) + "))",
+                      lisp_call("c:draw-process-routes", [route])])
+    success, msg = await run_lisp_program(cmd, ops + [route_op(route)])
+    if not success:
+        scene.rollback(checkpoint)
+        return f"Simple P&ID failed: {msg}"
+    for op, _ in equipment + fittings:
+        if op["type"] not in ("tank", "pump"):
+            record_batch_draw_op(op)
+    record_route(route)
+    return done
 
 # Block attribute handling tools
 
@@ -451,11 +1711,14 @@ async def insert_block_with_attributes(block_path: str, x: float, y: float,
     if attributes is None:
         attributes = []
     
-    # Format attributes for LISP
-    attrib_list = " ".join([f'"{attr}"' for attr in attributes])
-    cmd = f'(c:insert-block-with-attribs "{block_path}" {x} {y} {scale} {rotation} (list {attrib_list}))'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else "Block inserted with attributes."
+    cmd = lisp_call("c:insert-block-with-attribs", block_path, x, y, scale, rotation,
+                    list(attributes))
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    block_name = os.path.splitext(os.path.basename(block_path.replace("\\", "/")))[0]
+    record_footprint("block", x, y, scale, rotation, block_name)
+    return "Block inserted with attributes."
 
 @autocad_mcp.tool()
 async def update_block_attribute(x: float, y: float, tag_name: str, new_value: str) -> str:
@@ -466,9 +1729,8 @@ async def update_block_attribute(x: float, y: float, tag_name: str, new_value: s
         tag_name: The attribute tag name (e.g., "TAG", "DESCRIPTION")
         new_value: New value for the attribute
     """
-    value_escaped = new_value.replace('"', '\\"')
-    cmd = f'(c:update-block-attribs {x} {y} "{tag_name}" "{value_escaped}")'
-    success, message = execute_lisp_command_fast(cmd)
+    cmd = lisp_call("c:update-block-attribs", x, y, tag_name, new_value)
+    success, message = await run_lisp_command(cmd)
     return message if not success else f"Updated {tag_name} to: {new_value}"
 
 @autocad_mcp.tool()
@@ -493,17 +1755,13 @@ async def insert_pid_equipment_with_attribs(category: str, symbol_name: str,
         line_no: Associated line number
         capacity: Equipment capacity (tanks only)
     """
-    # Escape quotes in string parameters - handle empty strings properly
-    equipment_no = equipment_no.replace('"', '\\"') if equipment_no else ""
-    equipment_type = equipment_type.replace('"', '\\"') if equipment_type else ""
-    manufacturer = manufacturer.replace('"', '\\"') if manufacturer else ""
-    model_no = model_no.replace('"', '\\"') if model_no else ""
-    line_no = line_no.replace('"', '\\"') if line_no else ""
-    capacity = capacity.replace('"', '\\"') if capacity else ""
-    
-    cmd = f'(c:insert-pid-equipment "{category}" "{symbol_name}" {x} {y} {scale} {rotation} "{equipment_no}" "{equipment_type}" "{manufacturer}" "{model_no}" "{line_no}" "{capacity}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted {symbol_name} with equipment number {equipment_no}"
+    cmd = lisp_call("c:insert-pid-equipment", category, symbol_name, x, y, scale, rotation,
+                    equipment_no, equipment_type, manufacturer, model_no, line_no, capacity)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    record_footprint("pid_symbol", x, y, scale, rotation, symbol_name, equipment_no)
+    return f"Inserted {symbol_name} with equipment number {equipment_no}"
 
 @autocad_mcp.tool()
 async def insert_valve_with_attributes(x: float, y: float, valve_type: str,
@@ -522,17 +1780,13 @@ async def insert_valve_with_attributes(x: float, y: float, valve_type: str,
         va_no: Valve number/tag (e.g., "V-101")
         line_no: Associated line number
     """
-    # Escape quotes in string parameters
-    equipment_type = equipment_type.replace('"', '\\"') if equipment_type else '""'
-    manufacturer = manufacturer.replace('"', '\\"') if manufacturer else '""'
-    model_no = model_no.replace('"', '\\"') if model_no else '""'
-    va_size = va_size.replace('"', '\\"') if va_size else '""'
-    va_no = va_no.replace('"', '\\"') if va_no else '""'
-    line_no = line_no.replace('"', '\\"') if line_no else '""'
-    
-    cmd = f'(c:insert-valve-with-attributes {x} {y} "{valve_type}" "{equipment_type}" "{manufacturer}" "{model_no}" "{va_size}" "{va_no}" "{line_no}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted {valve_type} valve {va_no}"
+    cmd = lisp_call("c:insert-valve-with-attributes", x, y, valve_type, equipment_type,
+                    manufacturer, model_no, va_size, va_no, line_no)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    record_footprint("valve", x, y, name=valve_type, tag=va_no)
+    return f"Inserted {valve_type} valve {va_no}"
 
 @autocad_mcp.tool()
 async def insert_instrument_with_attributes(x: float, y: float, instrument_type: str,
@@ -545,10 +1799,12 @@ async def insert_instrument_with_attributes(x: float, y: float, instrument_type:
         tag_id: Instrument tag (e.g., "PT-101", "FT-201")
         range_value: Instrument range (e.g., "0-100 PSI", "0-500 GPM")
     """
-    range_escaped = range_value.replace('"', '\\"')
-    cmd = f'(c:insert-instrument-with-tag {x} {y} "{instrument_type}" "{tag_id}" "{range_escaped}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted {instrument_type} instrument {tag_id}"
+    cmd = lisp_call("c:insert-instrument-with-tag", x, y, instrument_type, tag_id, range_value)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    record_footprint("instrument", x, y, name=instrument_type, tag=tag_id)
+    return f"Inserted {instrument_type} instrument {tag_id}"
 
 @autocad_mcp.tool()
 async def insert_equipment_tag(x: float, y: float, equipment_tag: str) -> str:
@@ -558,10 +1814,12 @@ async def insert_equipment_tag(x: float, y: float, equipment_tag: str) -> str:
         x, y: Insertion point
         equipment_tag: Equipment tag/number (e.g., "P-101", "TK-201")
     """
-    tag_escaped = equipment_tag.replace('"', '\\"')
-    cmd = f'(c:insert-equipment-tag {x} {y} "{tag_escaped}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted equipment tag: {equipment_tag}"
+    cmd = lisp_call("c:insert-equipment-tag", x, y, equipment_tag)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    record_footprint("block", x, y, name="ANNOT-EQUIP_TAG", tag=equipment_tag)
+    return f"Inserted equipment tag: {equipment_tag}"
 
 @autocad_mcp.tool()
 async def insert_equipment_description(x: float, y: float, equipment_name: str,
@@ -575,18 +1833,13 @@ async def insert_equipment_description(x: float, y: float, equipment_name: str,
         equipment_name: Equipment name (will be underlined)
         description1-6: Additional description lines
     """
-    # Escape quotes in string parameters
-    equipment_name = equipment_name.replace('"', '\\"') if equipment_name else '""'
-    description1 = description1.replace('"', '\\"') if description1 else '""'
-    description2 = description2.replace('"', '\\"') if description2 else '""'
-    description3 = description3.replace('"', '\\"') if description3 else '""'
-    description4 = description4.replace('"', '\\"') if description4 else '""'
-    description5 = description5.replace('"', '\\"') if description5 else '""'
-    description6 = description6.replace('"', '\\"') if description6 else '""'
-    
-    cmd = f'(c:insert-equipment-description {x} {y} "{equipment_name}" "{description1}" "{description2}" "{description3}" "{description4}" "{description5}" "{description6}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted equipment description: {equipment_name}"
+    cmd = lisp_call("c:insert-equipment-description", x, y, equipment_name, description1,
+                    description2, description3, description4, description5, description6)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    record_footprint("block", x, y, name="ANNOT-EQUIP_DESCR")
+    return f"Inserted equipment description: {equipment_name}"
 
 @autocad_mcp.tool()
 async def insert_line_number_tag(x: float, y: float, line_number: str) -> str:
@@ -596,10 +1849,12 @@ async def insert_line_number_tag(x: float, y: float, line_number: str) -> str:
         x, y: Insertion point
         line_number: Line number (e.g., "2\"-WW-001")
     """
-    line_escaped = line_number.replace('"', '\\"')
-    cmd = f'(c:insert-line-number {x} {y} "{line_escaped}")'
-    success, message = execute_lisp_command_fast(cmd)
-    return message if not success else f"Inserted line number: {line_number}"
+    cmd = lisp_call("c:insert-line-number", x, y, line_number)
+    success, message = await run_lisp_command(cmd)
+    if not success:
+        return message
+    record_footprint("block", x, y, name="ANNOT-LINE_NUMBER")
+    return f"Inserted line number: {line_number}"
 
 @autocad_mcp.tool()
 async def edit_last_block_attribute(tag_name: str, new_value: str) -> str:
@@ -607,56 +1862,54 @@ async def edit_last_block_attribute(tag_name: str, new_value: str) -> str:
     
     Useful for updating attributes after insertion.
     """
-    value_escaped = new_value.replace('"', '\\"')
-    cmd = f'(c:edit-last-block-attrib "{tag_name}" "{value_escaped}")'
-    success, message = execute_lisp_command_fast(cmd)
+    cmd = lisp_call("c:edit-last-block-attrib", tag_name, new_value)
+    success, message = await run_lisp_command(cmd)
     return message if not success else f"Updated {tag_name} on last block"
 
-def initialize_autocad_lisp_fast():
-    """Fast initialization - load only essential LISP files.
-    Note: LISP file loading still uses 3s delay for security prompts,
-    but all other operations use fast delays."""
-    global acad_window, lisp_path
+@exclusive
+def initialize_session(target):
+    """Fast initialization of one AutoCAD - load the essential LISP files as a
+    single bundle. Note: the bundle load still uses a 3s delay for the security
+    prompt, but only once, and not at all if this AutoCAD session already has
+    the files. With LAZY_LOADING only error_handling.lsp is loaded here;
+    everything else is loaded the first time a tool needs it."""
+    global mailbox_cleared
     
-    logger.info("Fast initialization starting...")
-    logger.info("LISP files will load with 3s delay for security prompts")
-    logger.info("All other operations will use fast mode delays")
+    logger.info(f"Fast initialization of {target.name} starting...")
     
-    acad_window = find_autocad_window()
-    if not acad_window:
+    if not target.find_window():
         logger.error("AutoCAD LT window not found")
         return False
+    target.initialized = True  # Before the mailbox setup command below is sent
     
-    # Load essential files including those for added tools
-    essential_files = [
-        "error_handling.lsp",
-        "basic_shapes.lsp",
-        "batch_operations.lsp",  # New batch operations file
-        "advanced_geometry.lsp",  # For polylines
-        "advanced_entities.lsp",  # For rectangles
-        "drafting_helpers.lsp",   # For blocks and layers
-        "entity_modification.lsp", # For move operations
-        "pid_tools.lsp",         # P&ID specific tools
-        "attribute_tools.lsp"    # Block attribute handling
-    ]
+    startup_files = CORE_LISP_FILES if LAZY_LOADING else SERVER_FILES["fast"]
+    success, message = load_lisp(target, startup_files)
+    if success:
+        logger.info(message)
+    else:
+        logger.error(f"Failed to load LISP files: {message}")
+    
+    if target.loader.is_loaded("error_handling.lsp"):
+        # mcp-run is defined; point it at the mailbox, which every instance
+        # shares, after clearing records left by an earlier server process
+        if not mailbox_cleared:
+            target.transport.reset_results()
+            mailbox_cleared = True
+        target.mailbox_ready = type_command(target, mailbox_setup_command())[0]
+    
+    if symbol_catalog.root != DEFAULT_LIBRARY_ROOT:
+        # pid_tools.lsp keeps this value when it is loaded later
+        type_command(target, lisp_call("setq", Symbol("*mcp-symbol-library*"),
+                                       symbol_catalog.root + "/"))
     
-    for f in essential_files:
-        full_path = os.path.join(lisp_path, f)
-        if os.path.exists(full_path):
-            # Use traditional loading with 3s delay for security prompts
-            success, message = load_lisp_file_with_delay(full_path)
-            if success:
-                logger.info(f"Loaded {f}")
-            else:
-                logger.error(f"Failed to load {f}: {message}")
-    
-    logger.info("Fast initialization complete")
+    logger.info(f"Fast initialization of {target.name} complete")
     return True
 
+def initialize_autocad_lisp_fast():
+    """Fast initialization of the AutoCAD the tools draw in."""
+    return initialize_session(session)
+
 if __name__ == "__main__":
-    logger.info("AutoCAD LT MCP Server (Fast Version) starting...")
-    if initialize_autocad_lisp_fast():
-        logger.info("Successfully initialized AutoCAD LT with fast LISP libraries.")
-    else:
-        logger.warning("Failed to initialize AutoCAD LT with LISP. Will retry on tool calls.")
+    # AutoCAD is initialized on the first tool call that needs it
+    logger.info("AutoCAD LT MCP Server (Fast Version) starting; LISP loads on first use.")
     autocad_mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Session
+Everything the server knows about the AutoCAD window it drives, in one object
+instead of module globals: the window handle, the pacing settings, the
+registry of LISP files loaded into that AutoCAD, and the lock that keeps two
+commands from being typed into it at the same time.
+
+A command is a sequence of focus, keystrokes, pastes and sleeps. If two
+senders run those sequences concurrently their keystrokes interleave on the
+command line and both commands are corrupted. Every function that drives a
+window takes its session as first argument and is wrapped with exclusive, so
+it holds the session lock from its first keystroke until AutoCAD has
+answered. The lock is reentrant, because sending a command may first
+initialize the session or load LISP, which send too.
+
+Several AutoCAD windows can each have a session (see instance_pool.py). They
+still share one keyboard focus and one clipboard, so the keystrokes
+themselves are sent holding input_lock, which all sessions share; waiting
+for AutoCAD to finish happens outside it, so instances draw in parallel.
+Always take the session lock before the input lock.
+
+Tools queue their sends with session.run, which runs them on the session's
+own worker thread in submission order (see dispatch.py):
+
+    session = AutoCADSession(LispLoader(lisp_path))
+
+    @exclusive
+    def execute(target, command): ...
+
+    success, message = await session.run(execute, session, command)
+
+Pacing settings are an immutable PacingConfig that set_performance_mode swaps
+in whole, so a command in flight keeps the delays it started with.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Optional
+
+from dispatch import Dispatcher
+from lisp_bundle import LispLoader
+from pacing import AdaptivePacer
+from transport import get_transport
+
+logger = logging.getLogger("autocad-lisp-mcp.session")
+
+# Keyboard focus and the clipboard belong to the desktop, not to one window
+DESKTOP_INPUT = threading.RLock()
+
+
+@dataclass(frozen=True)
+class PacingConfig:
+    """Delays between the steps of sending a command, in seconds."""
+    fast_mode: bool = True  # Use the delays below; normal mode uses longer fixed ones
+    use_esc_key: bool = False  # ESC before each command; off to avoid help menu issues
+    minimal_delay: float = 0.05
+    normal_delay: float = 0.1
+    focus_delay: float = 0.1
+    adaptive: bool = False  # Scale delays with the AdaptivePacer (see pacing.py)
+
+
+class AutoCADSession:
+    """One AutoCAD window and the state of the connection to it."""
+
+    def __init__(self, loader: LispLoader, name: str = "autocad", window: Optional[int] = None):
+        self.name = name
+        self.window = window
+        self.initialized = False  # Set once startup initialization has found AutoCAD
+        self.mailbox_ready = False  # mcp-run is defined and its mailbox cleared
+        self.loader = loader  # LISP files loaded into this AutoCAD
+        self.pacing = PacingConfig()
+        self.pacer = AdaptivePacer()
+        self.lock = threading.RLock()
+        self.input_lock = DESKTOP_INPUT
+        self.dispatcher = Dispatcher(name)
+
+    @property
+    def transport(self):
+        return get_transport()
+
+    def find_window(self) -> Optional[int]:
+        """The AutoCAD window handle, looked up the first time it is needed."""
+        if not self.window:
+            self.window = self.transport.find_window()
+        return self.window
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Queue func(*args) on the session's worker; returns a future for its result."""
+        return self.dispatcher.submit(func, *args)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Queue func(*args) on the session's worker and wait for its result."""
+        return await self.dispatcher.run(func, *args)
+
+    def configure(self, probe_every: Optional[int] = None, **settings: Any) -> PacingConfig:
+        """Replace pacing settings (PacingConfig field names). Turning adaptive
+        pacing on starts it from a fresh pacer."""
+        config = replace(self.pacing, **settings)
+        if config.adaptive and not self.pacing.adaptive:
+            self.pacer.reset()
+        if probe_every is not None:
+            self.pacer.probe_every = max(1, probe_every)
+        self.pacing = config
+        return config
+
+    def pace(self, command_class: str, base: float) -> float:
+        """Delay for one step of sending a command, scaled by the pacer in adaptive mode."""
+        return self.pacer.delay(command_class, base) if self.pacing.adaptive else base
+
+    def settle(self, command_class: str, base: float) -> float:
+        """Delay after submitting a command, never below its measured latency in adaptive mode."""
+        return self.pacer.settle_delay(command_class, base) if self.pacing.adaptive else base
+
+
+def exclusive(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator for functions whose first argument is a session: run them
+    holding its lock, so the keystrokes they send can't interleave with
+    another command's."""
+    @functools.wraps(func)
+    def wrapper(target: AutoCADSession, *args, **kwargs):
+        with target.lock:
+            return func(target, *args, **kwargs)
+    return wrapper
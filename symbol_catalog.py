@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - P&ID Symbol Catalog
+Indexes the symbol library (one sub-directory per category, one .dwg per
+symbol) so listing, searching and validating symbols doesn't scan the library
+on every call. That matters most when the library sits on a network share.
+
+The index is kept in a JSON file in the temp directory, so a restarted server
+starts from it too. Each category remembers its directory's mtime; the
+directories are stat'ed again at most every `check_interval` seconds, and only
+categories whose mtime changed are rescanned.
+
+The library root defaults to C:/PIDv4-CTO and can be changed with the
+AUTOCAD_MCP_SYMBOL_LIBRARY environment variable.
+"""
+import difflib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("autocad-lisp-mcp.symbol_catalog")
+
+DEFAULT_LIBRARY_ROOT = "C:/PIDv4-CTO"
+SYMBOL_EXTENSION = ".dwg"
+CACHE_VERSION = 1
+
+
+def library_root() -> str:
+    """Library root from AUTOCAD_MCP_SYMBOL_LIBRARY, with forward slashes."""
+    root = os.environ.get("AUTOCAD_MCP_SYMBOL_LIBRARY", DEFAULT_LIBRARY_ROOT)
+    return root.replace("\\", "/").rstrip("/")
+
+
+def default_cache_path(root: str) -> str:
+    digest = hashlib.sha1(root.lower().encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"autocad-mcp-symbols-{digest}.json")
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class SymbolCatalog:
+    """Cached index of category -> symbol names for a symbol library."""
+
+    def __init__(self, root: Optional[str] = None, cache_path: Optional[str] = None,
+                 check_interval: float = 2.0):
+        self.root = (root or library_root()).replace("\\", "/").rstrip("/")
+        self.cache_path = cache_path or default_cache_path(self.root)
+        self.check_interval = check_interval
+        self._root_mtime: Optional[float] = None
+        # Category name -> {"mtime": float, "symbols": [names]}
+        self._categories: Dict[str, Dict] = {}
+        # Lower-cased lookups, rebuilt whenever the index changes
+        self._category_keys: Dict[str, str] = {}
+        self._symbol_keys: Dict[str, Dict[str, str]] = {}
+        self._loaded = False
+        self._checked_at: Optional[float] = None
+        self.scans = 0  # Category directories listed, for diagnostics
+
+    # ---- index maintenance -------------------------------------------------
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION or data.get("root") != self.root:
+            return
+        self._root_mtime = data.get("root_mtime")
+        self._categories = data.get("categories", {})
+
+    def _save_cache(self) -> None:
+        data = {"version": CACHE_VERSION, "root": self.root, "root_mtime": self._root_mtime,
+                "categories": self._categories}
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write symbol catalog cache {self.cache_path}: {e}")
+
+    def _scan_category(self, name: str) -> List[str]:
+        self.scans += 1
+        try:
+            with os.scandir(os.path.join(self.root, name)) as entries:
+                return sorted(os.path.splitext(entry.name)[0] for entry in entries
+                              if entry.name.lower().endswith(SYMBOL_EXTENSION) and entry.is_file())
+        except OSError:
+            return []
+
+    def _reindex(self) -> None:
+        self._category_keys = {name.lower(): name for name in self._categories}
+        self._symbol_keys = {name: {symbol.lower(): symbol for symbol in entry["symbols"]}
+                             for name, entry in self._categories.items()}
+
+    def refresh(self, force: bool = False) -> bool:
+        """Bring the index up to date with the library; returns True if anything changed.
+
+        Between checks (every check_interval seconds) this costs nothing."""
+        now = time.monotonic()
+        if not self._loaded:
+            self._load_cache()
+            self._loaded = True
+            self._reindex()
+        elif not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+
+        changed = False
+        root_mtime = _mtime(self.root)
+        if root_mtime is None:
+            changed = bool(self._categories)
+            self._categories = {}
+        else:
+            if root_mtime != self._root_mtime:
+                # Categories were added or removed
+                try:
+                    with os.scandir(self.root) as entries:
+                        names = {entry.name for entry in entries if entry.is_dir()}
+                except OSError:
+                    names = set()
+                for name in set(self._categories) - names:
+                    del self._categories[name]
+                for name in names - set(self._categories):
+                    self._categories[name] = {"mtime": None, "symbols": []}
+                self._root_mtime = root_mtime
+                changed = True
+            for name, entry in self._categories.items():
+                mtime = _mtime(os.path.join(self.root, name))
+                if mtime != entry["mtime"]:
+                    entry["mtime"] = mtime
+                    entry["symbols"] = self._scan_category(name)
+                    changed = True
+        if changed:
+            self._reindex()
+            self._save_cache()
+        return changed
+
+    # ---- queries -------------------------------------------------------------
+
+    @property
+    def available(self) -> bool:
+        self.refresh()
+        return self._root_mtime is not None and bool(self._categories)
+
+    def categories(self) -> Dict[str, int]:
+        """Category name -> number of symbols in it."""
+        self.refresh()
+        return {name: len(self._categories[name]["symbols"]) for name in sorted(self._categories)}
+
+    def category(self, name: str) -> Optional[str]:
+        """Canonical spelling of a category name (case-insensitive), or None."""
+        self.refresh()
+        return self._category_keys.get(name.lower())
+
+    def symbols(self, category: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """One page of a category's symbol names, and the category's total."""
+        canonical = self.category(category)
+        if canonical is None:
+            return [], 0
+        names = self._categories[canonical]["symbols"]
+        end = None if limit is None else offset + limit
+        return names[offset:end], len(names)
+
+    def find(self, category: str, symbol_name: str) -> Optional[Tuple[str, str]]:
+        """Canonical (category, symbol) for a symbol in the library, or None."""
+        canonical = self.category(category)
+        if canonical is None:
+            return None
+        symbol = self._symbol_keys[canonical].get(symbol_name.lower())
+        return (canonical, symbol) if symbol is not None else None
+
+    def path(self, category: str, symbol_name: str) -> str:
+        return f"{self.root}/{category}/{symbol_name}{SYMBOL_EXTENSION}"
+
+    def search(self, query: str, category: Optional[str] = None, offset: int = 0,
+               limit: int = 20) -> Tuple[List[Tuple[str, str]], int]:
+        """Symbols matching query, best first: exact names, then prefixes, then
+        substrings, then close (fuzzy) matches. Returns one page and the total."""
+        self.refresh()
+        if category is not None:
+            canonical = self.category(category)
+            searched = [canonical] if canonical else []
+        else:
+            searched = sorted(self._categories)
+        needle = query.lower()
+        ranked = []
+        fuzzy_pool: Dict[str, List[Tuple[str, str]]] = {}
+        for name in searched:
+            for key, symbol in self._symbol_keys[name].items():
+                if key == needle:
+                    ranked.append((0, key, name, symbol))
+                elif key.startswith(needle):
+                    ranked.append((1, key, name, symbol))
+                elif needle in key:
+                    ranked.append((2, key, name, symbol))
+                else:
+                    fuzzy_pool.setdefault(key, []).append((name, symbol))
+        if needle:
+            for key in difflib.get_close_matches(needle, list(fuzzy_pool), n=50, cutoff=0.6):
+                ranked.extend((3, key, name, symbol) for name, symbol in fuzzy_pool[key])
+        # Fuzzy matches keep difflib's best-first order; the others sort by name
+        ranked.sort(key=lambda item: (item[0], item[1] if item[0] < 3 else "", item[2]))
+        matches = [(name, symbol) for _, _, name, symbol in ranked]
+        return matches[offset:offset + limit], len(matches)
+
+    def validate(self, category: str, symbol_name: str) -> Tuple[bool, str]:
+        """Check a symbol exists before any LISP is sent. On success the message
+        is the canonical "CATEGORY/SYMBOL"; otherwise it explains what is wrong
+        and suggests close matches."""
+        if not self.available:
+            return False, (f"P&ID symbol library not found at {self.root} "
+                           f"(set AUTOCAD_MCP_SYMBOL_LIBRARY to its location)")
+        canonical = self.category(category)
+        if canonical is None:
+            return False, (f"Unknown symbol category '{category}'. "
+                           f"Categories: {', '.join(self.categories())}")
+        found = self.find(canonical, symbol_name)
+        if found is None:
+            suggestions, _ = self.search(symbol_name, canonical, limit=5)
+            hint = f" Did you mean: {', '.join(s for _, s in suggestions)}?" if suggestions else ""
+            return False, f"No symbol '{symbol_name}' in {canonical}.{hint}"
+        return True, f"{found[0]}/{found[1]}"
@@ -0,0 +1,538 @@
+#!/usr/bin/env python
+"""
+AutoCAD LT MCP Server - Transport Layer
+Every keystroke, paste and window lookup the servers make goes through a
+transport object, so the UI automation can be swapped for an in-process
+fake when measuring throughput off a Windows desktop.
+
+Select the backend with the AUTOCAD_MCP_TRANSPORT environment variable:
+- "win32" (default): drives a real AutoCAD window via win32gui/keyboard/pyperclip
+- "fake": simulates AutoCAD in-process and records per-command latency
+- "fake-realtime": the same, but its sleeps really wait (startup benchmarks)
+"""
+import functools
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from result_mailbox import Mailbox, ResultRecord, variable_query_command
+
+logger = logging.getLogger("autocad-lisp-mcp.transport")
+
+FAKE_WINDOW_HANDLE = 0xACAD
+FAKE_WINDOW_TITLE = "AutoCAD LT 2024 - [Drawing1.dwg]"
+
+PROBE_FILE = os.path.join(tempfile.gettempdir(), "autocad-mcp-probe.txt")
+def probe_command(token: str, path: str = PROBE_FILE) -> str:
+    """LISP that writes `token` to the probe file once AutoCAD reaches it."""
+    path = path.replace("\\", "/")
+    return (f'(progn (setq mcp-probe-file (open "{path}" "w")) '
+            f'(write-line "{token}" mcp-probe-file) (close mcp-probe-file) (princ))')
+
+
+class Transport:
+    """Primitive UI operations used to talk to AutoCAD."""
+
+    name = "base"
+
+    def find_window(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def find_windows(self) -> List[int]:
+        """Every AutoCAD drawing window on the desktop, first one first."""
+        hwnd = self.find_window()
+        return [hwnd] if hwnd else []
+
+    def window_title(self, hwnd: int) -> str:
+        raise NotImplementedError
+
+    def focus(self, hwnd: int) -> None:
+        raise NotImplementedError
+
+    def write(self, text: str) -> None:
+        raise NotImplementedError
+
+    def press(self, key: str) -> None:
+        raise NotImplementedError
+
+    def copy(self, text: str) -> None:
+        raise NotImplementedError
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def probe(self, hwnd: int, token: str, timeout: float = 2.0) -> Optional[float]:
+        """Send a verification command and wait for AutoCAD to echo `token`.
+        Returns the response latency in seconds, or None if it never arrived
+        (a dropped or garbled command)."""
+        raise NotImplementedError
+
+    def read_variable(self, hwnd: int, symbol: str, timeout: float = 5.0) -> Optional[str]:
+        """Read a string-valued AutoLISP global back from AutoCAD ("" when it is
+        unset). Returns None if AutoCAD did not answer within timeout."""
+        raise NotImplementedError
+
+    def reset_results(self) -> None:
+        """Discard result records from earlier sessions."""
+        raise NotImplementedError
+
+    def wait_for_result(self, seq: int, timeout: float) -> Optional[ResultRecord]:
+        """Wait for the result record of (mcp-run seq ...); None on timeout."""
+        raise NotImplementedError
+
+
+class Win32Transport(Transport):
+    """Drives a real AutoCAD window through simulated keyboard input."""
+
+    name = "win32"
+
+    def __init__(self):
+        # Platform-specific modules are only needed once this backend is chosen
+        import win32gui
+        import keyboard
+        import pyperclip
+        self._win32gui = win32gui
+        self._keyboard = keyboard
+        self._pyperclip = pyperclip
+        self._mailbox = Mailbox()
+
+    def find_window(self) -> Optional[int]:
+        """Find the AutoCAD LT window handle by checking window titles."""
+        windows = self.find_windows()
+        return windows[0] if windows else None
+
+    def find_windows(self) -> List[int]:
+        win32gui = self._win32gui
+
+        def enum_windows_callback(hwnd, result):
+            if win32gui.IsWindowVisible(hwnd):
+                window_text = win32gui.GetWindowText(hwnd)
+                win_text = window_text.lower()
+                if "autocad" in win_text and ("drawing" in win_text or ".dwg" in win_text):
+                    result.append(hwnd)
+            return True
+
+        windows = []
+        win32gui.EnumWindows(enum_windows_callback, windows)
+        return windows
+
+    def window_title(self, hwnd: int) -> str:
+        return self._win32gui.GetWindowText(hwnd)
+
+    def focus(self, hwnd: int) -> None:
+        self._win32gui.SetForegroundWindow(hwnd)
+
+    def write(self, text: str) -> None:
+        self._keyboard.write(text)
+
+    def press(self, key: str) -> None:
+        self._keyboard.press_and_release(key)
+
+    def copy(self, text: str) -> None:
+        self._pyperclip.copy(text)
+
+    def probe(self, hwnd: int, token: str, timeout: float = 2.0) -> Optional[float]:
+        try:
+            os.remove(PROBE_FILE)
+        except OSError:
+            pass
+        self.write(probe_command(token))
+        started = time.perf_counter()
+        self.press("enter")
+        while time.perf_counter() - started < timeout:
+            try:
+                with open(PROBE_FILE) as f:
+                    if f.read().strip() == token:
+                        return time.perf_counter() - started
+            except OSError:
+                pass
+            time.sleep(0.01)
+        return None
+
+    def read_variable(self, hwnd: int, symbol: str, timeout: float = 5.0) -> Optional[str]:
+        path = self._mailbox.query_path("query.txt")
+        self.write(variable_query_command(symbol, path))
+        self.press("enter")
+        text = self._mailbox.wait_for_text(path, timeout)
+        return None if text is None else text.strip()
+
+    def reset_results(self) -> None:
+        self._mailbox.reset()
+
+    def wait_for_result(self, seq: int, timeout: float) -> Optional[ResultRecord]:
+        return self._mailbox.wait_for(seq, timeout)
+
+
+@dataclass
+class CommandRecord:
+    """One command line submitted to the fake AutoCAD command prompt."""
+    text: str
+    started: float
+    submitted: float
+    finished: float
+    round_trip: int
+    functions: List[str] = field(default_factory=list)
+    window: int = FAKE_WINDOW_HANDLE
+
+    @property
+    def latency(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class RoundTrip:
+    """Everything sent between two window focus events."""
+    index: int
+    started: float
+    ended: Optional[float] = None
+    commands: int = 0
+
+    @property
+    def latency(self) -> float:
+        return (self.ended if self.ended is not None else self.started) - self.started
+
+
+class FakeTransport(Transport):
+    """In-process stand-in for AutoCAD that records everything it is sent.
+
+    Time is simulated: sleeps advance a virtual clock instead of blocking
+    (unless realtime=True), and typing/executing commands costs a
+    configurable amount of virtual time. This keeps benchmarks fast and
+    deterministic on machines without AutoCAD.
+
+    With response_time > 0, AutoCAD stays busy that long after each command
+    and input arriving in the meantime is lost, the way keystrokes sent too
+    early are on a real machine. Lost input makes the next probe fail.
+
+    With windows > 1 there are that many AutoCAD instances, each with its own
+    LISP globals. They share the keyboard and clipboard, and each runs a
+    submitted command in the background: enter returns at once and the
+    result appears when that instance has worked through the command, so
+    the server can type into one instance while others are drawing. Windows
+    in `hung` accept input but never report a result.
+
+    Functions named in `failing` raise an error when called: the innermost
+    (mcp-run seq ...) around the call reports status "error", and the
+    entities it would have drawn are not created.
+    """
+
+    name = "fake"
+
+    def __init__(self, keystroke_time: float = 0.0005, paste_time: float = 0.01,
+                 command_time: float = 0.02, realtime: bool = False,
+                 response_time: float = 0.0, windows: int = 1):
+        self.keystroke_time = keystroke_time
+        self.paste_time = paste_time
+        self.command_time = command_time
+        self.response_time = response_time
+        self.realtime = realtime
+        self.windows = max(1, windows)
+        self.hung: Set[int] = set()
+        self.failing: Set[str] = set()
+        # Drawing-session state survives reset(), like a running AutoCAD would
+        self.window_variables: Dict[int, Dict[str, str]] = {hwnd: {} for hwnd in self.find_windows()}
+        self.loaded_files: List[str] = []
+        self.focused = FAKE_WINDOW_HANDLE
+        self.reset()
+
+    @property
+    def variables(self) -> Dict[str, str]:
+        """LISP globals of the focused instance."""
+        return self.window_variables[self.focused]
+
+    def reset(self) -> None:
+        """Clear recorded commands and restart the virtual clock."""
+        self.clock = 0.0
+        self.clipboard = ""
+        self.commands: List[CommandRecord] = []
+        self.round_trips: List[RoundTrip] = []
+        self._line = ""
+        self._line_started: Optional[float] = None
+        self.busy_until = 0.0
+        self.dropped = 0
+        self._garbled = False
+        self.results: Dict[int, ResultRecord] = {}
+        self._result_times: Dict[int, float] = {}
+        self._next_handle = 0x200
+        self._idle_at: Dict[int, float] = {}  # When each instance finishes its queued work (windows > 1)
+        self._epoch = time.perf_counter()
+
+    def _busy(self) -> bool:
+        """True (and the input is counted as lost) while AutoCAD is still responding."""
+        if self.clock < self.busy_until:
+            self.dropped += 1
+            self._garbled = True
+            return True
+        return False
+
+    def _advance(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        self.clock += seconds
+        if self.realtime:
+            time.sleep(seconds)
+
+    def _now(self) -> float:
+        """Time on the scale result times use: with several realtime windows
+        the wall clock, since their sleeps overlap; otherwise the virtual clock."""
+        if self.windows > 1 and self.realtime:
+            return time.perf_counter() - self._epoch
+        return self.clock
+
+    def _append(self, text: str) -> None:
+        if self._line_started is None:
+            self._line_started = self.clock
+        self._line += text
+
+    def _submit(self) -> None:
+        text = self._line.strip()
+        started = self._line_started if self._line_started is not None else self.clock
+        self._line = ""
+        self._line_started = None
+        if not text:
+            return
+        functions = re.findall(r"\((c:[\w\-]+|load|vl-load-com)\b", text)
+        submitted = self.clock
+        seconds = self.command_time * max(1, len(functions))
+        reported = self._reported(text)
+        for seq, path in re.findall(r'\(mcp-run-script (\d+|nil) "([^"]+)"\)', text):
+            called, script_seconds = self._script(path)
+            functions += called
+            seconds += script_seconds
+            if seq != "nil":
+                # The script's last line reports like mcp-run
+                reported.append((int(seq), called, False, []))
+        if self.windows > 1:
+            # The instance works through the command in the background
+            start = max(self._now(), self._idle_at.get(self.focused, 0.0))
+            self._idle_at[self.focused] = ready = start + seconds
+            self.busy_until = self.clock + self.response_time
+        else:
+            self._advance(seconds)
+            self.busy_until = ready = self.clock + self.response_time
+        for path in re.findall(r'\(load "([^"]+)"\)', text):
+            self._load(path)
+        self._setq(text)
+        # One made-up handle per drawing function called directly in each
+        # record's form; a record also reports the handles of records nested in it
+        own: Dict[int, List[str]] = {}
+        for seq, called, failed, _ in reported:
+            own[seq] = []
+            for _ in [f for f in called if f.startswith("c:") and not failed]:
+                own[seq].append(format(self._next_handle, "X"))
+                self._next_handle += 1
+        for seq, called, failed, nested in reported:
+            if self.focused in self.hung:
+                continue
+            handles = [h for inner in [seq] + nested for h in own[inner]]
+            error = next((f for f in called if f in self.failing), None) if failed else None
+            self.results[seq] = ResultRecord(
+                seq=seq, status="error" if failed else "ok", count=len(handles), handles=handles,
+                error=f"simulated failure in {error}" if failed else None)
+            self._result_times[seq] = ready  # Available once AutoCAD has run the command
+        if not self.round_trips:
+            self.round_trips.append(RoundTrip(index=0, started=started))
+        self.round_trips[-1].commands += 1
+        self.commands.append(CommandRecord(text=text, started=started, submitted=submitted,
+                                           finished=self.clock,
+                                           round_trip=self.round_trips[-1].index,
+                                           functions=functions, window=self.focused))
+
+    def _reported(self, text: str) -> List[Tuple[int, List[str], bool, List[int]]]:
+        """The (mcp-run seq ...) forms in text, as (seq, functions called
+        directly in it, whether one of them fails, seqs nested in it)."""
+        forms = []
+        for match in re.finditer(r"\(mcp-run (\d+) ", text):
+            depth, end, quoted = 0, len(text), False
+            for i in range(match.start(), len(text)):
+                char = text[i]
+                if quoted:
+                    quoted = char != '"' or text[i - 1] == "\\"
+                elif char == '"':
+                    quoted = True
+                elif char == "(":
+                    depth += 1
+                elif char == ")":
+                    depth -= 1
+                    if depth == 0:
+                        end = i + 1
+                        break
+            forms.append((int(match.group(1)), match.start(), end))
+        reported = []
+        for seq, start, end in forms:
+            nested = [(inner, s, e) for inner, s, e in forms if start < s and e <= end]
+            body = text[start:end]
+            if nested:
+                body = "".join(text[i] for i in range(start, end)
+                               if not any(s <= i < e for _, s, e in nested))
+            called = re.findall(r"\((c:[\w\-]+|load|vl-load-com)\b", body)
+            reported.append((seq, called, any(f in self.failing for f in called),
+                             [inner for inner, _, _ in nested]))
+        return reported
+
+    def _script(self, path: str) -> Tuple[List[str], float]:
+        """Simulate SCRIPT: run each line of path and of the scripts it chains to,
+        with no typing cost. Returns the functions called and the time taken."""
+        functions: List[str] = []
+        seconds = 0.0
+        while path:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                logger.warning(f"Fake AutoCAD could not read {path}")
+                break
+            path = ""
+            for line in lines:
+                called = re.findall(r"\((c:[\w\-]+)\b", line)
+                functions += called
+                seconds += self.command_time * max(1, len(called))
+                self._setq(line)
+                chained = re.match(r'\(command "_\.SCRIPT" "([^"]+)"\)', line)
+                if chained:
+                    path = chained.group(1)
+        return functions, seconds
+
+    def _load(self, path: str) -> None:
+        """Simulate (load path): remember it and apply its string globals."""
+        self.loaded_files.append(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._setq(f.read())
+        except OSError:
+            logger.warning(f"Fake AutoCAD could not read {path}")
+
+    def _setq(self, source: str) -> None:
+        """Apply the two string-global idioms the servers use:
+        (setq *x* "value") and (setq *x* (strcat (if *x* *x* "") "more"))."""
+        for symbol, value in re.findall(r'\(setq (\*[\w-]+\*) "([^"]*)"\)', source):
+            self.variables[symbol] = value
+        for symbol, value in re.findall(
+                r'\(setq (\*[\w-]+\*) \(strcat \(if \1 \1 ""\) "([^"]*)"\)\)', source):
+            self.variables[symbol] = self.variables.get(symbol, "") + value
+
+    def find_window(self) -> Optional[int]:
+        return FAKE_WINDOW_HANDLE
+
+    def find_windows(self) -> List[int]:
+        return [FAKE_WINDOW_HANDLE + i for i in range(self.windows)]
+
+    def window_title(self, hwnd: int) -> str:
+        if hwnd == FAKE_WINDOW_HANDLE:
+            return FAKE_WINDOW_TITLE
+        return FAKE_WINDOW_TITLE.replace("Drawing1", f"Drawing{hwnd - FAKE_WINDOW_HANDLE + 1}")
+
+    def focus(self, hwnd: int) -> None:
+        self.focused = hwnd
+        if self.round_trips and self.round_trips[-1].ended is None:
+            self.round_trips[-1].ended = self.clock
+        self.round_trips.append(RoundTrip(index=len(self.round_trips), started=self.clock))
+
+    def write(self, text: str) -> None:
+        if not self._busy():
+            self._append(text)
+        self._advance(self.keystroke_time * len(text))
+
+    def press(self, key: str) -> None:
+        if key in ("enter", "ctrl+v") and self._busy():
+            self._advance(self.keystroke_time)
+        elif key == "enter":
+            self._submit()
+        elif key == "esc":
+            self._line = ""
+            self._line_started = None
+        elif key == "ctrl+v":
+            self._append(self.clipboard)
+            self._advance(self.paste_time)
+        else:
+            self._advance(self.keystroke_time)
+
+    def copy(self, text: str) -> None:
+        self.clipboard = text
+
+    def sleep(self, seconds: float) -> None:
+        self._advance(seconds)
+
+    def probe(self, hwnd: int, token: str, timeout: float = 2.0) -> Optional[float]:
+        self.write(probe_command(token))
+        self.press("enter")
+        started = self.clock  # The fake runs the probe itself synchronously on enter
+        if self._garbled:
+            self._garbled = False
+            self._line = ""
+            self._line_started = None
+            self._advance(timeout)
+            return None
+        self._advance(self.busy_until - self.clock)
+        return self.clock - started
+
+    def read_variable(self, hwnd: int, symbol: str, timeout: float = 5.0) -> Optional[str]:
+        self.write(variable_query_command(symbol, "query.txt"))
+        self.press("enter")
+        if self._garbled:
+            self._garbled = False
+            self._advance(timeout)
+            return None
+        return self.variables.get(symbol, "")
+
+    def reset_results(self) -> None:
+        self.results.clear()
+        self._result_times.clear()
+
+    def wait_for_result(self, seq: int, timeout: float) -> Optional[ResultRecord]:
+        if seq in self.results:
+            self._advance(self._result_times[seq] - self._now())
+            return self.results[seq]
+        self._advance(timeout)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Summarise recorded commands and round-trips."""
+        if self.round_trips and self.round_trips[-1].ended is None:
+            self.round_trips[-1].ended = self.clock
+        latencies = sorted(rt.latency for rt in self.round_trips)
+        return {
+            "commands": len(self.commands),
+            "round_trips": len(self.round_trips),
+            "elapsed": self.clock,
+            "mean_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95_latency": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            "payload_chars": sum(len(c.text) for c in self.commands),
+            "dropped_inputs": self.dropped,
+        }
+
+
+TRANSPORTS = {
+    "win32": Win32Transport,
+    "fake": FakeTransport,
+    "fake-realtime": functools.partial(FakeTransport, realtime=True),
+}
+
+_transport: Optional[Transport] = None
+
+
+def create_transport(name: Optional[str] = None) -> Transport:
+    """Instantiate the transport named by `name` or AUTOCAD_MCP_TRANSPORT."""
+    name = (name or os.environ.get("AUTOCAD_MCP_TRANSPORT", "win32")).lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown transport '{name}'. Choose from: {', '.join(TRANSPORTS)}")
+    logger.info(f"Using '{name}' transport")
+    return TRANSPORTS[name]()
+
+
+def get_transport() -> Transport:
+    """Return the process-wide transport, creating it on first use."""
+    global _transport
+    if _transport is None:
+        _transport = create_transport()
+    return _transport
+
+
+def set_transport(transport: Transport) -> None:
+    """Replace the process-wide transport (benchmarks, fake backends)."""
+    global _transport
+    _transport = transport